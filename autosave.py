@@ -0,0 +1,160 @@
+"""
+Background, crash-safe JSON persistence for small game state (AI brains).
+
+AutoSaver takes snapshots from the game loop and writes the newest one on
+a worker thread, at most once per `interval` seconds, so the frame never
+waits for the disk:
+
+    saver = AutoSaver("ai_brain.json", interval=2.0)
+    saver.submit(dict(brain.weights))   # cheap; fine to call every frame
+    ...
+    saver.close()                       # writes the last snapshot, stops the worker
+
+Snapshots submitted while a write is pending are coalesced: only the
+latest one reaches the disk. Every write goes to `<path>.tmp`, is
+fsync'ed, and then replaces the target with os.replace(), so a crash or
+power loss mid-write leaves the previous file intact instead of a
+truncated one. The worker is a daemon thread started
+by the first submit(); close() is registered with atexit at that point, so
+the last snapshot is written on a normal interpreter exit even if the
+caller forgets to close.
+
+stats() reports writes, coalesced snapshots, failures and the write
+latency (last / mean / max ms).
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+
+
+def write_atomic(path, text):
+    """Replace `path` with `text` (UTF-8) via a synced `path + ".tmp"` and os.replace().
+
+    The temporary name is fixed, so a write killed halfway leaves one stale
+    .tmp that the next write overwrites; two writers must not share a path.
+    """
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class AutoSaver:
+    def __init__(self, path, interval=2.0, indent=2):
+        self.path = path
+        self.interval = float(interval)
+        self.indent = indent
+        self.writes = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.total_ms = 0.0
+        self._cond = threading.Condition()
+        self._pending = None
+        self._writing = False
+        self._urgent = False
+        self._closed = False
+        self._last_write = float("-inf")  # time.monotonic() of the last finished write
+        self._thread = None
+
+    def submit(self, data):
+        """Queue a JSON-serializable snapshot; the caller must not mutate it afterwards."""
+        with self._cond:
+            if self._closed:
+                return
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = data
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Write the pending snapshot now (ignoring the interval) and wait for it."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._pending is None and not self._writing:
+                return
+            self._urgent = True
+            self._cond.notify_all()
+            while self._pending is not None or self._writing:
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    break
+                self._cond.wait(left)
+
+    def close(self, timeout=5.0):
+        """Write whatever is pending and stop the worker. Later submits are ignored."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            atexit.unregister(self.close)
+
+    def stats(self):
+        return {
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "last_ms": self.last_ms,
+            "mean_ms": self.total_ms / self.writes if self.writes else 0.0,
+            "max_ms": self.max_ms,
+        }
+
+    # ----------------- worker -----------------
+    def _run(self):
+        cond = self._cond
+        while True:
+            with cond:
+                while self._pending is None and not self._closed:
+                    cond.wait()
+                if self._pending is None:
+                    return  # closed with nothing left to write
+                # let further snapshots coalesce until the interval is up
+                while not (self._closed or self._urgent):
+                    left = self._last_write + self.interval - time.monotonic()
+                    if left <= 0:
+                        break
+                    cond.wait(left)
+                data, self._pending = self._pending, None
+                self._urgent = False
+                self._writing = True
+            self._write(data)
+            with cond:
+                self._writing = False
+                self._last_write = time.monotonic()
+                cond.notify_all()
+
+    def _write(self, data):
+        t0 = time.perf_counter()
+        try:
+            write_atomic(self.path, json.dumps(data, indent=self.indent))
+        except Exception as e:  # a full disk or a read-only dir must not kill the game
+            self.failures += 1
+            self.last_error = e
+            return
+        ms = 1000.0 * (time.perf_counter() - t0)
+        self.writes += 1
+        self.last_ms = ms
+        self.max_ms = max(self.max_ms, ms)
+        self.total_ms += ms
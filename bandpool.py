@@ -0,0 +1,64 @@
+"""
+Column-band casting on a persistent worker pool.
+
+The screen is split into more bands than there are workers (bands_per_worker
+per worker) and the bands are queued on a thread or process pool; whichever
+worker is free takes the next band, so a band whose rays travel far does
+not hold up the frame while the others sit idle. Results come back in
+band order and are concatenated by the caller.
+
+    pool = BandPool(4, "process", initializer=load_map, initargs=(rows,))
+    parts = pool.run(cast_band, columns, pos_x, pos_y, angle, columns)
+    rays = [r for part in parts for r in part]
+
+`fn(*args, start, end)` is called once per band [start, end). With
+"process" the function must be a module-level function and its module
+state (the map) must be set up by `initializer`, which runs once in each
+worker process; the map is then shared read-only by every worker. Create a
+new pool after the map changes. Threads share the caller's module state, so
+`initializer` is not used for "thread".
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+def _call(fn, args, start, end):
+    return fn(*args, start, end)
+
+
+class BandPool:
+    def __init__(self, workers, kind="thread", bands_per_worker=4, initializer=None, initargs=()):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"unknown pool kind {kind!r}")
+        self.workers = workers
+        self.kind = kind
+        self.bands_per_worker = bands_per_worker
+        if kind == "process":
+            self.executor = ProcessPoolExecutor(workers, initializer=initializer, initargs=initargs)
+        else:
+            self.executor = ThreadPoolExecutor(workers, thread_name_prefix="band")
+        self._bands = {}
+
+    def bands(self, total):
+        """[start, end) column ranges covering 0..total, at most workers * bands_per_worker of them."""
+        bands = self._bands.get(total)
+        if bands is None:
+            count = max(1, min(total, self.workers * self.bands_per_worker))
+            edges = [total * i // count for i in range(count + 1)]
+            bands = self._bands[total] = list(zip(edges[:-1], edges[1:]))
+        return bands
+
+    def run(self, fn, total, *args):
+        """fn(*args, start, end) for every band, results in band order."""
+        bands = self.bands(total)
+        futures = [self.executor.submit(_call, fn, args, start, end) for start, end in bands]
+        return [f.result() for f in futures]
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,665 @@
+"""
+Headless frame benchmark for every engine in this repo.
+
+Runs raycasting1.py, new.py, new2.py, ray.py and raycasting2.py without a
+window (SDL dummy video driver) and without the FPS cap, along a scripted
+camera path, then prints frames/sec, frame time percentiles and a
+per-stage breakdown as JSON.
+
+Usage:
+  python bench.py                                   # every engine, built-in maps
+  python bench.py --engine raycasting1 new2 --frames 600
+  python bench.py --width 640 --height 400 --map-size 64 --npcs 200
+  python bench.py --caster scalar --walls lines --out before.json
+  python bench.py --engine raycasting1 --walls textured   # textured walls (compare with surfarray)
+  python bench.py --engine raycasting1 new2 --floors textured   # textured floor and ceiling
+  python bench.py --engine raycasting1 --target-ms 8    # dynamic resolution on
+  python bench.py --engine raycasting1 new --workers 0 1 2 4 --pool process
+  python bench.py --engine raycasting1 new2 --map-file level.pyrmap   # mmap'd binary level
+  python bench.py --engine raycasting1 new --caster scalar --map-size 256 --pillars 0.002 \
+                  --traversal skip                    # distance-field skipping, steps per ray
+  python bench.py --engine new --map-size 4096 --pillars 0.0005 --traversal pyramid
+  python bench.py --engine raycasting1 new2 --map-size 48 --npcs 500 --pvs off   # no PVS culling
+  python bench.py --engine raycasting1 --map-size 256 --npcs 5000 --npc-index off  # plain NPC list
+  python bench.py --engine raycasting1 new2 --map-size 256 --npcs 10000 --npc-store list  # per-NPC updates
+  python bench.py --engine raycasting1 --map-size 256 --npcs 20000 --sim-hz 15  # NPCs on a 15 Hz tick
+  python bench.py --spatial 1000 10000 100000        # SpatialHash update / query costs only
+"""
+
+import argparse
+import contextlib
+import functools
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+ENGINES = ["raycasting1", "new", "new2", "ray", "raycasting2"]
+DT = 1.0 / 60.0  # simulation step per benchmark frame
+
+
+# ----------------------------- Maps / path ----------------------------
+def make_map(size, seed=0, pillars=0.08):
+    """Square map (rows of ints, 0 = free, 1..3 = wall) with a solid border,
+    scattered pillars (this fraction of the cells) and a cleared 3x3 area in the middle."""
+    rng = random.Random(seed)
+    rows = []
+    for y in range(size):
+        row = []
+        for x in range(size):
+            if x in (0, size - 1) or y in (0, size - 1) or rng.random() < pillars:
+                row.append(rng.randint(1, 3))
+            else:
+                row.append(0)
+        rows.append(row)
+    c = size // 2
+    for y in range(c - 1, c + 2):
+        for x in range(c - 1, c + 2):
+            rows[y][x] = 0
+    return rows
+
+
+def free_cells(rows):
+    if hasattr(rows, "free_cells"):  # GridMap
+        return rows.free_cells()
+    return [(x + 0.5, y + 0.5) for y, row in enumerate(rows) for x, v in enumerate(row) if v == 0]
+
+
+def camera_path(rows, start, frames):
+    """Deterministic walk: move forward while slowly turning, turn away from walls."""
+    def free(x, y):
+        return 0 <= int(y) < len(rows) and 0 <= int(x) < len(rows[0]) and rows[int(y)][int(x)] == 0
+
+    x, y = start
+    angle = 0.3
+    poses = []
+    for _ in range(frames):
+        ahead_x = x + math.cos(angle) * 0.35
+        ahead_y = y + math.sin(angle) * 0.35
+        if free(ahead_x, ahead_y):
+            x += math.cos(angle) * 0.06
+            y += math.sin(angle) * 0.06
+        else:
+            angle += 0.7
+        angle += 0.012
+        poses.append((x, y, angle))
+    return poses
+
+
+def build_traversal(grid, traversal):
+    """Build the grid's distance field / occupancy pyramid up front (outside the timed
+    frames); its cost in ms."""
+    if traversal == "dda":
+        return None
+    t0 = time.perf_counter()
+    if traversal == "skip":
+        grid.distance_rows()
+    else:
+        grid.occupancy()
+    return 1000.0 * (time.perf_counter() - t0)
+
+
+def build_pvs(grid, pvs):
+    """Build (or fetch) the grid's potentially visible sets up front; (sets, cost in ms)."""
+    if pvs == "off":
+        return None, None
+    t0 = time.perf_counter()
+    sets = grid.pvs()
+    return sets, 1000.0 * (time.perf_counter() - t0)
+
+
+def place_npcs(m, cells, count, opts):
+    """`count` NPCs on random free cells, in an NPCStore (seeded) or a plain list."""
+    rng = random.Random(opts.seed)
+    npcs = [m.NPC(*rng.choice(cells)) for _ in range(count)]
+    if opts.npc_store == "list" or m.NPCStore is None:
+        return npcs
+    import numpy as np
+    store = m.NPCStore(rng=np.random.default_rng(opts.seed))
+    store.extend(npcs)
+    return store
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(math.ceil(p / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+class Stages:
+    """Accumulates wall time per named stage for the current frame."""
+
+    def __init__(self):
+        self.current = {}
+
+    def run(self, name, fn, *args):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        self.current[name] = self.current.get(name, 0.0) + (time.perf_counter() - t0)
+        return out
+
+
+# ----------------------------- Engines --------------------------------
+class Raycasting1Bench:
+    name = "raycasting1"
+
+    def setup(self, opts, rows, npc_count, brain_path, workers=0):
+        import raycasting1 as m
+        self.m = m
+        m.set_resolution(opts.width, opts.height)
+        if opts.map_file:
+            self.start = m.load_map_file(opts.map_file)
+        elif rows is not None:
+            m.load_map(rows)
+            self.start = (m.MAP_W // 2 + 0.5, m.MAP_H // 2 + 0.5)
+        else:
+            self.start = m.SPAWN
+        self.rows = m.WORLD
+        self.resolution = (m.WIDTH, m.HEIGHT)
+        self.screen = pygame.display.set_mode(self.resolution)
+        self.font = pygame.font.SysFont("consolas", 16)
+
+        self.caster = m.select_caster(opts.caster)
+        self.config = {"caster": "numpy" if self.caster is m.cast_rays_np else "scalar"}
+        self.pool = m.make_band_pool(workers, opts.pool)
+        if self.pool is not None:
+            self.caster = functools.partial(m.cast_rays_banded, self.pool, self.caster)
+        self.config["cast_workers"] = workers
+        self.config["pool"] = opts.pool if workers else None
+        m.TRAVERSAL = opts.traversal
+        self.config["traversal"] = opts.traversal if self.config["caster"] == "scalar" else None
+        self.config["traversal_build_ms"] = build_traversal(m.WORLD, opts.traversal)
+        self.pvs, self.config["pvs_build_ms"] = build_pvs(m.WORLD, opts.pvs)
+        self.config["pvs"] = self.pvs is not None
+        self.config["npc_index"] = opts.npc_index == "on"
+        self.config["npc_store"] = "soa" if opts.npc_store == "soa" and m.NPCStore is not None else "list"
+        self.rasterizers = {} if m.WallRasterizer is not None else None
+        self.config["walls"] = opts.walls if self.rasterizers is not None else "lines"
+        self.config["floors"] = opts.floors if self.rasterizers is not None else "flat"
+        self.scaler = m.ResolutionScaler(m.WIDTH, opts.target_ms, enabled=opts.target_ms > 0)
+
+        self.weapon_assets = m.build_weapon_assets(m.WIDTH, m.HEIGHT)
+        self.npc_surf = m.build_npc_sprite()
+        self.sprite_cache = m.ScaledSpriteCache(self.npc_surf, m.NPC_SPRITE_CACHE_BYTES)
+        self.brain = m.AIBrain(path=brain_path)
+        cells = free_cells(self.rows) if npc_count else []
+        self.npcs = place_npcs(m, cells, npc_count, opts)
+        self.index = None
+        if self.config["npc_index"]:
+            self.index = m.SpatialHash(m.NPC_INDEX_BUCKET)
+            self.index.rebuild(self.npcs)
+        # --sim-hz: NPCs tick at a fixed rate of their own, drawn interpolated between ticks
+        self.sim = m.FixedStep(opts.sim_hz) if opts.sim_hz > 0 else None
+        self.config["sim_hz"] = opts.sim_hz or None
+        return len(self.npcs)
+
+    def frame(self, pose, st):
+        m = self.m
+        x, y, a = pose
+        dir_x, dir_y = math.cos(a), math.sin(a)
+        plane_x, plane_y = -dir_y * 0.66, dir_x * 0.66
+
+        alpha = 1.0
+        if self.sim is None:
+            st.run("npcs", m.update_npcs, self.npcs, self.brain, DT, x, y, self.pvs, self.index)
+        else:
+            for _ in range(self.sim.advance(DT)):
+                st.run("npcs", m.update_npcs, self.npcs, self.brain, self.sim.dt, x, y, self.pvs, self.index)
+            alpha = self.sim.alpha
+        columns = self.scaler.columns
+        zbuffer, rays, hits = st.run("cast", self.caster, x, y, dir_x, dir_y, plane_x, plane_y, columns)
+        floor = None
+        if self.config["floors"] == "textured":
+            rasterizer = m.get_rasterizer(self.rasterizers, columns)
+            floor = st.run("floors", m.render_floor, rasterizer, x, y, dir_x, dir_y, plane_x, plane_y)
+        if self.config["walls"] == "textured":
+            st.run("walls", m.render_walls_tex, self.screen, zbuffer, hits,
+                   m.get_rasterizer(self.rasterizers, columns), floor)
+        elif self.config["walls"] == "surfarray":
+            st.run("walls", m.render_walls_fb, self.screen, zbuffer, hits,
+                   m.get_rasterizer(self.rasterizers, columns), floor)
+        elif floor is not None:
+            st.run("walls", pygame.surfarray.blit_array, rasterizer.surface, floor)
+            st.run("walls", m.render_walls, self.screen, zbuffer, hits, rasterizer.surface)
+        else:
+            st.run("walls", m.render_walls, self.screen, zbuffer, hits)
+        zbuffer = st.run("walls", m.stretch_columns, zbuffer, m.WIDTH)
+        st.run("sprites", m.render_npcs, self.screen, self.npcs, x, y, dir_x, dir_y,
+               plane_x, plane_y, zbuffer, self.npc_surf, self.sprite_cache, self.pvs, self.index, alpha)
+        st.run("minimap", m.draw_minimap, self.screen, x, y, dir_x, dir_y, rays, self.npcs, self.index, alpha)
+        st.run("weapon", m.draw_weapon, self.screen, self.weapon_assets, "gun", (0, 0))
+        st.run("hud", self.draw_hud, x, y)
+        st.run("flip", pygame.display.flip)
+
+    def draw_hud(self, x, y):
+        m = self.m
+        info = f"FPS   0  Pos({x:.2f},{y:.2f})  NPCs:{len(self.npcs)}  Weapon:gun"
+        hud = self.font.render(info, True, (200, 200, 210))
+        pygame.draw.rect(self.screen, (20, 20, 30), (0, m.HEIGHT - 26, m.WIDTH, 26))
+        self.screen.blit(hud, (10, m.HEIGHT - 23))
+
+    def close(self):
+        self.brain.close()
+        if self.pool is not None:
+            self.pool.close()
+
+
+class NewBench:
+    name = "new"
+    module = "new"
+    has_npcs = False
+
+    def setup(self, opts, rows, npc_count, brain_path, workers=0):
+        m = __import__(self.module)
+        self.m = m
+        m.set_resolution(opts.width, opts.height)
+        if opts.map_file:
+            m.load_map_file(opts.map_file)
+            self.start = m.SPAWN
+        elif rows is not None:
+            m.load_map(["".join(str(v) for v in row) for row in rows])
+            self.start = (m.MAP_W // 2 + 0.5, m.MAP_H // 2 + 0.5)
+        else:
+            self.start = m.SPAWN
+        self.rows = m.GRID
+        self.resolution = (m.WIDTH, m.HEIGHT)
+
+        m.CAST_WORKERS, m.CAST_POOL, m.TRAVERSAL = workers, opts.pool, opts.traversal
+        self.engine = m.Engine()
+        walls = "surfarray" if opts.walls == "textured" else opts.walls  # no textured walls here
+        self.engine.wall_mode = walls if self.engine.rasterizers is not None else "lines"
+        self.engine.floor_mode = opts.floors if self.engine.rasterizers is not None else "flat"
+        self.config = {"walls": self.engine.wall_mode, "floors": self.engine.floor_mode, "cast_workers": workers,
+                       "pool": opts.pool if workers else None, "traversal": opts.traversal,
+                       "traversal_build_ms": build_traversal(m.GRID, opts.traversal)}
+        self.scaler = self.engine.scaler
+        self.scaler.target_ms = opts.target_ms
+        self.scaler.set_enabled(opts.target_ms > 0)
+        if not self.has_npcs:
+            return 0
+        sets, self.config["pvs_build_ms"] = build_pvs(m.GRID, opts.pvs)
+        m.PVS_CULLING = self.config["pvs"] = sets is not None
+        self.engine.brain = m.AIBrain(path=brain_path)
+        self.engine.npcs = place_npcs(m, free_cells(self.rows), npc_count, opts)
+        self.config["npc_store"] = "soa" if opts.npc_store == "soa" and m.NPCStore is not None else "list"
+        self.engine.npc_index.rebuild(self.engine.npcs)
+        return len(self.engine.npcs)
+
+    def frame(self, pose, st):
+        e = self.engine
+        e.player.x, e.player.y, e.player.angle = pose
+        if self.has_npcs:
+            st.run("npcs", e.update_npcs, DT)
+            rays, zbuffer = st.run("cast", e.cast_rays)
+        else:
+            rays = st.run("cast", e.cast_rays)
+        if e.wall_mode == "surfarray":
+            st.run("walls", e.render_walls_fb, rays)
+        else:
+            st.run("walls", e.render_walls_lines, rays)
+        if self.has_npcs:
+            st.run("sprites", e.render_npc_sprites, zbuffer)
+        st.run("minimap", e.draw_minimap, rays)
+        st.run("hud", e.draw_hud)
+        if self.has_npcs:
+            st.run("weapon", e.draw_weapon_overlay)
+        st.run("flip", pygame.display.flip)
+
+    def close(self):
+        if self.has_npcs:
+            self.engine.brain.close()
+        if self.engine.band_pool is not None:
+            self.engine.band_pool.close()
+
+
+class New2Bench(NewBench):
+    name = "new2"
+    module = "new2"
+    has_npcs = True
+
+
+class RayBench:
+    name = "ray"
+
+    def setup(self, opts, rows, npc_count, brain_path, workers=0):
+        import ray as m
+        self.m = m
+        # ray.py indexes worldMap[positionX][positionY], i.e. positionX is the row
+        if rows is not None:
+            m.worldMap = [list(row) for row in rows]
+            self.start = (len(rows[0]) // 2 + 0.5, len(rows) // 2 + 0.5)
+        else:
+            self.start = (7.0, 3.0)
+        self.rows = m.worldMap
+        self.resolution = (opts.width, opts.height)
+        self.screen = pygame.display.set_mode(self.resolution)
+        self.weapon_assets = m.build_weapon_assets(*self.resolution)
+        font = pygame.font.SysFont("Verdana", 20)
+        self.hud = font.render("F1 / F2 - Screenshot JPEG/BMP   F5/F6 - Shadows on/off   F7/F8 - HUD Show/Hide", True, (0, 0, 0))
+        self.config = {}
+        return 0
+
+    def frame(self, pose, st):
+        m = self.m
+        x, y, a = pose
+        pos_x, pos_y = y, x
+        dir_x, dir_y = math.sin(a), math.cos(a)
+        plane_x, plane_y = -dir_y * 0.5, dir_x * 0.5
+        w, h = self.resolution
+
+        rays = st.run("cast+walls", m.render_world, self.screen, pos_x, pos_y, dir_x, dir_y, plane_x, plane_y)
+        st.run("minimap", m.draw_minimap, self.screen, m.worldMap, pos_x, pos_y, dir_x, dir_y, rays)
+        st.run("weapon", m.draw_weapon, self.screen, self.weapon_assets, "gun", (0, 0))
+        st.run("hud", self.draw_hud, w, h)
+        st.run("flip", pygame.display.flip)
+
+    def draw_hud(self, w, h):
+        pygame.draw.rect(self.screen, (100, 100, 200), (0, h - 40, w, 40))
+        self.screen.blit(self.hud, (20, h - 30))
+
+
+class Raycasting2Bench:
+    name = "raycasting2"
+
+    def setup(self, opts, rows, npc_count, brain_path, workers=0):
+        import raycasting2 as m
+        self.m = m
+        if rows is not None:
+            m.configure(opts.height, ["".join('#' if v else ' ' for v in row) for row in rows])
+            self.start = (m.MAP_SIZE // 2 + 0.5, m.MAP_SIZE // 2 + 0.5)
+        else:
+            m.configure(opts.height)
+            self.start = (m.player_x / m.TILE_SIZE, m.player_y / m.TILE_SIZE)
+        self.rows = [[1 if m.MAP[r * m.MAP_SIZE + c] == '#' else 0 for c in range(m.MAP_SIZE)]
+                     for r in range(m.MAP_SIZE)]
+        # the window is always twice as wide as it is high (map left, rays right)
+        self.resolution = (m.SCREEN_WIDTH, m.SCREEN_HEIGHT)
+        m.win = pygame.display.set_mode(self.resolution)
+        self.config = {}
+        return 0
+
+    def frame(self, pose, st):
+        m = self.m
+        x, y, a = pose
+        m.player_x = x * m.TILE_SIZE
+        m.player_y = y * m.TILE_SIZE
+        m.player_angle = a - math.pi / 2  # raycasting2 faces (-sin, cos)
+
+        st.run("clear", pygame.draw.rect, m.win, (0, 0, 0), (0, 0, m.SCREEN_HEIGHT, m.SCREEN_HEIGHT))
+        st.run("map", m.draw_map)
+        st.run("cast", m.cast_rays)
+        st.run("flip", pygame.display.flip)
+
+
+BENCHES = {b.name: b for b in (Raycasting1Bench, NewBench, New2Bench, RayBench, Raycasting2Bench)}
+POOLED = {"raycasting1", "new", "new2"}  # engines that can cast on a BandPool
+
+
+# ----------------------------- Runner ---------------------------------
+def run_engine(name, opts, brain_dir, workers=0):
+    bench = BENCHES[name]()
+    rows = make_map(opts.map_size, opts.seed, opts.pillars) if opts.map_size else None
+    npcs = bench.setup(opts, rows, opts.npcs, os.path.join(brain_dir, f"{name}_brain.json"), workers)
+    try:
+        return measure(bench, name, npcs, opts)
+    finally:
+        if hasattr(bench, "close"):
+            bench.close()
+
+
+def measure(bench, name, npcs, opts):
+    poses = camera_path(bench.rows, bench.start, opts.warmup + opts.frames)
+
+    scaler = getattr(bench, "scaler", None)
+    # DDA iteration counters of the scalar casters (a process pool counts in its workers)
+    cast_stats = getattr(getattr(bench, "m", None), "CAST_STATS", None)
+    if bench.config.get("pool") == "process":
+        cast_stats = None
+    frame_times = []
+    columns = []
+    stage_totals = {}
+    for i, pose in enumerate(poses):
+        if i == opts.warmup and cast_stats is not None:
+            cast_stats.update(rays=0, steps=0)
+        st = Stages()
+        pygame.event.pump()
+        t0 = time.perf_counter()
+        if scaler is not None:
+            cols = scaler.columns
+        bench.frame(pose, st)
+        elapsed = time.perf_counter() - t0
+        if scaler is not None:
+            scaler.update(1000.0 * elapsed)
+        if i < opts.warmup:
+            continue
+        frame_times.append(elapsed)
+        if scaler is not None:
+            columns.append(cols)
+        for stage, secs in st.current.items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + secs
+
+    total = sum(frame_times)
+    ordered = sorted(frame_times)
+    n = len(frame_times)
+    report = {
+        "engine": name,
+        "frames": n,
+        "resolution": list(bench.resolution),
+        "map_size": [len(bench.rows[0]), len(bench.rows)],
+        "npcs": npcs,
+        "config": bench.config,
+        "fps": n / total if total > 0 else 0.0,
+        "frame_ms": {
+            "mean": 1000.0 * total / n if n else 0.0,
+            "p50": 1000.0 * percentile(ordered, 50),
+            "p95": 1000.0 * percentile(ordered, 95),
+            "p99": 1000.0 * percentile(ordered, 99),
+            "max": 1000.0 * ordered[-1] if ordered else 0.0,
+        },
+        "stages_ms": {stage: 1000.0 * secs / n for stage, secs in stage_totals.items()},
+    }
+    if scaler is not None:
+        # internal column count actually rendered (window size is "resolution")
+        report["internal_columns"] = {
+            "dynamic": scaler.enabled,
+            "target_ms": scaler.target_ms if scaler.enabled else None,
+            "mean": sum(columns) / n if n else 0.0,
+            "min": min(columns, default=0),
+            "max": max(columns, default=0),
+            "final": scaler.columns,
+            "changes": scaler.changes,
+        }
+    if cast_stats and cast_stats["rays"]:
+        report["steps_per_ray"] = cast_stats["steps"] / cast_stats["rays"]
+    brain = getattr(bench, "brain", None) or getattr(getattr(bench, "engine", None), "brain", None)
+    if npcs and brain is not None:
+        # background brain writes during the run (they never block a frame)
+        report["brain_save"] = brain.saver.stats()
+    return report
+
+
+def bench_spatial(counts, seed=0, area=256, bucket=4, queries=200):
+    """Per-operation cost of spatial.SpatialHash against a scan of the plain list, in µs:
+    moving entities (update), radius 4, a 32x32 cell window (the minimap) and a
+    70° view cone 24 cells deep, with `n` entities spread over an area x area map."""
+    from spatial import SpatialHash
+
+    class Entity:
+        __slots__ = ("x", "y")
+
+        def __init__(self, x, y):
+            self.x, self.y = x, y
+
+    def per_call(fn, calls):
+        t0 = time.perf_counter()
+        for args in calls:
+            fn(*args)
+        return 1e6 * (time.perf_counter() - t0) / len(calls)
+
+    def scan_radius(ents, x, y, r):
+        return [e for e in ents if (e.x - x) ** 2 + (e.y - y) ** 2 <= r * r]
+
+    def scan_cells(ents, x0, y0, x1, y1):
+        return [e for e in ents if x0 <= int(e.x) <= x1 and y0 <= int(e.y) <= y1]
+
+    def scan_cone(ents, x, y, fx, fy, t, far):
+        out = []
+        for e in ents:
+            dx, dy = e.x - x, e.y - y
+            f = dx * fx + dy * fy
+            if 0 < f <= far and abs(dx * fy - dy * fx) <= f * t + 0.5:
+                out.append(e)
+        return out
+
+    results = []
+    tan_half = math.tan(math.radians(35))
+    for n in counts:
+        rng = random.Random(seed)
+        ents = [Entity(rng.uniform(0, area), rng.uniform(0, area)) for _ in range(n)]
+        index = SpatialHash(bucket)
+        t0 = time.perf_counter()
+        index.rebuild(ents)
+        build_us = 1e6 * (time.perf_counter() - t0) / n
+
+        # one frame of NPC movement (~2 cells/s at 60 fps), then the index update alone
+        for e in ents:
+            a = rng.uniform(0, 2 * math.pi)
+            e.x = min(area - 0.01, max(0.0, e.x + 0.035 * math.cos(a)))
+            e.y = min(area - 0.01, max(0.0, e.y + 0.035 * math.sin(a)))
+        t0 = time.perf_counter()
+        moved = sum(1 for e in ents if index.update(e))
+        update_us = 1e6 * (time.perf_counter() - t0) / n
+
+        points = [(rng.uniform(0, area), rng.uniform(0, area), rng.uniform(0, 2 * math.pi))
+                  for _ in range(queries)]
+        radius = [(x, y, 4.0) for x, y, _ in points]
+        cells = [(int(x) - 16, int(y) - 16, int(x) + 15, int(y) + 15) for x, y, _ in points]
+        cones = [(x, y, math.cos(a), math.sin(a), tan_half, 24.0) for x, y, a in points]
+        results.append({
+            "entities": n,
+            "bucket": bucket,
+            "build_us_per_entity": build_us,
+            "update_us_per_entity": update_us,
+            "rebucketed": moved,
+            "radius_us": {"index": per_call(index.query_radius, radius),
+                          "scan": per_call(functools.partial(scan_radius, ents), radius)},
+            "cells_us": {"index": per_call(index.query_cells, cells),
+                         "scan": per_call(functools.partial(scan_cells, ents), cells)},
+            "cone_us": {"index": per_call(index.query_cone, cones),
+                        "scan": per_call(functools.partial(scan_cone, ents), cones)},
+        })
+    return results
+
+
+def add_speedup(runs):
+    """Speedup of every run against the first one (normally --workers 0)."""
+    base = runs[0]
+    base_cast = base["stages_ms"].get("cast", 0.0)
+    for r in runs:
+        cast = r["stages_ms"].get("cast", 0.0)
+        r["speedup"] = {
+            "vs_workers": base["config"]["cast_workers"],
+            "fps": r["fps"] / base["fps"] if base["fps"] else 0.0,
+            "cast": base_cast / cast if cast else 0.0,
+        }
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Headless frame benchmark for the raycasting engines.")
+    ap.add_argument("--engine", nargs="+", default=["all"], choices=ENGINES + ["all"])
+    ap.add_argument("--frames", type=int, default=300, help="measured frames per engine")
+    ap.add_argument("--warmup", type=int, default=20, help="unmeasured frames before timing starts")
+    ap.add_argument("--width", type=int, default=960)
+    ap.add_argument("--height", type=int, default=600)
+    ap.add_argument("--map-size", type=int, default=0,
+                    help="generate an NxN map (0 = each engine's built-in map)")
+    ap.add_argument("--pillars", type=float, default=0.08,
+                    help="fraction of wall cells inside a --map-size map (lower = more open arena)")
+    ap.add_argument("--map-file", help="load this .pyrmap level (raycasting1, new, new2; "
+                                       "the others keep --map-size / their built-in map)")
+    ap.add_argument("--npcs", type=int, default=0, help="NPCs to place (raycasting1, new2)")
+    ap.add_argument("--caster", choices=["numpy", "scalar"], default="numpy", help="raycasting1 caster")
+    ap.add_argument("--walls", choices=["textured", "surfarray", "lines"], default="surfarray",
+                    help="wall renderer (raycasting1, new, new2; textured is raycasting1 only)")
+    ap.add_argument("--floors", choices=["textured", "flat"], default="flat",
+                    help="floor / ceiling renderer (raycasting1, new, new2)")
+    ap.add_argument("--target-ms", type=float, default=0.0,
+                    help="enable dynamic resolution with this frame-time budget (raycasting1, new, new2)")
+    ap.add_argument("--workers", type=int, nargs="+", default=[0],
+                    help="cast on a BandPool with N workers, one run per value (0 = no pool; "
+                         "raycasting1, new, new2); several values add a speedup table")
+    ap.add_argument("--pool", choices=["thread", "process"], default="thread",
+                    help="BandPool kind used with --workers")
+    ap.add_argument("--traversal", choices=["dda", "skip", "pyramid"], default="dda",
+                    help="scalar DDA: one cell per step, or skip open space with a distance field "
+                         "or an occupancy pyramid (raycasting1 --caster scalar, new, new2)")
+    ap.add_argument("--pvs", choices=["on", "off"], default="on",
+                    help="skip NPCs outside the player's potentially visible set (raycasting1, new2; "
+                         "numpy, maps up to 48x48 unless a .pvs file is given)")
+    ap.add_argument("--npc-index", choices=["on", "off"], default="on",
+                    help="raycasting1: keep NPCs in a spatial hash (render/minimap query it)")
+    ap.add_argument("--npc-store", choices=["soa", "list"], default="soa",
+                    help="NPCs in an NPCStore moved in one batch, or a list of NPC objects "
+                         "(raycasting1, new2; soa needs numpy)")
+    ap.add_argument("--sim-hz", type=float, default=0.0,
+                    help="raycasting1: update NPCs on a fixed tick of this rate and draw them "
+                         "interpolated (0 = one update per frame)")
+    ap.add_argument("--spatial", type=int, nargs="+", metavar="N",
+                    help="only benchmark spatial.SpatialHash with N entities (no engines)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="also write the JSON report to this file")
+    opts = ap.parse_args(argv)
+    if opts.map_size and opts.map_size < 8:
+        ap.error("--map-size must be at least 8")
+    return opts
+
+
+def main(argv=None):
+    opts = parse_args(argv)
+    if opts.spatial:
+        report = json.dumps({"spatial": bench_spatial(opts.spatial, opts.seed)}, indent=2)
+        print(report)
+        if opts.out:
+            with open(opts.out, "w", encoding="utf-8") as f:
+                f.write(report + "\n")
+        return
+    engines = ENGINES if "all" in opts.engine else opts.engine
+
+    pygame.init()
+    brain_dir = tempfile.mkdtemp(prefix="bench_brain_")
+    try:
+        # engines print debug output of their own; keep stdout for the report
+        with contextlib.redirect_stdout(sys.stderr):
+            results = []
+            for name in engines:
+                if name not in POOLED:
+                    results.append(run_engine(name, opts, brain_dir))
+                    continue
+                runs = [run_engine(name, opts, brain_dir, w) for w in opts.workers]
+                if len(runs) > 1:
+                    add_speedup(runs)
+                results.extend(runs)
+    finally:
+        shutil.rmtree(brain_dir, ignore_errors=True)
+        pygame.quit()
+
+    report = json.dumps({"results": results}, indent=2)
+    print(report)
+    if opts.out:
+        with open(opts.out, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Dynamic resolution for the column renderers.
+
+The 3D view is cast and rasterized at an internal column count and
+stretched to the window. ResolutionScaler picks that column count from
+the measured frame time (work only, not the clock.tick sleep):
+
+    scaler = ResolutionScaler(WIDTH, target_ms=1000 / FPS)
+    while running:
+        cols = scaler.columns
+        ... cast `cols` rays, draw them into a (cols, HEIGHT) view ...
+        stretch_view(view, screen)
+        zbuffer = stretch_columns(zbuffer, WIDTH)   # for sprites
+        ...
+        scaler.update(timer.last_frame_ms())
+
+The level drops one step when the smoothed frame time stays above
+target * down_ratio and rises one step when it stays below
+target * up_ratio; the gap between the two and the hold period after
+every change keep it from oscillating.
+"""
+
+import pygame
+
+LEVELS = (1.0, 0.8, 0.65, 0.5, 0.4, 0.3, 0.25)
+
+
+class ResolutionScaler:
+    def __init__(self, full_width, target_ms=1000.0 / 60, levels=LEVELS, down_ratio=1.10,
+                 up_ratio=0.70, hold_frames=30, smoothing=0.1, min_columns=120, enabled=False):
+        self.full_width = full_width
+        self.target_ms = target_ms
+        self.levels = tuple(levels)
+        self.down_ratio = down_ratio
+        self.up_ratio = up_ratio
+        self.hold_frames = hold_frames
+        self.smoothing = smoothing
+        self.min_columns = min_columns
+        self.enabled = enabled
+
+        self.level = 0
+        self.avg_ms = 0.0
+        self.changes = 0
+        self._hold = hold_frames
+
+    @property
+    def scale(self):
+        return self.levels[self.level] if self.enabled else 1.0
+
+    @property
+    def columns(self):
+        if not self.enabled:
+            return self.full_width
+        return min(self.full_width, max(self.min_columns, int(self.full_width * self.levels[self.level])))
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.level = 0
+        self.avg_ms = 0.0
+        self._hold = self.hold_frames
+
+    def update(self, frame_ms):
+        """Feed the last frame's work time; returns True when the level changed."""
+        if not self.enabled:
+            return False
+        if self.avg_ms == 0.0:
+            self.avg_ms = frame_ms
+        else:
+            self.avg_ms += (frame_ms - self.avg_ms) * self.smoothing
+        if self._hold > 0:
+            self._hold -= 1
+            return False
+
+        level = self.level
+        if self.avg_ms > self.target_ms * self.down_ratio and level < len(self.levels) - 1:
+            level += 1
+        elif self.avg_ms < self.target_ms * self.up_ratio and level > 0:
+            level -= 1
+        if level == self.level:
+            return False
+        self.level = level
+        self.changes += 1
+        self._hold = self.hold_frames
+        return True
+
+    def label(self, height):
+        mode = "auto" if self.enabled else "fixed"
+        return f"{self.columns}x{height} {mode}"
+
+
+def stretch_columns(values, width):
+    """Nearest-neighbour stretch of a per-column list to `width` entries."""
+    n = len(values)
+    if n == width:
+        return values
+    return [values[x * n // width] for x in range(width)]
+
+
+def stretch_view(view, screen):
+    """Draw `view` stretched over the whole `screen` (a plain blit when sizes match)."""
+    size = screen.get_size()
+    if view.get_size() == size:
+        screen.blit(view, (0, 0))
+    else:
+        pygame.transform.scale(view, size, screen)
@@ -0,0 +1,58 @@
+"""
+Fixed-rate simulation clock with render interpolation.
+
+The game loop still renders once per frame, but movement, NPCs, learning
+and weapon timers advance in ticks of exactly 1 / hz seconds, so their
+outcome no longer depends on the frame rate:
+
+    sim = FixedStep(hz=30)
+    while running:
+        frame_dt = clock.tick(FPS) / 1000.0
+        for _ in range(sim.advance(frame_dt)):
+            prev = state
+            state = step(state, sim.dt)
+        draw(lerp(prev, state, sim.alpha))
+
+advance() adds the frame time to an accumulator and returns how many
+whole ticks it holds. The remainder, as a fraction of a tick, is `alpha`.
+Drawing the state `alpha` of the way from the previous tick to the
+current one keeps motion smooth at any refresh rate, at the price of
+showing the world up to one tick late.
+
+A frame that would need more than `max_steps` ticks (a stall, a debugger
+pause) runs only max_steps and drops the rest of its time. The game then
+slows down for that frame instead of falling further behind every frame.
+The dropped time is counted in `dropped`.
+"""
+
+
+class FixedStep:
+    def __init__(self, hz=30.0, max_steps=5):
+        self.hz = float(hz)
+        self.dt = 1.0 / self.hz
+        self.max_steps = max_steps
+        self.acc = 0.0
+        self.ticks = 0
+        self.dropped = 0.0  # seconds of frame time discarded by the max_steps cap
+
+    def advance(self, frame_dt):
+        """Add `frame_dt` seconds; returns the number of ticks to run now."""
+        self.acc += frame_dt
+        steps = int(self.acc / self.dt + 1e-9)  # 1e-9: don't lose a tick to rounding
+        if steps > self.max_steps:
+            self.dropped += (steps - self.max_steps) * self.dt
+            steps = self.max_steps
+            self.acc %= self.dt  # keep only the fraction of a tick
+        else:
+            self.acc = max(0.0, self.acc - steps * self.dt)
+        self.ticks += steps
+        return steps
+
+    @property
+    def alpha(self):
+        """How far the render time is between the previous tick and the current one (0..1)."""
+        return min(1.0, self.acc / self.dt)
+
+
+def lerp(a, b, t):
+    return a + (b - a) * t
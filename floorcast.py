@@ -0,0 +1,124 @@
+"""
+Textured floor and ceiling for the framebuffer renderer.
+
+Every screen row below the horizon looks at the floor at one fixed
+distance, and the row the same distance above it at the ceiling. The
+distance depends only on the row and the projection, so FloorCaster keeps
+it in a table per resolution, with the shade band of each row:
+
+    floors = FloorCaster.default(rasterizer.map_colors)
+    background = floors.draw(rasterizer, pos_x, pos_y, ray_dir_x, ray_dir_y, proj)
+    rasterizer.draw_columns(half, colors, visible, background)
+
+A frame then computes the world position of every pixel as
+pos + row_distance[y] * ray_dir[x], for all pixels at once. One
+(2 * columns, 2) x (2, rows) matrix product does this for both axes, and
+only for the floor: a ceiling row at the same distance above the horizon
+sees the same position. The positions are wrapped to texel coordinates,
+and one gather reads the pre-shaded, pre-mapped texels into a
+(width, height) pixel array. The walls are drawn over that array as their
+background.
+
+`ray_dir` is per column, scaled so its component along the view
+direction is 1 (plane-camera ray directions are already like that), so
+the row distances are perpendicular like the wall distances. Cells
+outside the map wrap like any other position. Requires numpy.
+"""
+
+import os
+
+import numpy as np
+import pygame
+
+from walltex import SHADE_BANDS, load_texture, make_texture
+
+EYE_HEIGHT = 0.5  # camera height in wall heights (walls are centred on the horizon)
+
+
+class FloorCaster:
+    def __init__(self, floor_image, ceil_image, map_colors, shade=None, bands=SHADE_BANDS):
+        """Square (S, S, 3) uint8 images indexed [u, v], S a power of two.
+
+        `map_colors`: (N, 3) RGB -> mapped pixels (WallRasterizer.map_colors).
+        `shade`: distance array -> brightness 0..1 per row; None keeps full brightness.
+        """
+        self.size = floor_image.shape[0]
+        self.shift = self.size.bit_length() - 1
+        self.shade = shade
+        self.bands = bands
+        levels = np.arange(bands) / (bands - 1.0)
+        # [floor band 0, ..., floor band B-1, ceiling band 0, ...], each S * S texels
+        planes = np.stack([floor_image, ceil_image]).astype(np.float64).reshape(2, 1, -1, 3)
+        shaded = (planes * levels[None, :, None, None]).astype(np.uint8)
+        self.texels = map_colors(shaded.reshape(-1, 3))
+        self._rows = {}  # (height, horizon, proj) -> (distances, texel bases), per row
+        self._bufs = {}  # (width, height) -> work arrays
+
+    @classmethod
+    def default(cls, map_colors, shade=None, floor_path="assets/floor.png", ceil_path="assets/ceiling.png"):
+        """assets/floor.png and assets/ceiling.png, or the generated tiles and panels."""
+        images = []
+        for path, kind in ((floor_path, 3), (ceil_path, 4)):
+            try:
+                images.append(load_texture(path) if os.path.exists(path) else make_texture(kind))
+            except (pygame.error, ValueError):
+                images.append(make_texture(kind))
+        return cls(images[0], images[1], map_colors, shade)
+
+    def row_table(self, height, horizon, proj):
+        """Distances for rows 0.5, 1.5, ... pixels from the horizon, and per screen row the texel base."""
+        key = (height, horizon, proj)
+        table = self._rows.get(key)
+        if table is None:
+            dy = np.arange(height) - horizon + 0.5
+            dist = EYE_HEIGHT * proj / np.abs(dy)
+            if self.shade is None:
+                band = np.full(height, self.bands - 1)
+            else:
+                band = np.rint(np.clip(self.shade(dist), 0.0, 1.0) * (self.bands - 1)).astype(np.intp)
+            plane = (dy < 0) * self.bands  # ceiling rows use the second texture
+            base = ((plane + band) << (2 * self.shift)).astype(np.int32)
+            # a ceiling row sees the same floor position as the floor row mirrored about the horizon
+            near = EYE_HEIGHT * proj / (np.arange(max(horizon, height - horizon)) + 0.5)
+            table = self._rows[key] = (near.astype(np.float32), base)
+        return table
+
+    def draw(self, rasterizer, pos_x, pos_y, ray_dir_x, ray_dir_y, proj):
+        """Floor and ceiling for every column of `rasterizer`; returns the (width, height) pixels.
+
+        ray_dir_x / ray_dir_y: one direction per column (see the module docstring);
+        proj: vertical projection scale, pixels per wall height at distance 1.
+        """
+        width, height, horizon = rasterizer.width, rasterizer.height, rasterizer.horizon
+        dist, base = self.row_table(height, horizon, proj)
+        bufs = self._bufs.get((width, height))
+        if bufs is None:
+            bufs = self._bufs[(width, height)] = (
+                np.empty((2 * width, 2), dtype=np.float32),
+                np.ones((2, len(dist)), dtype=np.float32),
+                np.empty((2 * width, len(dist)), dtype=np.float32),
+                np.empty((2 * width, len(dist)), dtype=np.int32),
+                np.empty((width, height), dtype=np.int32),
+                np.empty((width, height), dtype=rasterizer.pixels.dtype),
+            )
+        rays, rows, world, texel, idx, out = bufs
+
+        # world * S = [ray_dir * S, pos * S] @ [dist, 1]: u for the first width rows, v after
+        s = self.size
+        rays[:width, 0] = ray_dir_x
+        rays[width:, 0] = ray_dir_y
+        rays[:width, 1] = pos_x
+        rays[width:, 1] = pos_y
+        rays *= s
+        rows[0] = dist
+        np.matmul(rays, rows, out=world)
+        np.copyto(texel, world, casting="unsafe")
+        texel &= s - 1
+        u, v = texel[:width], texel[width:]
+        u <<= self.shift
+        u |= v
+        # one texel offset per distance; floor rows go down from the horizon, ceiling rows up
+        np.add(u[:, :height - horizon], base[None, horizon:], out=idx[:, horizon:])
+        np.add(u[:, horizon - 1::-1], base[None, :horizon], out=idx[:, :horizon])
+        np.take(self.texels, idx, out=out, mode="wrap")  # indices are in range; "wrap" skips the check
+        return out
@@ -0,0 +1,104 @@
+"""
+Framebuffer wall rasterizer shared by raycasting1.py, new.py and new2.py.
+
+Instead of one pygame.draw.line per screen column, the wall columns are
+written into a persistent (width, height) array of mapped pixels with
+array operations and pushed to a surface with a single surfarray write.
+
+Requires numpy (pygame.surfarray depends on it).
+"""
+
+import numpy as np
+import pygame
+
+
+class WallRasterizer:
+    """Persistent pixel buffer for the 3D view.
+
+    Walls are centred on the horizon, so a column is fully described by its
+    half height. `_spans[k]` is the precomputed row mask for half height k
+    (the last row is all False and is used for empty columns), which turns
+    the per-frame work into one table gather and one masked copy.
+    """
+
+    def __init__(self, width, height, ceil_color, floor_color):
+        self.width = width
+        self.height = height
+        self.horizon = height // 2
+        self.surface = pygame.Surface((width, height))
+
+        bg = np.empty((width, height, 3), dtype=np.uint8)
+        bg[:, : self.horizon] = ceil_color
+        bg[:, self.horizon :] = floor_color
+        self.background = pygame.surfarray.map_array(self.surface, bg)
+        self.pixels = np.empty_like(self.background)
+
+        dist = np.abs(np.arange(height) - self.horizon)
+        spans = np.zeros((height + 1, height), dtype=bool)
+        spans[:height] = dist[None, :] <= np.arange(height)[:, None]
+        self._spans = spans
+        self._idx = self._idx_wh = None  # draw_strips() index buffers, made on first use
+
+    def map_colors(self, colors):
+        """(N, 3) uint8 RGB -> (N,) mapped pixel values for this surface."""
+        return pygame.surfarray.map_array(self.surface, colors[None, :, :])[0]
+
+    def draw_columns(self, half, colors, visible=None, background=None):
+        """Fill column x from horizon - half[x] to horizon + half[x] with colors[x].
+
+        half: int array of length width (values past the screen are clipped)
+        colors: uint8 array of shape (width, 3)
+        visible: optional bool array; columns where it is False keep the background
+        background: optional (width, height) pixels to draw over (e.g. floorcast.py)
+            instead of the flat ceiling / floor
+        """
+        rows = np.clip(half, 0, self.height - 1)
+        if visible is not None:
+            rows = np.where(visible, rows, self.height)
+        mask = self._spans[rows]
+
+        np.copyto(self.pixels, self.background if background is None else background)
+        np.copyto(self.pixels, self.map_colors(colors)[:, None], where=mask)
+        pygame.surfarray.blit_array(self.surface, self.pixels)
+        return self.surface
+
+    def draw_strips(self, texels, base, rows, background=None, mask=None):
+        """Fill every column from a pre-sliced texture strip (see walltex.py).
+
+        Pixel (x, y) becomes texels[base[x] + rows[x, y]]: `base` picks the
+        strip, `rows` (width, height) the position in it. A strip holds the
+        ceiling colour at position 0 and the floor colour at its end, so one
+        gather also paints the background above and below the wall.
+
+        The gather writes straight into the surface, which stores rows of
+        pixels, so the indices are built in (height, width) order and no
+        blit_array copy is needed.
+
+        With `background` ((width, height) pixels, e.g. floorcast.py), pixels
+        where `mask` is True (above and below the walls) come from it instead.
+        """
+        if background is not None:
+            if self._idx_wh is None:
+                self._idx_wh = np.empty((self.width, self.height), dtype=np.intp)
+            np.add(rows, base[:, None], out=self._idx_wh)
+            np.take(texels, self._idx_wh, out=self.pixels, mode="wrap")
+            np.copyto(self.pixels, background, where=mask)
+            pygame.surfarray.blit_array(self.surface, self.pixels)
+            return self.surface
+        if self._idx is None:
+            self._idx = np.empty((self.height, self.width), dtype=np.intp)
+        idx = self._idx
+        np.add(rows.T, base[None, :], out=idx)
+        try:
+            view = pygame.surfarray.pixels2d(self.surface)
+        except ValueError:  # 24-bit surfaces have no 2D pixel view
+            np.take(texels, idx.T, out=self.pixels)
+            pygame.surfarray.blit_array(self.surface, self.pixels)
+        else:
+            # indices are always in range; "wrap" skips the bounds check and its buffering
+            np.take(texels.view(view.dtype), idx, out=view.T, mode="wrap")
+            del view  # unlocks the surface for blitting
+        return self.surface
+
+    def present(self, screen, dest=(0, 0)):
+        screen.blit(self.surface, dest)
@@ -0,0 +1,148 @@
+"""
+Always-on per-stage frame timing.
+
+    timer = FrameTimer(["input", "cast", "walls", "flip"])
+    while running:
+        clock.tick(FPS)
+        timer.begin_frame()
+        handle_input();  timer.mark("input")
+        cast();          timer.mark("cast")
+        ...
+        timer.end_frame()
+
+Each mark() is one perf_counter call plus a float add into a preallocated
+ring buffer, so it is cheap enough to leave enabled. The last `capacity`
+frames can be drawn as a stacked frame-time graph or exported to CSV.
+"""
+
+import time
+from array import array
+
+import pygame
+
+STAGE_COLORS = [
+    (110, 180, 255), (255, 140, 120), (255, 220, 90), (140, 230, 140),
+    (200, 140, 255), (255, 170, 60), (90, 220, 220), (230, 230, 230),
+    (255, 110, 200), (160, 160, 100),
+]
+
+
+class FrameTimer:
+    def __init__(self, stages, capacity=240):
+        self.stages = list(stages)
+        self.capacity = capacity
+        self.frames = 0  # total frames recorded (ring head = frames % capacity)
+        self._n = len(self.stages)
+        self._index = {name: i for i, name in enumerate(self.stages)}
+        self._buf = array("d", bytes(8 * capacity * self._n))
+        self._base = 0
+        self._last = 0.0
+
+        self._graph = None
+        self._graph_frame = 0
+        self._legend = None
+
+    # ----------------- recording -----------------
+    def begin_frame(self):
+        self._base = (self.frames % self.capacity) * self._n
+        for i in range(self._base, self._base + self._n):
+            self._buf[i] = 0.0
+        self._last = time.perf_counter()
+
+    def mark(self, stage):
+        """Charge the time since the previous mark (or begin_frame) to `stage`."""
+        now = time.perf_counter()
+        self._buf[self._base + self._index[stage]] += now - self._last
+        self._last = now
+
+    def end_frame(self):
+        self.frames += 1
+
+    # ----------------- queries -----------------
+    def rows(self):
+        """Recorded frames oldest -> newest, each a list of per-stage seconds."""
+        count = min(self.frames, self.capacity)
+        first = self.frames - count
+        out = []
+        for f in range(first, self.frames):
+            base = (f % self.capacity) * self._n
+            out.append(self._buf[base:base + self._n].tolist())
+        return out
+
+    def last_frame_ms(self):
+        """Total of the most recently ended frame, in ms."""
+        if not self.frames:
+            return 0.0
+        base = ((self.frames - 1) % self.capacity) * self._n
+        return 1000.0 * sum(self._buf[base:base + self._n])
+
+    def averages_ms(self):
+        rows = self.rows()
+        if not rows:
+            return {name: 0.0 for name in self.stages}
+        return {name: 1000.0 * sum(r[i] for r in rows) / len(rows)
+                for i, name in enumerate(self.stages)}
+
+    def export_csv(self, path):
+        first = self.frames - min(self.frames, self.capacity)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("frame,total_ms," + ",".join(f"{s}_ms" for s in self.stages) + "\n")
+            for i, row in enumerate(self.rows()):
+                cells = [f"{1000.0 * v:.4f}" for v in row]
+                f.write(f"{first + i},{1000.0 * sum(row):.4f}," + ",".join(cells) + "\n")
+        return path
+
+    # ----------------- graph -----------------
+    def draw_graph(self, screen, pos, font=None, height=100, ms_range=33.3):
+        """Stacked frame-time bars, newest on the right, one pixel per frame.
+
+        Only the newest column is drawn each frame (the graph surface is
+        scrolled); a full redraw happens after the graph was hidden."""
+        if self._graph is None:
+            self._graph = pygame.Surface((self.capacity, height))
+            self._graph.set_alpha(210)
+            self._graph_frame = 0
+
+        scale = height / ms_range
+        new = self.frames - self._graph_frame
+        if new > 1 or self._graph_frame == 0:
+            self._graph.fill((12, 12, 16))
+            first = self.frames - min(self.frames, self.capacity)
+            for f in range(first, self.frames):
+                self._draw_column(self.capacity - (self.frames - f), f, height, scale)
+        elif new == 1:
+            self._graph.scroll(-1, 0)
+            self._draw_column(self.capacity - 1, self.frames - 1, height, scale)
+        self._graph_frame = self.frames
+
+        x, y = pos
+        screen.blit(self._graph, (x, y))
+        for ms in (16.7, 33.3):
+            gy = y + height - int(ms * scale)
+            if gy >= y:
+                pygame.draw.line(screen, (80, 80, 90), (x, gy), (x + self.capacity - 1, gy))
+
+        if font is not None:
+            if self._legend is None:
+                self._legend = [font.render(s, True, STAGE_COLORS[i % len(STAGE_COLORS)])
+                                for i, s in enumerate(self.stages)]
+            lx = x + self.capacity + 6
+            for i, label in enumerate(self._legend):
+                screen.blit(label, (lx, y + i * (label.get_height() - 2)))
+
+    def _draw_column(self, gx, frame, height, scale):
+        g = self._graph
+        pygame.draw.line(g, (12, 12, 16), (gx, 0), (gx, height - 1))
+        base = (frame % self.capacity) * self._n
+        y = height
+        for i in range(self._n):
+            h = self._buf[base + i] * 1000.0 * scale
+            if h <= 0:
+                continue
+            top = y - h
+            if top < 0:
+                top = 0
+            pygame.draw.line(g, STAGE_COLORS[i % len(STAGE_COLORS)], (gx, int(top)), (gx, int(y) - 1))
+            y = top
+            if y <= 0:
+                break
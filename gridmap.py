@@ -0,0 +1,195 @@
+"""
+Compact tile map shared by the engines' hot paths.
+
+GridMap stores the map row-major in one contiguous byte buffer (one uint8
+per cell, cells[y * width + x]) next to a `solid` mask of the same layout
+that is non-zero for walls, so a wall test is a single flat index instead
+of nested list lookups and object comparisons:
+
+    world = GridMap.from_rows(worldMap)          # raycasting1 int rows
+    world = GridMap.from_strings(MAP_STR)        # new/new2 "1P00..." rows
+    if world.solid[map_y * world.width + map_x]: ...
+    world.is_solid(x, y)                         # float coords, out of bounds = solid
+
+Which values are solid is decided by a 256-entry lookup table (`solid_lut`).
+With the default (every non-zero value is solid) the mask is the cell
+buffer itself; any other table builds a 0/1 mask with one bytes.translate
+call. The cell buffer can be any writable or read-only buffer, e.g. a
+memory-mapped map file (see mapfile.py), and is then used without copying.
+`solid_array()` is a zero-copy (height, width) numpy view of the mask for
+the vectorized casters; `cells_array()` is the same over the tile values.
+
+CPython subscripts lists of ints faster than it computes y * width + x
+and subscripts a bytearray, so pure-Python DDA loops should read
+`solid_rows()`: a cached list-of-rows copy of the mask that set() keeps in
+sync. Maps above ROWS_COPY_LIMIT cells get memoryview rows instead, so a
+4096x4096 level is never expanded into Python ints.
+
+distance_rows() is the same kind of view over the distance-to-nearest-wall
+field (distfield.py) that the casters use to skip empty space. It is built
+on first use and dropped by set(). occupancy() is the block pyramid
+(occupancy.py) used for the same purpose on huge maps; set() updates it in
+place. pvs() holds the potentially visible sets (pvs.py) the sprite and NPC
+code use to skip entities the player cannot see; set() drops them too.
+
+Rows are also reachable as grid[row][col] (memoryview rows), so code that
+expects a list of rows, such as Minimap, can take a GridMap directly.
+"""
+
+SOLID_NONZERO = bytes([0] + [1] * 255)
+ROWS_COPY_LIMIT = 1 << 20  # solid_rows() copies into lists up to this many cells
+
+
+class GridMap:
+    def __init__(self, width, height, cells=None, solid_lut=SOLID_NONZERO, copy=True):
+        """`cells` is copied into a bytearray unless copy=False (then any buffer is used as is)."""
+        self.width = width
+        self.height = height
+        if cells is None:
+            cells = bytearray(width * height)
+        elif copy:
+            cells = bytearray(cells)
+        self.cells = cells
+        if len(self.cells) != width * height:
+            raise ValueError(f"expected {width * height} cells, got {len(self.cells)}")
+        self.solid_lut = bytes(solid_lut)
+        self._shared_mask = self.solid_lut == SOLID_NONZERO
+        if self._shared_mask:
+            self.solid = self.cells
+        else:
+            self.solid = bytearray(bytes(self.cells).translate(self.solid_lut))
+        self.version = 0  # bumped by set()
+        self._solid_rows = None
+        self._distance = None  # (cap, rows) from distance_rows()
+        self._occupancy = None
+        self._pvs = None  # False once a build was refused (no numpy / too big)
+
+    @classmethod
+    def from_rows(cls, rows, solid_lut=SOLID_NONZERO):
+        """Rows of ints 0..255 (0 = free)."""
+        height, width = len(rows), len(rows[0])
+        cells = bytearray(width * height)
+        for y, row in enumerate(rows):
+            if len(row) != width:
+                raise ValueError(f"row {y} has {len(row)} cells, expected {width}")
+            cells[y * width:(y + 1) * width] = bytes(row)
+        return cls(width, height, cells, solid_lut)
+
+    @classmethod
+    def from_strings(cls, rows, free="0P"):
+        """Rows of characters: digits keep their value, `free` characters are 0, anything else is 1."""
+        return cls.from_rows([[int(ch) if ch.isdigit() else (0 if ch in free else 1) for ch in row]
+                              for row in rows])
+
+    # ----------------- access -----------------
+    def index(self, x, y):
+        return y * self.width + x
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def value(self, x, y):
+        return self.cells[y * self.width + x]
+
+    def is_solid(self, x, y):
+        """Wall test at world coordinates; anything outside the map counts as solid."""
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return True
+        return self.solid[int(y) * self.width + int(x)] != 0
+
+    def set(self, x, y, value):
+        i = y * self.width + x
+        self.cells[i] = value
+        if not self._shared_mask:
+            self.solid[i] = self.solid_lut[value]
+        if isinstance(self._solid_rows, list):
+            self._solid_rows[y][x] = self.solid[i]
+        self._distance = None
+        self._pvs = None
+        if self._occupancy is not None:
+            self._occupancy.update(x, y)
+        self.version += 1
+
+    def free_cells(self):
+        """Centres (x + 0.5, y + 0.5) of every non-solid cell, row by row."""
+        w = self.width
+        return [(i % w + 0.5, i // w + 0.5) for i, s in enumerate(self.solid) if not s]
+
+    def random_free_cell(self, rng, tries=1000):
+        """Centre of a uniformly chosen non-solid cell (None if `tries` samples all hit walls).
+        Cheaper than free_cells() on big maps."""
+        n = self.width * self.height
+        solid = self.solid
+        for _ in range(tries):
+            i = rng.randrange(n)
+            if not solid[i]:
+                return (i % self.width + 0.5, i // self.width + 0.5)
+        return None
+
+    # ----------------- views -----------------
+    def rows(self):
+        """The map as a list of int rows (a copy)."""
+        w = self.width
+        return [list(self.cells[y * w:(y + 1) * w]) for y in range(self.height)]
+
+    def _as_rows(self, buf):
+        w = self.width
+        if w * self.height <= ROWS_COPY_LIMIT:
+            return [list(buf[y * w:(y + 1) * w]) for y in range(self.height)]
+        view = memoryview(buf)
+        return [view[y * w:(y + 1) * w] for y in range(self.height)]
+
+    def solid_rows(self):
+        """solid mask as rows (lists of ints, or memoryviews above ROWS_COPY_LIMIT cells);
+        the same object for the life of the map."""
+        if self._solid_rows is None:
+            self._solid_rows = self._as_rows(self.solid)
+        return self._solid_rows
+
+    def distance_rows(self, cap=None):
+        """Chebyshev distance to the nearest wall (outside counts as wall), clamped to `cap`,
+        as rows like solid_rows(). Built on first use, rebuilt after set()."""
+        import distfield
+        cap = distfield.DEFAULT_CAP if cap is None else cap
+        if self._distance is None or self._distance[0] != cap:
+            field = distfield.build(self.solid, self.width, self.height, cap)
+            self._distance = (cap, self._as_rows(field))
+        return self._distance[1]
+
+    def occupancy(self):
+        """OccupancyPyramid over the solid mask, built on first use and kept current by set()."""
+        if self._occupancy is None:
+            from occupancy import OccupancyPyramid
+            self._occupancy = OccupancyPyramid(self)
+        return self._occupancy
+
+    def pvs(self):
+        """PotentiallyVisibleSets of this map, built on first use and dropped by set();
+        None without numpy or above pvs.BUILD_LIMIT cells (unless given to set_pvs())."""
+        if self._pvs is None:
+            import pvs
+            self._pvs = pvs.build(self) or False
+        return self._pvs or None
+
+    def set_pvs(self, sets):
+        """Use precomputed sets (pvs.load()) instead of building them."""
+        self._pvs = sets
+
+    def solid_array(self):
+        """(height, width) uint8 numpy view of the solid mask (shares memory)."""
+        import numpy as np
+        return np.frombuffer(self.solid, dtype=np.uint8).reshape(self.height, self.width)
+
+    def cells_array(self):
+        """(height, width) uint8 numpy view of the tile values (shares memory)."""
+        import numpy as np
+        return np.frombuffer(self.cells, dtype=np.uint8).reshape(self.height, self.width)
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.height:
+            raise IndexError(row)
+        w = self.width
+        return memoryview(self.cells)[row * w:(row + 1) * w]
@@ -0,0 +1,223 @@
+"""
+Binary map files (.pyrmap) and the text / Python-literal converters.
+
+Layout, little-endian:
+
+    offset  size  field
+    0       4     magic b"PYRM"
+    4       2     format version (1)
+    6       2     payload offset (header + palette, padded to 64 bytes)
+    8       4     width
+    12      4     height
+    16      4     spawn x (float32, map units)
+    20      4     spawn y
+    24      2     palette entries
+    26      6     reserved (zero)
+    32      5*n   palette: value u8, flags u8 (bit 0 = solid), r g b u8
+    ...           zero padding up to the payload offset
+    payload w*h   tile values, uint8, row-major (cells[y * width + x])
+
+load() memory-maps the file and hands the payload to GridMap without
+copying, so a 4096x4096 level opens instantly and the casters read tiles
+straight from the page cache. The mapping is copy-on-write: GridMap.set()
+edits stay in memory and never reach the file. A `<path>.pvs` file next to
+the map (see pvs.py) is loaded as the grid's visibility sets when it
+matches the map.
+
+Text format (.txt): one character per cell, '0' / '.' / ' ' free, '1'-'9'
+tile values, 'P' the spawn (free), lines starting with ';' ignored.
+
+    python mapfile.py convert module:raycasting1 level.pyrmap
+    python mapfile.py convert level.txt level.pyrmap
+    python mapfile.py convert level.pyrmap level.txt
+    python mapfile.py info level.pyrmap
+"""
+
+import argparse
+import importlib
+import mmap
+import os
+import struct
+from dataclasses import dataclass, field
+
+import pvs
+from gridmap import GridMap, SOLID_NONZERO
+
+MAGIC = b"PYRM"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIffH6x")
+PALETTE_ENTRY = struct.Struct("<BB3B")
+ALIGN = 64
+FLAG_SOLID = 1
+
+
+@dataclass
+class MapFile:
+    grid: GridMap
+    spawn: tuple
+    palette: dict = field(default_factory=dict)  # value -> (solid, (r, g, b))
+    path: str = None
+
+
+def default_palette(grid):
+    """Every value present in the map; non-zero values are solid, shaded by value."""
+    palette = {}
+    for v in sorted(set(grid.cells)):
+        shade = 40 if v == 0 else min(255, 120 + 35 * v)
+        palette[v] = (v != 0, (shade, shade, min(255, shade + 10)))
+    return palette
+
+
+def solid_lut(palette):
+    """256-entry solid table for GridMap; values missing from the palette follow value != 0."""
+    lut = bytearray(SOLID_NONZERO)
+    for v, (solid, _) in palette.items():
+        lut[v] = 1 if solid else 0
+    return bytes(lut)
+
+
+# ----------------------------- binary ---------------------------------
+def save(path, grid, spawn, palette=None):
+    """Write `grid` as a .pyrmap file (via a temp file, so readers never see half a map)."""
+    palette = default_palette(grid) if palette is None else palette
+    head = bytearray(HEADER.pack(MAGIC, VERSION, 0, grid.width, grid.height,
+                                 spawn[0], spawn[1], len(palette)))
+    for v, (solid, rgb) in sorted(palette.items()):
+        head += PALETTE_ENTRY.pack(v, FLAG_SOLID if solid else 0, *rgb)
+    offset = -(-len(head) // ALIGN) * ALIGN
+    if offset > 0xFFFF:
+        raise ValueError("palette too large")
+    struct.pack_into("<H", head, 6, offset)
+    head += bytes(offset - len(head))
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(head)
+        f.write(grid.cells)
+    os.replace(tmp, path)
+    return path
+
+
+def load(path):
+    """Memory-map a .pyrmap file; the returned grid reads its tiles from the mapping."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError(f"{path}: not a map file (too short)")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    magic, version, offset, width, height, sx, sy, count = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: bad magic {magic!r}")
+    if version != VERSION:
+        raise ValueError(f"{path}: unsupported format version {version}")
+    if offset < HEADER.size + count * PALETTE_ENTRY.size or offset + width * height > size:
+        raise ValueError(f"{path}: truncated or corrupt ({size} bytes for {width}x{height})")
+
+    palette = {}
+    for i in range(count):
+        v, flags, r, g, b = PALETTE_ENTRY.unpack_from(mm, HEADER.size + i * PALETTE_ENTRY.size)
+        palette[v] = (bool(flags & FLAG_SOLID), (r, g, b))
+
+    cells = memoryview(mm)[offset:offset + width * height]
+    grid = GridMap(width, height, cells, solid_lut(palette), copy=False)
+    sidecar = pvs.sidecar_path(path)
+    if os.path.exists(sidecar):
+        try:
+            grid.set_pvs(pvs.load(sidecar, grid))
+        except ValueError:
+            pass  # stale or damaged: GridMap.pvs() builds the sets instead (small maps)
+    return MapFile(grid, (sx, sy), palette, path)
+
+
+# ------------------------------ text ----------------------------------
+def parse_text(lines):
+    """Text rows -> (GridMap, spawn). Rows are padded with free cells to the widest row."""
+    rows = [line.rstrip("\r\n") for line in lines]
+    rows = [r for r in rows if r and not r.startswith(";")]
+    if not rows:
+        raise ValueError("empty map")
+    width = max(len(r) for r in rows)
+    spawn = None
+    values = []
+    for y, row in enumerate(rows):
+        out = []
+        for x, ch in enumerate(row.ljust(width, "0")):
+            if ch == "P":
+                spawn = (x + 0.5, y + 0.5)
+                out.append(0)
+            elif ch in ".0 ":
+                out.append(0)
+            elif ch.isdigit():
+                out.append(int(ch))
+            else:
+                raise ValueError(f"unknown map character {ch!r} at row {y}, column {x}")
+        values.append(out)
+    grid = GridMap.from_rows(values)
+    if spawn is None:
+        spawn = next(iter(grid.free_cells()), (0.5, 0.5))
+    return grid, spawn
+
+
+def format_text(grid, spawn=None):
+    sx, sy = (int(spawn[0]), int(spawn[1])) if spawn else (-1, -1)
+    lines = []
+    for y in range(grid.height):
+        row = grid[y]
+        lines.append("".join("P" if (x, y) == (sx, sy) else str(min(9, v)) for x, v in enumerate(row)))
+    return "\n".join(lines) + "\n"
+
+
+def from_module(name):
+    """(GridMap, spawn) from an engine's built-in map literal (MAP_STR or worldMap + SPAWN)."""
+    m = importlib.import_module(name)
+    if hasattr(m, "MAP_STR"):
+        return parse_text(m.MAP_STR)
+    return GridMap.from_rows(m.worldMap), tuple(m.SPAWN)
+
+
+def read_any(src):
+    if src.startswith("module:"):
+        grid, spawn = from_module(src[len("module:"):])
+        return MapFile(grid, spawn, default_palette(grid), src)
+    if src.endswith(".txt"):
+        with open(src, encoding="utf-8") as f:
+            grid, spawn = parse_text(f)
+        return MapFile(grid, spawn, default_palette(grid), src)
+    return load(src)
+
+
+def write_any(dst, mf):
+    if dst.endswith(".txt"):
+        with open(dst, "w", encoding="utf-8") as f:
+            f.write(format_text(mf.grid, mf.spawn))
+        return dst
+    return save(dst, mf.grid, mf.spawn, mf.palette or None)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Convert and inspect .pyrmap map files.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    conv = sub.add_parser("convert", help="SRC (.txt, .pyrmap or module:NAME) -> DST (.txt or .pyrmap)")
+    conv.add_argument("src")
+    conv.add_argument("dst")
+    conv.add_argument("--spawn", type=float, nargs=2, metavar=("X", "Y"), help="override the spawn point")
+    info = sub.add_parser("info", help="print the header of a .pyrmap file")
+    info.add_argument("path")
+    opts = ap.parse_args(argv)
+
+    if opts.cmd == "convert":
+        mf = read_any(opts.src)
+        if opts.spawn:
+            mf.spawn = tuple(opts.spawn)
+        print(write_any(opts.dst, mf))
+    else:
+        mf = load(opts.path)
+        g = mf.grid
+        print(f"{mf.path}: {g.width}x{g.height}  spawn ({mf.spawn[0]:.2f}, {mf.spawn[1]:.2f})")
+        for v, (solid, rgb) in sorted(mf.palette.items()):
+            print(f"  {v:3d}  {'solid' if solid else 'free '}  rgb{rgb}")
+
+
+if __name__ == "__main__":
+    main()
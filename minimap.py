@@ -0,0 +1,150 @@
+"""
+Cached minimap shared by raycasting1.py, new.py, new2.py and ray.py.
+
+The tile layer is pre-rendered into chunk surfaces (chunk_cells x
+chunk_cells map cells each) that are only rebuilt when the map changes.
+The minimap shows a view_cells x view_cells window around the player,
+assembled from at most four chunks, so its cost does not grow with the
+map size; maps smaller than the window are shown whole, as before.
+The ray fan is one filled polygon instead of one line per ray.
+
+    mm = Minimap(wall_color, free_color, ray_color)
+    mm.begin(screen, grid, player_x, player_y)   # background + tiles, clips to the view
+    mm.draw_fan(screen, player_x, player_y, ray_ends)
+    pygame.draw.circle(screen, color, mm.to_screen(player_x, player_y), 3)
+    mm.end(screen)
+
+grid is indexed grid[row][col] (row = y); `solid` decides which cell
+values are walls. A GridMap is read through its solid mask instead.
+"""
+
+from collections import OrderedDict
+
+import pygame
+
+from gridmap import GridMap
+
+
+class Minimap:
+    def __init__(self, wall_color, free_color, ray_color, scale=8, padding=10,
+                 view_cells=32, chunk_cells=32, max_chunks=64, solid=None):
+        self.wall_color = wall_color
+        self.free_color = free_color
+        self.ray_color = ray_color
+        self.scale = scale
+        self.padding = padding
+        self.view_cells = view_cells
+        self.chunk_cells = chunk_cells
+        self.max_chunks = max_chunks
+        self.solid = solid or (lambda v: v != 0)
+
+        self.grid = None
+        self.map_w = self.map_h = 0
+        self.chunks = OrderedDict()
+        self.view_px = (0, 0)   # top-left of the view in minimap pixels
+        self.view_size = (0, 0)
+        self._fan = None
+        self._prev_clip = None
+
+    # ----------------- cache -----------------
+    def set_map(self, grid):
+        """Use `grid`; a different grid object drops every cached chunk."""
+        if grid is not self.grid:
+            self.grid = grid
+            self.map_h = len(grid)
+            self.map_w = len(grid[0])
+            self.chunks.clear()
+
+    def invalidate(self, x=None, y=None):
+        """Rebuild the chunk holding cell (x, y), or every chunk when no cell is given."""
+        if x is None or y is None:
+            self.chunks.clear()
+        else:
+            self.chunks.pop((int(x) // self.chunk_cells, int(y) // self.chunk_cells), None)
+
+    def _chunk(self, cx, cy):
+        key = (cx, cy)
+        surf = self.chunks.get(key)
+        if surf is not None:
+            self.chunks.move_to_end(key)
+            return surf
+
+        s = self.scale
+        c0, r0 = cx * self.chunk_cells, cy * self.chunk_cells
+        c1 = min(self.map_w, c0 + self.chunk_cells)
+        r1 = min(self.map_h, r0 + self.chunk_cells)
+        surf = pygame.Surface(((c1 - c0) * s, (r1 - r0) * s))
+        surf.fill(self.free_color)
+        grid, solid = self.grid, self.solid
+        if isinstance(grid, GridMap):
+            mask, w = grid.solid, grid.width
+            for r in range(r0, r1):
+                base = r * w
+                for c in range(c0, c1):
+                    if mask[base + c]:
+                        surf.fill(self.wall_color, ((c - c0) * s, (r - r0) * s, s, s))
+        else:
+            for r in range(r0, r1):
+                row = grid[r]
+                for c in range(c0, c1):
+                    if solid(row[c]):
+                        surf.fill(self.wall_color, ((c - c0) * s, (r - r0) * s, s, s))
+
+        self.chunks[key] = surf
+        if len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+        return surf
+
+    # ----------------- drawing -----------------
+    def to_screen(self, x, y):
+        return (self.padding + int(x * self.scale) - self.view_px[0],
+                self.padding + int(y * self.scale) - self.view_px[1])
+
+    def begin(self, screen, grid, focus_x, focus_y):
+        """Draw the frame and the tile window around (focus_x, focus_y), then clip to it."""
+        self.set_map(grid)
+        s = self.scale
+        full_w, full_h = self.map_w * s, self.map_h * s
+        view_w = min(full_w, self.view_cells * s)
+        view_h = min(full_h, self.view_cells * s)
+        vx = min(max(0, int(focus_x * s) - view_w // 2), full_w - view_w)
+        vy = min(max(0, int(focus_y * s) - view_h // 2), full_h - view_h)
+        self.view_px = (vx, vy)
+        self.view_size = (view_w, view_h)
+
+        ox = oy = self.padding
+        pygame.draw.rect(screen, (12, 12, 16), (ox - 2, oy - 2, view_w + 4, view_h + 4), border_radius=6)
+
+        self._prev_clip = screen.get_clip()
+        screen.set_clip(pygame.Rect(ox, oy, view_w, view_h))
+        chunk_px = self.chunk_cells * s
+        for cy in range(vy // chunk_px, (vy + view_h - 1) // chunk_px + 1):
+            for cx in range(vx // chunk_px, (vx + view_w - 1) // chunk_px + 1):
+                screen.blit(self._chunk(cx, cy), (ox + cx * chunk_px - vx, oy + cy * chunk_px - vy))
+
+    def draw_fan(self, screen, x, y, ends, alpha=150):
+        """Filled ray fan from (x, y) through the world-space ray end points `ends`."""
+        if not ends:
+            return
+        view_w, view_h = self.view_size
+        if self._fan is None or self._fan.get_size() != (view_w, view_h):
+            self._fan = pygame.Surface((view_w, view_h), pygame.SRCALPHA)
+        fan = self._fan
+        fan.fill((0, 0, 0, 0))
+
+        s = self.scale
+        vx, vy = self.view_px
+        points = [(int(x * s) - vx, int(y * s) - vy)]
+        points.extend((int(ex * s) - vx, int(ey * s) - vy) for ex, ey in ends)
+        pygame.draw.polygon(fan, (*self.ray_color, alpha), points)
+        screen.blit(fan, (self.padding, self.padding))
+
+    def view_cells_range(self):
+        """Inclusive cell range (x0, y0, x1, y1) shown by the last begin()."""
+        s = self.scale
+        vx, vy = self.view_px
+        view_w, view_h = self.view_size
+        return vx // s, vy // s, (vx + view_w - 1) // s, (vy + view_h - 1) // s
+
+    def end(self, screen):
+        screen.set_clip(self._prev_clip)
@@ -7,6 +7,9 @@ Controls:
   - A/D: strafe left/right
   - ←/→: rotate
   - M: toggle minimap
+  - F4: toggle wall renderer (surfarray / lines)
+  - F5: toggle dynamic resolution (fewer rays when frames run over budget)
+  - F6: toggle floor / ceiling (textured / flat, numpy)
   - ESC or window close: quit
 
 Features:
@@ -19,14 +22,33 @@ Features:
 Run:
   pip install pygame
   python main.py
+  python new.py level.pyrmap      # binary level, see mapfile.py
 """
 
 import math
 import sys
+import time
 from dataclasses import dataclass
 
 import pygame
 
+from bandpool import BandPool
+from distfield import march
+from occupancy import march as march_pyramid
+from dynres import ResolutionScaler, stretch_view
+from gridmap import GridMap
+import mapfile
+from minimap import Minimap
+
+try:
+    import numpy as np
+    from framebuffer import WallRasterizer
+    from floorcast import FloorCaster
+except ImportError:  # no numpy: only the per-line wall path is available
+    np = None
+    WallRasterizer = None
+    FloorCaster = None
+
 # ----------------------------- Config ---------------------------------
 WIDTH, HEIGHT = 960, 600
 HALF_W, HALF_H = WIDTH // 2, HEIGHT // 2
@@ -37,6 +59,13 @@ NUM_RAYS = WIDTH  # one ray per column for simplicity (you can lower for speed)
 MAX_DEPTH = 20
 MOVE_SPEED = 3.0  # tiles per second
 ROT_SPEED = math.radians(120)  # deg/sec
+WALL_RENDERER = "surfarray"  # "surfarray" (framebuffer) or "lines" (one draw.line per column); F4 toggles
+FLOOR_RENDERER = "textured"  # "textured" (floorcast.py, needs numpy) or "flat" colours; F6 toggles
+CAST_WORKERS = 0  # >0: cast column bands on a worker pool (see bandpool.py)
+CAST_POOL = "process"  # "process" (pure-Python DDA holds the GIL) or "thread"
+TRAVERSAL = "dda"  # jump over open space (same hits, fewer steps): "skip" distance field, "pyramid" block pyramid
+DYNAMIC_RES = False  # cast fewer rays and stretch them when frames run over budget; F5 toggles
+TARGET_FRAME_MS = 1000.0 / FPS
 
 # Map (1 = wall, 0 = empty)
 # You can edit this layout freely; P marks the recommended spawn.
@@ -72,6 +101,7 @@ COLOR_MINI_PLAYER = (120, 200, 255)
 
 MINIMAP_SCALE = 8  # pixels per tile on the minimap
 MINIMAP_PADDING = 10
+MINIMAP_VIEW_CELLS = 32  # larger maps show a window of this many cells around the player
 
 # --------------------------- Data classes -----------------------------
 @dataclass
@@ -100,13 +130,132 @@ def parse_map():
     if spawn is None:
         # default center if no spawn marker
         spawn = (2.5, 2.5)
-    return grid, spawn
+    return GridMap.from_strings(grid), spawn
 
 GRID, SPAWN = parse_map()
+SOLID_ROWS = GRID.solid_rows()  # nested mask rows: the fastest wall test from pure Python
+MAP_FILE = None  # set by load_map_file; process-pool workers map the same file
 
 # Precompute some projection constants
 PROJ_PLANE_DIST = (WIDTH / 2) / math.tan(FOV / 2)
 
+def set_resolution(width, height):
+    """Change the window size and the constants derived from it (used by bench.py)."""
+    global WIDTH, HEIGHT, HALF_W, HALF_H, NUM_RAYS, PROJ_PLANE_DIST
+    WIDTH, HEIGHT = width, height
+    HALF_W, HALF_H = WIDTH // 2, HEIGHT // 2
+    NUM_RAYS = WIDTH
+    PROJ_PLANE_DIST = (WIDTH / 2) / math.tan(FOV / 2)
+
+def load_map(map_str):
+    """Replace MAP_STR and re-parse GRID/SPAWN from it."""
+    global MAP_STR, MAP_W, MAP_H, GRID, SPAWN, SOLID_ROWS, MAP_FILE
+    MAP_STR = list(map_str)
+    MAP_H = len(MAP_STR)
+    MAP_W = len(MAP_STR[0])
+    GRID, SPAWN = parse_map()
+    SOLID_ROWS = GRID.solid_rows()
+    MAP_FILE = None
+
+def load_map_file(path):
+    """Open a .pyrmap level (see mapfile.py) memory-mapped; GRID reads tiles from the file."""
+    global MAP_W, MAP_H, GRID, SPAWN, SOLID_ROWS, MAP_FILE
+    mf = mapfile.load(path)
+    GRID, SPAWN = mf.grid, mf.spawn
+    MAP_W, MAP_H = GRID.width, GRID.height
+    SOLID_ROWS = GRID.solid_rows()
+    MAP_FILE = path
+
+CAST_STATS = {"rays": 0, "steps": 0}  # raycast() totals; steps / rays = DDA iterations per ray
+
+def raycast(px: float, py: float, ray_angle: float):
+    """DDA grid traversal from (px, py). Returns (distance, side)."""
+    if TRAVERSAL != "dda":
+        return raycast_skip(px, py, ray_angle)
+    solid = SOLID_ROWS
+    # Ray direction
+    rx = math.cos(ray_angle)
+    ry = math.sin(ray_angle)
+    # Which grid cell are we in?
+    map_x = int(px)
+    map_y = int(py)
+
+    # Length of ray to cross one grid step
+    delta_dist_x = abs(1.0 / rx) if rx != 0 else 1e30
+    delta_dist_y = abs(1.0 / ry) if ry != 0 else 1e30
+
+    # Step direction and initial side distances
+    if rx < 0:
+        step_x = -1
+        side_dist_x = (px - map_x) * delta_dist_x
+    else:
+        step_x = 1
+        side_dist_x = (map_x + 1.0 - px) * delta_dist_x
+
+    if ry < 0:
+        step_y = -1
+        side_dist_y = (py - map_y) * delta_dist_y
+    else:
+        step_y = 1
+        side_dist_y = (map_y + 1.0 - py) * delta_dist_y
+
+    hit = False
+    side = 0  # 0: vertical wall hit, 1: horizontal
+    for n in range(1, 1025):  # cap to avoid infinite loops
+        if side_dist_x < side_dist_y:
+            side_dist_x += delta_dist_x
+            map_x += step_x
+            side = 0
+        else:
+            side_dist_y += delta_dist_y
+            map_y += step_y
+            side = 1
+
+        # Out of bounds: treat as hit far away
+        if map_x < 0 or map_y < 0 or map_x >= MAP_W or map_y >= MAP_H:
+            break
+        if solid[map_y][map_x]:
+            hit = True
+            break
+    CAST_STATS["rays"] += 1
+    CAST_STATS["steps"] += n
+    if not hit:
+        # If no wall found, clamp distance to MAX_DEPTH * tile size
+        return MAX_DEPTH, side
+
+    # Compute exact perpendicular distance to the wall
+    if side == 0:
+        # vertical wall crossed last
+        perp_dist = (side_dist_x - delta_dist_x)
+    else:
+        perp_dist = (side_dist_y - delta_dist_y)
+    return max(0.0001, perp_dist), side
+
+def raycast_skip(px: float, py: float, ray_angle: float):
+    """raycast() skipping empty space (TRAVERSAL): same (distance, side), fewer loop iterations."""
+    if TRAVERSAL == "pyramid":
+        walk, skip = march_pyramid, GRID.occupancy()
+    else:
+        walk, skip = march, GRID.distance_rows()
+    hit, _, _, side, perp_dist, steps = walk(px, py, math.cos(ray_angle), math.sin(ray_angle),
+                                             SOLID_ROWS, MAP_W, MAP_H, 1024, skip)
+    CAST_STATS["rays"] += 1
+    CAST_STATS["steps"] += steps
+    if not hit:
+        return MAX_DEPTH, side
+    return max(0.0001, perp_dist), side
+
+def cast_band(px: float, py: float, angle: float, columns: int, start: int, end: int):
+    """Fish-eye corrected (dist, side) for columns [start, end) of a `columns`-ray view.
+    Module-level so a process BandPool can run it (the map comes from load_map)."""
+    rays = []
+    start_angle = angle - FOV / 2
+    for col in range(start, end):
+        ray_angle = start_angle + (col / (columns - 1)) * FOV
+        dist, side = raycast(px, py, ray_angle)
+        rays.append((dist * math.cos(ray_angle - angle), side))
+    return rays
+
 # ----------------------------- Engine ---------------------------------
 class Engine:
     def __init__(self):
@@ -118,6 +267,25 @@ class Engine:
         self.show_minimap = True
 
         self.player = Player(SPAWN[0], SPAWN[1], angle=math.radians(0))
+        self.minimap = Minimap(COLOR_MINI_WALL, COLOR_MINI_FREE, COLOR_RAY,
+                               scale=MINIMAP_SCALE, padding=MINIMAP_PADDING,
+                               view_cells=MINIMAP_VIEW_CELLS)
+
+        # one wall target per internal column count (see dynres.py)
+        self.rasterizers = {} if WallRasterizer is not None else None
+        self.line_views = {}
+        self.wall_mode = WALL_RENDERER if self.rasterizers is not None else "lines"
+        self.floor_mode = FLOOR_RENDERER if self.rasterizers is not None else "flat"
+        self.floors = None  # FloorCaster, made on first use
+        self.scaler = ResolutionScaler(NUM_RAYS, TARGET_FRAME_MS, enabled=DYNAMIC_RES)
+        self.band_pool = None
+        if CAST_WORKERS > 0:
+            if MAP_FILE is not None:
+                self.band_pool = BandPool(CAST_WORKERS, CAST_POOL, initializer=load_map_file,
+                                          initargs=(MAP_FILE,))
+            else:
+                self.band_pool = BandPool(CAST_WORKERS, CAST_POOL, initializer=load_map,
+                                          initargs=(MAP_STR,))
 
     # -------------- Input --------------
     def handle_input(self, dt: float):
@@ -129,6 +297,12 @@ class Engine:
                     self.running = False
                 elif event.key == pygame.K_m:
                     self.show_minimap = not self.show_minimap
+                elif event.key == pygame.K_F4 and self.rasterizers is not None:
+                    self.wall_mode = "lines" if self.wall_mode == "surfarray" else "surfarray"
+                elif event.key == pygame.K_F6 and self.rasterizers is not None:
+                    self.floor_mode = "flat" if self.floor_mode == "textured" else "textured"
+                elif event.key == pygame.K_F5:
+                    self.scaler.set_enabled(not self.scaler.enabled)
 
         keys = pygame.key.get_pressed()
         # Rotation
@@ -165,7 +339,7 @@ class Engine:
         # Out of bounds = blocked
         if x < 0 or y < 0 or x >= MAP_W or y >= MAP_H:
             return True
-        return GRID[int(y)][int(x)] != '0'
+        return SOLID_ROWS[int(y)][int(x)] != 0
 
     def try_move(self, dx: float, dy: float):
         # simple AABB-ish collision: resolve per-axis
@@ -179,86 +353,55 @@ class Engine:
 
     # -------------- Raycasting --------------
     def cast_rays(self):
-        """Cast one ray per screen column. Return list of (dist, hit_side) per x.
+        """Cast one ray per internal column (NUM_RAYS, fewer under dynamic resolution).
+        Return list of (dist, hit_side) per column.
         hit_side: 0 if hit vertical wall, 1 if horizontal (used for shading).
         """
+        columns = self.scaler.columns
+        p = self.player
+        if self.band_pool is None:
+            return cast_band(p.x, p.y, p.angle, columns, 0, columns)
+        # bands come back in order; concatenating them gives the full view
         rays = []
-        # starting angle for leftmost ray
-        start_angle = self.player.angle - FOV / 2
-        for col in range(NUM_RAYS):
-            ray_angle = start_angle + (col / (NUM_RAYS - 1)) * FOV
-            dist, side = self.raycast_single(ray_angle)
-            # correct fish-eye by projecting onto view direction
-            corrected = dist * math.cos(ray_angle - self.player.angle)
-            rays.append((corrected, side))
+        for part in self.band_pool.run(cast_band, columns, p.x, p.y, p.angle, columns):
+            rays.extend(part)
         return rays
 
     def raycast_single(self, ray_angle: float):
-        """DDA grid traversal. Returns (distance, side)."""
-        # Ray direction
-        rx = math.cos(ray_angle)
-        ry = math.sin(ray_angle)
-        # Which grid cell are we in?
-        map_x = int(self.player.x)
-        map_y = int(self.player.y)
-
-        # Length of ray to cross one grid step
-        delta_dist_x = abs(1.0 / rx) if rx != 0 else 1e30
-        delta_dist_y = abs(1.0 / ry) if ry != 0 else 1e30
-
-        # Step direction and initial side distances
-        if rx < 0:
-            step_x = -1
-            side_dist_x = (self.player.x - map_x) * delta_dist_x
-        else:
-            step_x = 1
-            side_dist_x = (map_x + 1.0 - self.player.x) * delta_dist_x
-
-        if ry < 0:
-            step_y = -1
-            side_dist_y = (self.player.y - map_y) * delta_dist_y
-        else:
-            step_y = 1
-            side_dist_y = (map_y + 1.0 - self.player.y) * delta_dist_y
-
-        hit = False
-        side = 0  # 0: vertical wall hit, 1: horizontal
-        for _ in range(1024):  # cap to avoid infinite loops
-            if side_dist_x < side_dist_y:
-                side_dist_x += delta_dist_x
-                map_x += step_x
-                side = 0
-            else:
-                side_dist_y += delta_dist_y
-                map_y += step_y
-                side = 1
-
-            # Out of bounds: treat as hit far away
-            if map_x < 0 or map_y < 0 or map_x >= MAP_W or map_y >= MAP_H:
-                break
-            if GRID[map_y][map_x] != '0':
-                hit = True
-                break
-        if not hit:
-            # If no wall found, clamp distance to MAX_DEPTH * tile size
-            return MAX_DEPTH, side
-
-        # Compute exact perpendicular distance to the wall
-        if side == 0:
-            # vertical wall crossed last
-            perp_dist = (side_dist_x - delta_dist_x)
-        else:
-            perp_dist = (side_dist_y - delta_dist_y)
-        return max(0.0001, perp_dist), side
+        return raycast(self.player.x, self.player.y, ray_angle)
 
     # -------------- Rendering --------------
     def render(self, rays):
-        surf = self.screen
-        surf.fill(COLOR_BG)
+        # draw walls as vertical strips
+        if self.wall_mode == "surfarray":
+            self.render_walls_fb(rays)
+        else:
+            self.render_walls_lines(rays)
 
-        # split background into ceiling and floor
-        pygame.draw.rect(surf, COLOR_CEIL, (0, 0, WIDTH, HALF_H))
-        pygame.draw.rect(surf, COLOR_FLOOR, (0, HALF_H, WIDTH, HALF_H))
+        if self.show_minimap:
+            self.draw_minimap(rays)
+
+        # HUD text
+        self.draw_hud()
+
+        pygame.display.flip()
+
+    def render_walls_lines(self, rays):
+        columns = len(rays)
+        surf = self.screen
+        if columns != WIDTH:
+            surf = self.line_views.get(columns)
+            if surf is None:
+                surf = self.line_views[columns] = pygame.Surface((columns, HEIGHT))
+        if self.floor_mode == "textured":
+            rasterizer = self.get_rasterizer(columns)
+            pygame.surfarray.blit_array(rasterizer.surface, self.render_floor(rasterizer))
+            surf.blit(rasterizer.surface, (0, 0))
+        else:
+            surf.fill(COLOR_BG)
+            # split background into ceiling and floor
+            pygame.draw.rect(surf, COLOR_CEIL, (0, 0, columns, HALF_H))
+            pygame.draw.rect(surf, COLOR_FLOOR, (0, HALF_H, columns, HALF_H))
 
         # draw walls as vertical strips
         for x, (dist, side) in enumerate(rays):
@@ -270,56 +413,69 @@ class Engine:
 
             color = COLOR_WALL_DARK if side == 1 else COLOR_WALL
             pygame.draw.line(surf, color, (x, y1), (x, y2))
-
-        if self.show_minimap:
-            self.draw_minimap(rays)
-
-        # HUD text
-        self.draw_hud()
-
-        pygame.display.flip()
+        if surf is not self.screen:
+            stretch_view(surf, self.screen)
+
+    def render_walls_fb(self, rays):
+        """Same walls as the draw.line loop, written to the framebuffer in one pass."""
+        arr = np.asarray(rays, dtype=np.float64)
+        dist = arr[:, 0]
+        side = arr[:, 1]
+        visible = dist > 0
+        wall_h = ((TILE_SIZE / np.where(visible, dist, 1.0)) * PROJ_PLANE_DIST).astype(np.int64)
+        colors = np.where(side[:, None] == 1, COLOR_WALL_DARK, COLOR_WALL).astype(np.uint8)
+        rasterizer = self.get_rasterizer(len(rays))
+        background = self.render_floor(rasterizer) if self.floor_mode == "textured" else None
+        rasterizer.draw_columns(wall_h // 2, colors, visible, background)
+        stretch_view(rasterizer.surface, self.screen)
+
+    def get_rasterizer(self, columns):
+        rasterizer = self.rasterizers.get(columns)
+        if rasterizer is None:
+            rasterizer = self.rasterizers[columns] = WallRasterizer(columns, HEIGHT, COLOR_CEIL, COLOR_FLOOR)
+        return rasterizer
+
+    def render_floor(self, rasterizer):
+        """Textured floor and ceiling pixels for `rasterizer` (floorcast.py), to draw the walls over."""
+        if self.floors is None:
+            self.floors = FloorCaster.default(rasterizer.map_colors)
+        # the same fan of rays as cast_band, scaled to unit length along the view direction
+        offset = np.linspace(-FOV / 2, FOV / 2, rasterizer.width)
+        angle = self.player.angle + offset
+        scale = 1.0 / np.cos(offset)
+        return self.floors.draw(rasterizer, self.player.x, self.player.y, np.cos(angle) * scale,
+                                np.sin(angle) * scale, TILE_SIZE * PROJ_PLANE_DIST)
 
     def draw_minimap(self, rays):
-        mm_w = MAP_W * MINIMAP_SCALE
-        mm_h = MAP_H * MINIMAP_SCALE
-        ox = MINIMAP_PADDING
-        oy = MINIMAP_PADDING
-
-        # background
-        pygame.draw.rect(self.screen, (12, 12, 16), (ox - 2, oy - 2, mm_w + 4, mm_h + 4), border_radius=6)
-        # tiles
-        for r in range(MAP_H):
-            for c in range(MAP_W):
-                rect = pygame.Rect(ox + c * MINIMAP_SCALE, oy + r * MINIMAP_SCALE, MINIMAP_SCALE, MINIMAP_SCALE)
-                if GRID[r][c] != '0':
-                    pygame.draw.rect(self.screen, COLOR_MINI_WALL, rect)
-                else:
-                    pygame.draw.rect(self.screen, COLOR_MINI_FREE, rect)
-
-        # rays (downsample to avoid overdraw)
-        step = max(1, NUM_RAYS // 120)
+        # tiles come from cached chunks; large maps show a window around the player
+        mm = self.minimap
+        mm.begin(self.screen, GRID, self.player.x, self.player.y)
+
+        # rays (downsample to avoid overdraw), drawn as one filled fan
+        columns = len(rays)
+        step = max(1, columns // 120)
         start_angle = self.player.angle - FOV / 2
-        for col in range(0, NUM_RAYS, step):
-            ray_angle = start_angle + (col / (NUM_RAYS - 1)) * FOV
+        ends = []
+        for col in range(0, columns, step):
+            ray_angle = start_angle + (col / (columns - 1)) * FOV
             dist, _ = rays[col]
-            px = ox + int(self.player.x * MINIMAP_SCALE)
-            py = oy + int(self.player.y * MINIMAP_SCALE)
-            rx = px + int(math.cos(ray_angle) * dist * MINIMAP_SCALE)
-            ry = py + int(math.sin(ray_angle) * dist * MINIMAP_SCALE)
-            pygame.draw.line(self.screen, COLOR_RAY, (px, py), (rx, ry), 1)
+            ends.append((self.player.x + math.cos(ray_angle) * dist,
+                         self.player.y + math.sin(ray_angle) * dist))
+        mm.draw_fan(self.screen, self.player.x, self.player.y, ends)
 
         # player
-        px = ox + int(self.player.x * MINIMAP_SCALE)
-        py = oy + int(self.player.y * MINIMAP_SCALE)
+        px, py = mm.to_screen(self.player.x, self.player.y)
         pygame.draw.circle(self.screen, COLOR_MINI_PLAYER, (px, py), 3)
         # facing indicator
         fx = px + int(math.cos(self.player.angle) * 8)
         fy = py + int(math.sin(self.player.angle) * 8)
         pygame.draw.line(self.screen, COLOR_MINI_PLAYER, (px, py), (fx, fy), 2)
 
+        mm.end(self.screen)
+
     def draw_hud(self):
         font = pygame.font.SysFont("consolas", 16)
-        text = f"FPS: {int(self.clock.get_fps()):3d}  Pos: ({self.player.x:.2f},{self.player.y:.2f})  Angle: {math.degrees(self.player.angle)%360:6.2f}°  FOV:{FOV_DEG}"
+        text = f"FPS: {int(self.clock.get_fps()):3d}  Pos: ({self.player.x:.2f},{self.player.y:.2f})  Angle: {math.degrees(self.player.angle)%360:6.2f}°  FOV:{FOV_DEG}  Res: {self.scaler.label(HEIGHT)}"
         surf = font.render(text, True, (200, 200, 210))
         self.screen.blit(surf, (10, HEIGHT - 24))
 
@@ -327,12 +483,18 @@ class Engine:
     def run(self):
         while self.running:
             dt = self.clock.tick(FPS) / 1000.0
+            t0 = time.perf_counter()
             self.handle_input(dt)
             rays = self.cast_rays()
             self.render(rays)
+            self.scaler.update(1000.0 * (time.perf_counter() - t0))
+        if self.band_pool is not None:
+            self.band_pool.close()
         pygame.quit()
         sys.exit(0)
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:  # optional .pyrmap level
+        load_map_file(sys.argv[1])
     Engine().run()
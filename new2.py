@@ -10,22 +10,52 @@ New features in this version:
 
 Controls:
   W/S: forward/back   A/D: strafe    ←/→: rotate    M: minimap   N: spawn NPC   ESC: quit
+  F4: toggle wall renderer (surfarray / lines)
+  F5: toggle dynamic resolution (fewer rays when frames run over budget)
+  F6: toggle floor / ceiling (textured / flat, numpy)
+  F3: frame-time graph   F2: export frame times to CSV
 
 Run:
   pip install pygame
   python main.py
+  python new2.py level.pyrmap     # binary level, see mapfile.py
 """
 
+import bisect
 import json
 import math
 import os
 import random
 import sys
+import time
 from dataclasses import dataclass, field
 from typing import List, Tuple
 
 import pygame
 
+from autosave import AutoSaver
+from gridmap import GridMap
+import mapfile
+from frametimer import FrameTimer
+from bandpool import BandPool
+from distfield import march
+from occupancy import march as march_pyramid
+from dynres import ResolutionScaler, stretch_columns, stretch_view
+from minimap import Minimap
+from spatial import SpatialHash
+from sprites import visible_spans
+
+try:
+    import numpy as np
+    from framebuffer import WallRasterizer
+    from floorcast import FloorCaster
+    from npcstore import NPCStore
+except ImportError:  # no numpy: only the per-line wall path is available
+    np = None
+    WallRasterizer = None
+    FloorCaster = None
+    NPCStore = None
+
 # ----------------------------- Config ---------------------------------
 WIDTH, HEIGHT = 960, 600
 HALF_W, HALF_H = WIDTH // 2, HEIGHT // 2
@@ -37,6 +67,14 @@ MAX_DEPTH = 20
 MOVE_SPEED = 3.2  # tiles/sec
 ROT_SPEED = math.radians(120)
 SPRITE_SIZE_WORLD = 0.8  # approximate width/height in world units
+WALL_RENDERER = "surfarray"  # "surfarray" (framebuffer) or "lines" (one draw.line per column); F4 toggles
+FLOOR_RENDERER = "textured"  # "textured" (floorcast.py, needs numpy) or "flat" colours; F6 toggles
+CAST_WORKERS = 0  # >0: cast column bands on a worker pool (see bandpool.py)
+CAST_POOL = "process"  # "process" (pure-Python DDA holds the GIL) or "thread"
+TRAVERSAL = "dda"  # jump over open space (same hits, fewer steps): "skip" distance field, "pyramid" block pyramid
+PVS_CULLING = True  # skip NPCs the player's cell cannot see (pvs.py; numpy, maps up to 48x48)
+DYNAMIC_RES = False  # cast fewer rays and stretch them when frames run over budget; F5 toggles
+TARGET_FRAME_MS = 1000.0 / FPS
 
 MAP_STR = [
     "111111111111",
@@ -71,8 +109,15 @@ COLOR_MINI_NPC = (255, 140, 120)
 
 MINIMAP_SCALE = 8
 MINIMAP_PADDING = 10
+MINIMAP_VIEW_CELLS = 32  # larger maps show a window of this many cells around the player
+
+NPC_INDEX_BUCKET = 4  # spatial hash square size in map cells (spatial.py)
+NPC_STORE = True  # keep NPCs in parallel arrays and move them in one batch (npcstore.py; numpy)
+
+FRAME_STAGES = ["input", "npcs", "cast", "walls", "sprites", "minimap", "hud", "weapon", "flip"]
 
 BRAIN_PATH = "ai_brain.json"
+BRAIN_SAVE_INTERVAL = 2.0  # seconds between brain writes (done on a background thread)
 ALPHA = 0.08   # learning rate
 DECAY = 0.995  # slight decay toward 1.0
 
@@ -97,12 +142,117 @@ def parse_map():
         grid.append(grow)
     if spawn is None:
         spawn = (2.5, 2.5)
-    return grid, spawn
+    return GridMap.from_strings(grid), spawn
 
 GRID, SPAWN = parse_map()
+SOLID_ROWS = GRID.solid_rows()  # nested mask rows: the fastest wall test from pure Python
+MAP_FILE = None  # set by load_map_file; process-pool workers map the same file
 
 PROJ_PLANE_DIST = (WIDTH / 2) / math.tan(FOV / 2)
 
+def set_resolution(width, height):
+    """Change the window size and the constants derived from it (used by bench.py)."""
+    global WIDTH, HEIGHT, HALF_W, HALF_H, NUM_RAYS, PROJ_PLANE_DIST
+    WIDTH, HEIGHT = width, height
+    HALF_W, HALF_H = WIDTH // 2, HEIGHT // 2
+    NUM_RAYS = WIDTH
+    PROJ_PLANE_DIST = (WIDTH / 2) / math.tan(FOV / 2)
+
+def load_map(map_str):
+    """Replace MAP_STR and re-parse GRID/SPAWN from it."""
+    global MAP_STR, MAP_W, MAP_H, GRID, SPAWN, SOLID_ROWS, MAP_FILE
+    MAP_STR = list(map_str)
+    MAP_H = len(MAP_STR)
+    MAP_W = len(MAP_STR[0])
+    GRID, SPAWN = parse_map()
+    SOLID_ROWS = GRID.solid_rows()
+    MAP_FILE = None
+
+def load_map_file(path):
+    """Open a .pyrmap level (see mapfile.py) memory-mapped; GRID reads tiles from the file."""
+    global MAP_W, MAP_H, GRID, SPAWN, SOLID_ROWS, MAP_FILE
+    mf = mapfile.load(path)
+    GRID, SPAWN = mf.grid, mf.spawn
+    MAP_W, MAP_H = GRID.width, GRID.height
+    SOLID_ROWS = GRID.solid_rows()
+    MAP_FILE = path
+
+CAST_STATS = {"rays": 0, "steps": 0}  # raycast() totals; steps / rays = DDA iterations per ray
+
+def raycast(px: float, py: float, ray_angle: float):
+    """DDA grid traversal from (px, py). Returns (distance, side)."""
+    if TRAVERSAL != "dda":
+        return raycast_skip(px, py, ray_angle)
+    solid = SOLID_ROWS
+    rx = math.cos(ray_angle)
+    ry = math.sin(ray_angle)
+    map_x = int(px)
+    map_y = int(py)
+    delta_dist_x = abs(1.0 / rx) if rx != 0 else 1e30
+    delta_dist_y = abs(1.0 / ry) if ry != 0 else 1e30
+
+    if rx < 0:
+        step_x = -1
+        side_dist_x = (px - map_x) * delta_dist_x
+    else:
+        step_x = 1
+        side_dist_x = (map_x + 1.0 - px) * delta_dist_x
+
+    if ry < 0:
+        step_y = -1
+        side_dist_y = (py - map_y) * delta_dist_y
+    else:
+        step_y = 1
+        side_dist_y = (map_y + 1.0 - py) * delta_dist_y
+
+    hit = False
+    side = 0
+    for n in range(1, 1025):
+        if side_dist_x < side_dist_y:
+            side_dist_x += delta_dist_x
+            map_x += step_x
+            side = 0
+        else:
+            side_dist_y += delta_dist_y
+            map_y += step_y
+            side = 1
+        if map_x < 0 or map_y < 0 or map_x >= MAP_W or map_y >= MAP_H:
+            break
+        if solid[map_y][map_x]:
+            hit = True
+            break
+    CAST_STATS["rays"] += 1
+    CAST_STATS["steps"] += n
+    if not hit:
+        return MAX_DEPTH, side
+    perp_dist = (side_dist_x - delta_dist_x) if side==0 else (side_dist_y - delta_dist_y)
+    return max(0.0001, perp_dist), side
+
+def raycast_skip(px: float, py: float, ray_angle: float):
+    """raycast() skipping empty space (TRAVERSAL): same (distance, side), fewer loop iterations."""
+    if TRAVERSAL == "pyramid":
+        walk, skip = march_pyramid, GRID.occupancy()
+    else:
+        walk, skip = march, GRID.distance_rows()
+    hit, _, _, side, perp_dist, steps = walk(px, py, math.cos(ray_angle), math.sin(ray_angle),
+                                             SOLID_ROWS, MAP_W, MAP_H, 1024, skip)
+    CAST_STATS["rays"] += 1
+    CAST_STATS["steps"] += steps
+    if not hit:
+        return MAX_DEPTH, side
+    return max(0.0001, perp_dist), side
+
+def cast_band(px: float, py: float, angle: float, columns: int, start: int, end: int):
+    """Fish-eye corrected (dist, side) for columns [start, end) of a `columns`-ray view.
+    Module-level so a process BandPool can run it (the map comes from load_map)."""
+    rays = []
+    start_angle = angle - FOV / 2
+    for col in range(start, end):
+        ray_angle = start_angle + (col / (columns - 1)) * FOV
+        dist, side = raycast(px, py, ray_angle)
+        rays.append((dist * math.cos(ray_angle - angle), side))
+    return rays
+
 # ----------------------------- Data -----------------------------------
 @dataclass
 class Player:
@@ -139,9 +289,12 @@ class AIBrain:
         (-1, 1, "sw"),    (-1,-1, "nw"),
     ]
 
-    def __init__(self, path=BRAIN_PATH):
+    def __init__(self, path=BRAIN_PATH, save_interval=BRAIN_SAVE_INTERVAL):
         self.path = path
         self.weights = {name: 1.0 for _,_,name in self.ACTIONS}
+        self._cum = None  # cumulative weights for choose(); None after any weight change
+        self.dirty = False  # weights changed since the last save()
+        self.saver = AutoSaver(path, save_interval)
         self.load()
 
     def load(self):
@@ -155,30 +308,46 @@ class AIBrain:
                             self.weights[k] = float(v)
             except Exception:
                 pass
+        self._cum = None
 
     def save(self):
-        try:
-            with open(self.path, "w", encoding="utf-8") as f:
-                json.dump(self.weights, f, indent=2)
-        except Exception:
-            pass
+        """Hand changed weights to the background saver; never touches the disk itself.
+        It writes at most once per save_interval, atomically (see autosave.py)."""
+        if self.dirty:
+            self.saver.submit(dict(self.weights))
+            self.dirty = False
+
+    def close(self):
+        """Write the final weights and stop the saver thread."""
+        self.save()
+        self.saver.close()
+
+    def cumulative(self) -> List[float]:
+        """Running sums of the action weights (each at least 1e-3), rebuilt only after a change."""
+        if self._cum is None:
+            acc = 0.0
+            cum = []
+            for _,_,name in self.ACTIONS:
+                acc += max(1e-3, self.weights[name])
+                cum.append(acc)
+            self._cum = cum
+        return self._cum
 
     def choose(self, npc: NPC, player: Player) -> Tuple[float,float,str]:
         # Softmax-like sampling over positive weights (stable & simple)
-        names = [name for _,_,name in self.ACTIONS]
-        w = [max(1e-3, self.weights[name]) for name in names]
-        total = sum(w)
-        r = random.random() * total
-        acc = 0.0
-        idx = 0
-        for i,wi in enumerate(w):
-            acc += wi
-            if r <= acc:
-                idx = i
-                break
+        cum = self.cumulative()
+        r = random.random() * cum[-1]
+        # first action whose running sum reaches r
+        idx = min(bisect.bisect_left(cum, r), len(cum) - 1)
         dx, dy, name = self.ACTIONS[idx]
         return dx, dy, name
 
+    def choose_many(self, n: int, rng) -> "np.ndarray":
+        """n ACTIONS indices drawn like n choose() calls; `rng` is a numpy Generator."""
+        cum = self.cumulative()
+        r = rng.random(n) * cum[-1]
+        return np.minimum(np.searchsorted(cum, r), len(cum) - 1)
+
     def learn(self, action_name: str, improved: bool):
         # Reward/decay & mild regularization toward 1.0
         cur = self.weights[action_name]
@@ -189,6 +358,33 @@ class AIBrain:
         # Regularize slightly toward 1.0 to avoid runaway
         cur = 0.98*cur + 0.02*1.0
         self.weights[action_name] = clamp(cur, 0.1, 5.0)
+        self._cum = None
+        self.dirty = True
+
+    def learn_many(self, actions: "np.ndarray", improved: "np.ndarray"):
+        """Apply one learn() per (action index, improved) pair, reduced per action.
+
+        A single learn() is affine in the weight: 0.98*(w + ALPHA) + 0.02 when
+        improved, 0.98*DECAY*w + 0.02 otherwise. For an action taken n times
+        with k improvements, the n updates are applied as n steps of the k/n
+        mix of the two maps, in closed form. That is exactly n learn() calls
+        when all outcomes agree, and close to their mean over call orders
+        otherwise.
+        """
+        count = np.bincount(actions, minlength=len(self.ACTIONS))
+        if not count.any():
+            return
+        up = np.bincount(actions, weights=improved, minlength=len(self.ACTIONS))
+        p = up / np.maximum(count, 1)
+        slope = 0.98 * (p + (1.0 - p) * DECAY)
+        shift = 0.98 * ALPHA * p + 0.02
+        keep = slope ** count
+        for i in np.flatnonzero(count).tolist():
+            name = self.ACTIONS[i][2]
+            cur = self.weights[name] * keep[i] + shift[i] * (1.0 - keep[i]) / (1.0 - slope[i])
+            self.weights[name] = clamp(float(cur), 0.1, 5.0)
+        self._cum = None
+        self.dirty = True
 
 # ----------------------------- Engine ----------------------------------
 class Engine:
@@ -201,8 +397,34 @@ class Engine:
         self.show_minimap = True
 
         self.player = Player(SPAWN[0], SPAWN[1], angle=0.0)
-        self.npcs: List[NPC] = []
+        # NPCStore yields handles with the same x / y / speed / pos() as NPC
+        self.npcs = NPCStore(speed=NPC.speed) if NPC_STORE and NPCStore is not None else []
+        self.npc_index = SpatialHash(NPC_INDEX_BUCKET)  # kept in step with self.npcs
         self.brain = AIBrain()
+        self.minimap = Minimap(COLOR_MINI_WALL, COLOR_MINI_FREE, COLOR_RAY,
+                               scale=MINIMAP_SCALE, padding=MINIMAP_PADDING,
+                               view_cells=MINIMAP_VIEW_CELLS)
+
+        # one wall target per internal column count (see dynres.py)
+        self.rasterizers = {} if WallRasterizer is not None else None
+        self.line_views = {}
+        self.wall_mode = WALL_RENDERER if self.rasterizers is not None else "lines"
+        self.floor_mode = FLOOR_RENDERER if self.rasterizers is not None else "flat"
+        self.floors = None  # FloorCaster, made on first use
+        self.scaler = ResolutionScaler(NUM_RAYS, TARGET_FRAME_MS, enabled=DYNAMIC_RES)
+        self.band_pool = None
+        if CAST_WORKERS > 0:
+            if MAP_FILE is not None:
+                self.band_pool = BandPool(CAST_WORKERS, CAST_POOL, initializer=load_map_file,
+                                          initargs=(MAP_FILE,))
+            else:
+                self.band_pool = BandPool(CAST_WORKERS, CAST_POOL, initializer=load_map,
+                                          initargs=(MAP_STR,))
+
+        # always-on per-stage timings (F3 graph, F2 CSV)
+        self.timer = FrameTimer(FRAME_STAGES)
+        self.show_graph = False
+        self.small_font = pygame.font.SysFont("consolas", 12)
 
         # simple weapon/hand surfaces (placeholder art)
         self.weapon_surf = self.make_weapon_surface()
@@ -218,8 +440,19 @@ class Engine:
                     self.running = False
                 elif event.key == pygame.K_m:
                     self.show_minimap = not self.show_minimap
+                elif event.key == pygame.K_F4 and self.rasterizers is not None:
+                    self.wall_mode = "lines" if self.wall_mode == "surfarray" else "surfarray"
+                elif event.key == pygame.K_F6 and self.rasterizers is not None:
+                    self.floor_mode = "flat" if self.floor_mode == "textured" else "textured"
+                elif event.key == pygame.K_F5:
+                    self.scaler.set_enabled(not self.scaler.enabled)
                 elif event.key == pygame.K_n:
                     self.spawn_npc()
+                elif event.key == pygame.K_F3:
+                    self.show_graph = not self.show_graph
+                elif event.key == pygame.K_F2:
+                    path = self.timer.export_csv(f"frame_times_{time.strftime('%Y%m%d%H%M%S')}.csv")
+                    print("frame times ->", path)
 
         keys = pygame.key.get_pressed()
         # Rotation
@@ -254,7 +487,7 @@ class Engine:
     def is_blocked(self, x: float, y: float) -> bool:
         if x < 0 or y < 0 or x >= MAP_W or y >= MAP_H:
             return True
-        return GRID[int(y)][int(x)] != '0'
+        return SOLID_ROWS[int(y)][int(x)] != 0
 
     def try_move_player(self, dx: float, dy: float):
         new_x = self.player.x + dx
@@ -274,16 +507,24 @@ class Engine:
 
     # ----------------- NPC -----------------
     def spawn_npc(self):
-        # place NPC at a free random tile
-        free_tiles = [(c + 0.5, r + 0.5) for r in range(MAP_H) for c in range(MAP_W) if GRID[r][c]=='0']
-        random.shuffle(free_tiles)
-        for x,y in free_tiles:
-            # avoid spawning too close
-            if (x-self.player.x)**2 + (y-self.player.y)**2 > 9.0:
+        # place NPC at a free random tile (sampled, so big maps don't build a full free list)
+        for _ in range(200):
+            cell = GRID.random_free_cell(random)
+            if cell is None:
+                return
+            x, y = cell
+            # avoid spawning too close to the player or on top of another NPC
+            if (x-self.player.x)**2 + (y-self.player.y)**2 > 9.0 and not self.npc_index.query_radius(x, y, 0.5):
                 self.npcs.append(NPC(x,y))
-                break
+                self.npc_index.insert(self.npcs[-1])
+                return
 
     def update_npcs(self, dt: float):
+        if NPCStore is not None and isinstance(self.npcs, NPCStore):
+            self.npcs.update(self.brain, dt, self.player.x, self.player.y, GRID.solid_array(),
+                             index=self.npc_index)
+            self.brain.save()
+            return
         for npc in self.npcs:
             # Simple ticking brain: choose a direction each frame scaled by speed
             px, py = self.player.pos()
@@ -299,6 +540,7 @@ class Engine:
 
             step = npc.speed * dt
             self.try_move_entity(npc, ax*step, ay*step)
+            self.npc_index.update(npc)
 
             # learning signal: did we get closer?
             nx2, ny2 = npc.pos()
@@ -306,94 +548,111 @@ class Engine:
             improved = new_dist < prev_dist
             self.brain.learn(name, improved)
 
-        # occasionally persist brain
-        if random.random() < 0.02:
-            self.brain.save()
+        # persist brain (queued; the saver writes it every BRAIN_SAVE_INTERVAL seconds)
+        self.brain.save()
 
     # ----------------- Raycasting -----------------
     def cast_rays(self) -> Tuple[List[Tuple[float,int]], List[float]]:
-        rays: List[Tuple[float,int]] = []
-        zbuffer: List[float] = [MAX_DEPTH]*NUM_RAYS
-        start_angle = self.player.angle - FOV / 2
-        for col in range(NUM_RAYS):
-            ray_angle = start_angle + (col / (NUM_RAYS - 1)) * FOV
-            dist, side = self.raycast_single(ray_angle)
-            corrected = dist * math.cos(ray_angle - self.player.angle)
-            rays.append((corrected, side))
-            zbuffer[col] = corrected
-        return rays, zbuffer
-
-    def raycast_single(self, ray_angle: float):
-        rx = math.cos(ray_angle)
-        ry = math.sin(ray_angle)
-        map_x = int(self.player.x)
-        map_y = int(self.player.y)
-        delta_dist_x = abs(1.0 / rx) if rx != 0 else 1e30
-        delta_dist_y = abs(1.0 / ry) if ry != 0 else 1e30
-
-        if rx < 0:
-            step_x = -1
-            side_dist_x = (self.player.x - map_x) * delta_dist_x
+        """One ray per internal column; the zbuffer is stretched to screen width for the sprites."""
+        columns = self.scaler.columns
+        p = self.player
+        if self.band_pool is None:
+            rays = cast_band(p.x, p.y, p.angle, columns, 0, columns)
         else:
-            step_x = 1
-            side_dist_x = (map_x + 1.0 - self.player.x) * delta_dist_x
+            rays = []
+            for part in self.band_pool.run(cast_band, columns, p.x, p.y, p.angle, columns):
+                rays.extend(part)
+        zbuffer: List[float] = [dist for dist, _ in rays]
+        return rays, stretch_columns(zbuffer, WIDTH)
 
-        if ry < 0:
-            step_y = -1
-            side_dist_y = (self.player.y - map_y) * delta_dist_y
-        else:
-            step_y = 1
-            side_dist_y = (map_y + 1.0 - self.player.y) * delta_dist_y
-
-        hit = False
-        side = 0
-        for _ in range(1024):
-            if side_dist_x < side_dist_y:
-                side_dist_x += delta_dist_x
-                map_x += step_x
-                side = 0
-            else:
-                side_dist_y += delta_dist_y
-                map_y += step_y
-                side = 1
-            if map_x < 0 or map_y < 0 or map_x >= MAP_W or map_y >= MAP_H:
-                break
-            if GRID[map_y][map_x] != '0':
-                hit = True
-                break
-        if not hit:
-            return MAX_DEPTH, side
-        perp_dist = (side_dist_x - delta_dist_x) if side==0 else (side_dist_y - delta_dist_y)
-        return max(0.0001, perp_dist), side
+    def raycast_single(self, ray_angle: float):
+        return raycast(self.player.x, self.player.y, ray_angle)
 
     # ----------------- Rendering -----------------
     def render(self, rays: List[Tuple[float,int]], zbuffer: List[float]):
-        surf = self.screen
-        surf.fill(COLOR_BG)
-        pygame.draw.rect(surf, COLOR_CEIL, (0, 0, WIDTH, HALF_H))
-        pygame.draw.rect(surf, COLOR_FLOOR, (0, HALF_H, WIDTH, HALF_H))
-
+        timer = self.timer
         # Walls
-        for x, (dist, side) in enumerate(rays):
-            if dist <= 0:
-                continue
-            wall_h = int((TILE_SIZE / dist) * PROJ_PLANE_DIST)
-            y1 = HALF_H - wall_h // 2
-            y2 = HALF_H + wall_h // 2
-            color = COLOR_WALL_DARK if side == 1 else COLOR_WALL
-            pygame.draw.line(surf, color, (x, y1), (x, y2))
+        if self.wall_mode == "surfarray":
+            self.render_walls_fb(rays)
+        else:
+            self.render_walls_lines(rays)
+        timer.mark("walls")
 
         # Sprites (NPCs)
         self.render_npc_sprites(zbuffer)
+        timer.mark("sprites")
 
         if self.show_minimap:
             self.draw_minimap(rays)
+        timer.mark("minimap")
         self.draw_hud()
+        if self.show_graph:
+            timer.draw_graph(self.screen, (WIDTH - timer.capacity - 90, 10), self.small_font)
+        timer.mark("hud")
 
         # Hands + Weapon overlay drawn last
         self.draw_weapon_overlay()
+        timer.mark("weapon")
 
         pygame.display.flip()
+        timer.mark("flip")
+
+    def render_walls_lines(self, rays):
+        columns = len(rays)
+        surf = self.screen
+        if columns != WIDTH:
+            surf = self.line_views.get(columns)
+            if surf is None:
+                surf = self.line_views[columns] = pygame.Surface((columns, HEIGHT))
+        if self.floor_mode == "textured":
+            rasterizer = self.get_rasterizer(columns)
+            pygame.surfarray.blit_array(rasterizer.surface, self.render_floor(rasterizer))
+            surf.blit(rasterizer.surface, (0, 0))
+        else:
+            surf.fill(COLOR_BG)
+            pygame.draw.rect(surf, COLOR_CEIL, (0, 0, columns, HALF_H))
+            pygame.draw.rect(surf, COLOR_FLOOR, (0, HALF_H, columns, HALF_H))
+
+        for x, (dist, side) in enumerate(rays):
+            if dist <= 0:
+                continue
+            wall_h = int((TILE_SIZE / dist) * PROJ_PLANE_DIST)
+            y1 = HALF_H - wall_h // 2
+            y2 = HALF_H + wall_h // 2
+            color = COLOR_WALL_DARK if side == 1 else COLOR_WALL
+            pygame.draw.line(surf, color, (x, y1), (x, y2))
+        if surf is not self.screen:
+            stretch_view(surf, self.screen)
+
+    def render_walls_fb(self, rays):
+        """Same walls as the draw.line loop, written to the framebuffer in one pass."""
+        arr = np.asarray(rays, dtype=np.float64)
+        dist = arr[:, 0]
+        side = arr[:, 1]
+        visible = dist > 0
+        wall_h = ((TILE_SIZE / np.where(visible, dist, 1.0)) * PROJ_PLANE_DIST).astype(np.int64)
+        colors = np.where(side[:, None] == 1, COLOR_WALL_DARK, COLOR_WALL).astype(np.uint8)
+        rasterizer = self.get_rasterizer(len(rays))
+        background = self.render_floor(rasterizer) if self.floor_mode == "textured" else None
+        rasterizer.draw_columns(wall_h // 2, colors, visible, background)
+        stretch_view(rasterizer.surface, self.screen)
+
+    def get_rasterizer(self, columns):
+        rasterizer = self.rasterizers.get(columns)
+        if rasterizer is None:
+            rasterizer = self.rasterizers[columns] = WallRasterizer(columns, HEIGHT, COLOR_CEIL, COLOR_FLOOR)
+        return rasterizer
+
+    def render_floor(self, rasterizer):
+        """Textured floor and ceiling pixels for `rasterizer` (floorcast.py), to draw the walls over."""
+        if self.floors is None:
+            self.floors = FloorCaster.default(rasterizer.map_colors)
+        # the same fan of rays as cast_band, scaled to unit length along the view direction
+        offset = np.linspace(-FOV / 2, FOV / 2, rasterizer.width)
+        angle = self.player.angle + offset
+        scale = 1.0 / np.cos(offset)
+        return self.floors.draw(rasterizer, self.player.x, self.player.y, np.cos(angle) * scale,
+                                np.sin(angle) * scale, TILE_SIZE * PROJ_PLANE_DIST)
 
     def world_to_screen_sprite(self, sx: float, sy: float):
         # camera space transform
@@ -420,9 +679,21 @@ class Engine:
         return left, top, sprite_w, sprite_h, depth
 
     def render_npc_sprites(self, zbuffer: List[float]):
+        # hidden cells (potentially visible sets) are dropped before the camera transform
+        pvs = GRID.pvs() if PVS_CULLING else None
+        row = pvs.row(self.player.x, self.player.y) if pvs is not None else None
         # sort by depth far→near so that nearer can overwrite (after z-check per column)
+        # only the index squares the view cone touches, up to the farthest wall
+        # (behind / beside the camera or past every wall is skipped)
+        p = self.player
+        candidates = self.npc_index.query_cone(p.x, p.y, math.cos(p.angle), math.sin(p.angle),
+                                               math.tan(FOV / 2), max(zbuffer))
         to_draw = []
-        for npc in self.npcs:
+        for npc in candidates:
+            if row is not None:
+                i = int(npc.y) * MAP_W + int(npc.x)
+                if not row[i >> 3] >> (i & 7) & 1:
+                    continue
             proj = self.world_to_screen_sprite(npc.x, npc.y)
             if proj is not None:
                 left, top, w, h, depth = proj
@@ -433,59 +704,48 @@ class Engine:
         for depth, left, top, w, h in to_draw:
             if w <= 0 or h <= 0:
                 continue
-            # z-occlusion per column
+            # z-occlusion: one rect per run of columns in front of the walls
             start = max(0, left)
             end = min(WIDTH-1, left + w)
-            for x in range(start, end):
-                if 0 <= x < WIDTH and depth < zbuffer[x]:
-                    y1 = max(0, top)
-                    y2 = min(HEIGHT-1, top + h)
-                    pygame.draw.line(self.screen, (235, 120, 110), (x, y1), (x, y2))
+            y1 = max(0, top)
+            y2 = min(HEIGHT-1, top + h)
+            for x0, x1 in visible_spans(depth, zbuffer, start, end):
+                pygame.draw.rect(self.screen, (235, 120, 110), (x0, y1, x1 - x0, y2 - y1 + 1))
 
     def draw_minimap(self, rays):
-        mm_w = MAP_W * MINIMAP_SCALE
-        mm_h = MAP_H * MINIMAP_SCALE
-        ox = MINIMAP_PADDING
-        oy = MINIMAP_PADDING
-
-        pygame.draw.rect(self.screen, (12, 12, 16), (ox - 2, oy - 2, mm_w + 4, mm_h + 4), border_radius=6)
-        for r in range(MAP_H):
-            for c in range(MAP_W):
-                rect = pygame.Rect(ox + c * MINIMAP_SCALE, oy + r * MINIMAP_SCALE, MINIMAP_SCALE, MINIMAP_SCALE)
-                if GRID[r][c] != '0':
-                    pygame.draw.rect(self.screen, COLOR_MINI_WALL, rect)
-                else:
-                    pygame.draw.rect(self.screen, COLOR_MINI_FREE, rect)
-
-        # rays (downsample)
-        step = max(1, NUM_RAYS // 120)
+        # tiles come from cached chunks; large maps show a window around the player
+        mm = self.minimap
+        mm.begin(self.screen, GRID, self.player.x, self.player.y)
+
+        # rays (downsample), drawn as one filled fan
+        columns = len(rays)
+        step = max(1, columns // 120)
         start_angle = self.player.angle - FOV / 2
-        for col in range(0, NUM_RAYS, step):
-            ray_angle = start_angle + (col / (NUM_RAYS - 1)) * FOV
+        ends = []
+        for col in range(0, columns, step):
+            ray_angle = start_angle + (col / (columns - 1)) * FOV
             dist, _ = rays[col]
-            px = ox + int(self.player.x * MINIMAP_SCALE)
-            py = oy + int(self.player.y * MINIMAP_SCALE)
-            rx = px + int(math.cos(ray_angle) * dist * MINIMAP_SCALE)
-            ry = py + int(math.sin(ray_angle) * dist * MINIMAP_SCALE)
-            pygame.draw.line(self.screen, COLOR_RAY, (px, py), (rx, ry), 1)
+            ends.append((self.player.x + math.cos(ray_angle) * dist,
+                         self.player.y + math.sin(ray_angle) * dist))
+        mm.draw_fan(self.screen, self.player.x, self.player.y, ends)
 
         # player
-        px = ox + int(self.player.x * MINIMAP_SCALE)
-        py = oy + int(self.player.y * MINIMAP_SCALE)
+        px, py = mm.to_screen(self.player.x, self.player.y)
         pygame.draw.circle(self.screen, COLOR_MINI_PLAYER, (px, py), 3)
         fx = px + int(math.cos(self.player.angle) * 8)
         fy = py + int(math.sin(self.player.angle) * 8)
         pygame.draw.line(self.screen, COLOR_MINI_PLAYER, (px, py), (fx, fy), 2)
 
-        # NPCs
-        for npc in self.npcs:
-            nx = ox + int(npc.x * MINIMAP_SCALE)
-            ny = oy + int(npc.y * MINIMAP_SCALE)
-            pygame.draw.circle(self.screen, COLOR_MINI_NPC, (nx, ny), 3)
+        # NPCs in the minimap window (plus a one-cell rim for dots on the edge)
+        x0, y0, x1, y1 = mm.view_cells_range()
+        for npc in self.npc_index.query_cells(x0 - 1, y0 - 1, x1 + 1, y1 + 1):
+            pygame.draw.circle(self.screen, COLOR_MINI_NPC, mm.to_screen(npc.x, npc.y), 3)
+
+        mm.end(self.screen)
 
     def draw_hud(self):
         font = pygame.font.SysFont("consolas", 16)
-        text = f"FPS:{int(self.clock.get_fps()):3d}  Pos:({self.player.x:.2f},{self.player.y:.2f})  Angle:{math.degrees(self.player.angle)%360:6.2f}°  NPCs:{len(self.npcs)}"
+        text = f"FPS:{int(self.clock.get_fps()):3d}  Pos:({self.player.x:.2f},{self.player.y:.2f})  Angle:{math.degrees(self.player.angle)%360:6.2f}°  NPCs:{len(self.npcs)}  Res:{self.scaler.label(HEIGHT)}"
         surf = font.render(text, True, (200, 200, 210))
         self.screen.blit(surf, (10, HEIGHT - 24))
 
@@ -529,15 +789,25 @@ class Engine:
         self.spawn_npc()
         while self.running:
             dt = self.clock.tick(FPS) / 1000.0
+            self.timer.begin_frame()
             self.handle_input(dt)
+            self.timer.mark("input")
             self.update_npcs(dt)
+            self.timer.mark("npcs")
             rays, zbuffer = self.cast_rays()
+            self.timer.mark("cast")
             self.render(rays, zbuffer)
+            self.timer.end_frame()
+            self.scaler.update(self.timer.last_frame_ms())
         # persist brain on exit
-        self.brain.save()
+        self.brain.close()
+        if self.band_pool is not None:
+            self.band_pool.close()
         pygame.quit()
         sys.exit(0)
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:  # optional .pyrmap level
+        load_map_file(sys.argv[1])
     Engine().run()
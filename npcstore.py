@@ -0,0 +1,202 @@
+"""
+Struct-of-arrays NPC storage with batched movement and wall collision.
+
+NPCStore keeps every NPC's position, speed and last distance to the
+player in parallel float64 arrays and moves the whole population with a
+handful of array operations per frame, instead of one Python call chain
+(math.hypot, brain.choose, try_move, brain.learn) per NPC:
+
+    npcs = NPCStore()
+    npcs.add(3.5, 7.5)
+    moved = npcs.update(brain, dt, player_x, player_y, grid.solid_array())
+
+update() draws one action per NPC with brain.choose_many(), steps every
+NPC at its speed with the same per-axis collision as try_move_npc (x
+first, then y from the new x; anything outside the map is a wall), and
+hands all the "got closer" outcomes to brain.learn_many() at once. All
+NPCs choose from the weights as they were at the start of the update,
+rather than from weights already nudged by earlier NPCs in the same frame.
+
+The rest of the engine still sees objects: iterating the store (or
+indexing it) yields NPCHandle objects whose x / y / speed / last_dist read
+and write the arrays, so render_npcs, the minimap and SpatialHash work
+unchanged. prev_x / prev_y are the positions before the last update(),
+for drawing NPCs between two simulation ticks. A SpatialHash passed to update() is re-bucketed only for the
+NPCs that crossed a square.
+
+Requires numpy; without it the engines keep a list of NPC objects.
+"""
+
+import numpy as np
+
+
+class NPCHandle:
+    """One NPC of an NPCStore, by index."""
+    __slots__ = ("store", "i")
+
+    def __init__(self, store, i):
+        self.store = store
+        self.i = i
+
+    @property
+    def x(self):
+        return float(self.store.x[self.i])
+
+    @x.setter
+    def x(self, v):
+        self.store.x[self.i] = v
+
+    @property
+    def y(self):
+        return float(self.store.y[self.i])
+
+    @y.setter
+    def y(self, v):
+        self.store.y[self.i] = v
+
+    @property
+    def speed(self):
+        return float(self.store.speed[self.i])
+
+    @speed.setter
+    def speed(self, v):
+        self.store.speed[self.i] = v
+
+    @property
+    def last_dist(self):
+        return float(self.store.last_dist[self.i])
+
+    @property
+    def prev_x(self):
+        return float(self.store.prev_x[self.i])
+
+    @property
+    def prev_y(self):
+        return float(self.store.prev_y[self.i])
+
+    def pos(self):
+        return (self.x, self.y)
+
+
+class NPCStore:
+    def __init__(self, capacity=64, speed=2.0, rng=None):
+        """`speed` is the default for add(); `rng` a numpy Generator for the action draws."""
+        self.n = 0
+        self.default_speed = float(speed)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.last_dist = np.full(capacity, 1e9)
+        self.prev_x = np.zeros(capacity)  # positions before the last update(), for interpolation
+        self.prev_y = np.zeros(capacity)
+        self.handles = []
+        self._actions = None  # (brain ACTIONS, unit dx, unit dy)
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return iter(self.handles)
+
+    def __getitem__(self, i):
+        return self.handles[i]
+
+    def _grow(self):
+        cap = 2 * len(self.x)
+        for name in ("x", "y", "speed", "last_dist", "prev_x", "prev_y"):
+            old = getattr(self, name)
+            new = np.full(cap, 1e9) if name == "last_dist" else np.zeros(cap)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def add(self, x, y, speed=None):
+        """Append an NPC; returns its handle."""
+        if self.n == len(self.x):
+            self._grow()
+        i = self.n
+        self.x[i] = self.prev_x[i] = x
+        self.y[i] = self.prev_y[i] = y
+        self.speed[i] = self.default_speed if speed is None else speed
+        self.last_dist[i] = 1e9
+        self.n += 1
+        handle = NPCHandle(self, i)
+        self.handles.append(handle)
+        return handle
+
+    def append(self, npc):
+        """list.append-compatible: copies an NPC object's x / y / speed into the store."""
+        self.add(npc.x, npc.y, getattr(npc, "speed", None))
+
+    def extend(self, npcs):
+        for npc in npcs:
+            self.append(npc)
+
+    def clear(self):
+        self.n = 0
+        self.handles.clear()
+
+    # ----------------- simulation -----------------
+    def _unit_actions(self, actions):
+        if self._actions is None or self._actions[0] is not actions:
+            dx = np.array([a[0] for a in actions], dtype=np.float64)
+            dy = np.array([a[1] for a in actions], dtype=np.float64)
+            mag = np.hypot(dx, dy)
+            mag[mag == 0] = 1.0
+            self._actions = (actions, dx / mag, dy / mag)
+        return self._actions[1], self._actions[2]
+
+    def update(self, brain, dt, player_x, player_y, solid, pvs_row=None, index=None):
+        """Move and train every NPC for one step of `dt` seconds.
+
+        `solid` is the (height, width) wall mask (GridMap.solid_array()).
+        Returns the number of NPCs that moved, or with `pvs_row` (see pvs.py)
+        the number that moved from or into a cell the player may see.
+        """
+        n = self.n
+        if n == 0:
+            return 0
+        x, y = self.x[:n], self.y[:n]
+        prev_x, prev_y = self.prev_x[:n], self.prev_y[:n]
+        prev_x[:] = x
+        prev_y[:] = y
+        prev_dist = np.hypot(player_x - x, player_y - y)
+
+        actions = brain.choose_many(n, self.rng)
+        ux, uy = self._unit_actions(brain.ACTIONS)
+        step = self.speed[:n] * dt
+        h, w = solid.shape
+        new = x + ux[actions] * step
+        np.copyto(x, new, where=~_blocked(solid, w, h, new, y))
+        new = y + uy[actions] * step
+        np.copyto(y, new, where=~_blocked(solid, w, h, x, new))
+
+        dist = np.hypot(player_x - x, player_y - y)
+        self.last_dist[:n] = dist
+        brain.learn_many(actions, dist < prev_dist)
+
+        moved = (x != prev_x) | (y != prev_y)
+        if index is not None:
+            b = index.bucket
+            crossed = moved & ((x // b != prev_x // b) | (y // b != prev_y // b))
+            handles = self.handles
+            for i in np.flatnonzero(crossed).tolist():
+                index.update(handles[i])
+        if pvs_row is not None:
+            bits = np.frombuffer(pvs_row, dtype=np.uint8)
+            seen = _bit(bits, prev_y.astype(np.int64) * w + prev_x.astype(np.int64))
+            seen |= _bit(bits, y.astype(np.int64) * w + x.astype(np.int64))
+            moved &= seen
+        return int(np.count_nonzero(moved))
+
+
+def _blocked(solid, w, h, x, y):
+    """is_wall() for arrays of points: outside the map or on a solid cell."""
+    inside = (x >= 0) & (y >= 0) & (x < w) & (y < h)
+    xi = np.where(inside, x, 0).astype(np.int64)
+    yi = np.where(inside, y, 0).astype(np.int64)
+    return ~inside | (solid[yi, xi] != 0)
+
+
+def _bit(bits, cells):
+    return ((bits[cells >> 3] >> (cells & 7).astype(np.uint8)) & 1).astype(bool)
@@ -0,0 +1,171 @@
+"""
+Occupancy pyramid for big, mostly empty maps.
+
+Level 0 is the map's solid mask. Level L has one byte per 2^L x 2^L block
+of cells, set when any cell in the block is solid, so level 1 covers 2x2
+blocks, level 2 4x4 blocks and so on up to MAX_LEVEL. GridMap.occupancy()
+builds it on first use and GridMap.set() keeps it current through
+update(), which touches one byte per level at most.
+
+march() is distfield.march() with the pyramid in place of the distance
+field. From the current cell it climbs to the largest empty block that
+contains it, and when that block is at least 2^MIN_LEVEL cells wide it
+jumps to the block's far edge with distfield.skip_to(). The result is
+the same (bit for bit) as plain DDA:
+
+    pyr = grid.occupancy()
+    hit, map_x, map_y, side, t, steps = march(px, py, rx, ry, grid.solid_rows(),
+                                              grid.width, grid.height, 1024, pyr)
+
+Unlike the distance field, which has to be rebuilt when a wall moves, the
+pyramid updates in O(levels) per edited tile. Its jumps stop at block
+edges, so it takes somewhat more steps than the field on the same map.
+"""
+
+from distfield import skip_to
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python build below
+    np = None
+
+MAX_LEVEL = 8     # 256x256 blocks
+MIN_LEVEL = 3     # only jump across blocks of at least 8x8 cells (smaller jumps don't pay)
+
+
+class OccupancyPyramid:
+    def __init__(self, grid, max_level=MAX_LEVEL):
+        self.grid = grid
+        self.width, self.height = grid.width, grid.height
+        self.levels = [grid.solid_rows()]
+        if np is not None:
+            self._build_np(max_level)
+        else:
+            self._build_py(max_level)
+
+    def _build_np(self, max_level):
+        occ = self.grid.solid_array() != 0
+        while len(self.levels) <= max_level and max(occ.shape) > 1:
+            h, w = occ.shape
+            if h % 2 or w % 2:
+                padded = np.zeros((h + h % 2, w + w % 2), dtype=bool)
+                padded[:h, :w] = occ
+                occ = padded
+            occ = occ.reshape(occ.shape[0] // 2, 2, occ.shape[1] // 2, 2).any(axis=(1, 3))
+            self.levels.append([bytearray(row.astype(np.uint8).tobytes()) for row in occ])
+
+    def _build_py(self, max_level):
+        prev, h, w = self.levels[0], self.height, self.width
+        while len(self.levels) <= max_level and max(h, w) > 1:
+            h2, w2 = (h + 1) // 2, (w + 1) // 2
+            level = []
+            for y in range(h2):
+                r0 = prev[2 * y]
+                r1 = prev[2 * y + 1] if 2 * y + 1 < h else r0
+                row = bytearray(w2)
+                for x in range(w2):
+                    x1 = min(2 * x + 1, w - 1)
+                    row[x] = 1 if (r0[2 * x] or r0[x1] or r1[2 * x] or r1[x1]) else 0
+                level.append(row)
+            self.levels.append(level)
+            prev, h, w = level, h2, w2
+
+    def update(self, x, y):
+        """Re-derive the blocks above cell (x, y) after its solid flag changed."""
+        levels = self.levels
+        occupied = 1 if levels[0][y][x] else 0
+        for level in range(1, len(levels)):
+            bx, by = x >> level, y >> level
+            if not occupied:
+                # any of the (up to) four child blocks still solid?
+                below = levels[level - 1]
+                for cy in (2 * by, 2 * by + 1)[:len(below) - 2 * by]:
+                    child = below[cy][2 * bx:2 * bx + 2]
+                    if any(child):
+                        occupied = 1
+                        break
+            row = levels[level][by]
+            if row[bx] == occupied:
+                break
+            row[bx] = occupied
+
+
+def march(px, py, rx, ry, solid, width, height, max_steps=1024, pyramid=None):
+    """distfield.march() skipping the empty blocks of `pyramid` (an OccupancyPyramid)."""
+    map_x = int(px)
+    map_y = int(py)
+    delta_x = abs(1.0 / rx) if rx != 0 else 1e30
+    delta_y = abs(1.0 / ry) if ry != 0 else 1e30
+
+    if rx < 0:
+        step_x = -1
+        side_x = (px - map_x) * delta_x
+    else:
+        step_x = 1
+        side_x = (map_x + 1.0 - px) * delta_x
+    if ry < 0:
+        step_y = -1
+        side_y = (py - map_y) * delta_y
+    else:
+        step_y = 1
+        side_y = (map_y + 1.0 - py) * delta_y
+
+    levels = pyramid.levels
+    top = len(levels) - 1
+    side = 0
+    cells = 0  # cells advanced, for max_steps
+    steps = 0
+    level = 0
+    if not (0 <= map_x < width and 0 <= map_y < height):
+        top = 0  # outside the map: plain DDA until the loop below stops it
+    while cells < max_steps:
+        # Largest empty block holding the current cell, starting from the last
+        # one's level: neighbouring blocks along a ray tend to be alike.
+        while level and levels[level][map_y >> level][map_x >> level]:
+            level -= 1
+        while level < top and not levels[level + 1][map_y >> (level + 1)][map_x >> (level + 1)]:
+            level += 1
+        if level >= MIN_LEVEL:
+            # Free steps left inside the block on each axis, never past the map edge.
+            size = 1 << level
+            if step_x > 0:
+                kx = (map_x | (size - 1)) - map_x
+                if map_x + kx >= width:
+                    kx = width - 1 - map_x
+            else:
+                kx = map_x & (size - 1)
+            if step_y > 0:
+                ky = (map_y | (size - 1)) - map_y
+                if map_y + ky >= height:
+                    ky = height - 1 - map_y
+            else:
+                ky = map_y & (size - 1)
+            room = (max_steps - 1 - cells) >> 1
+            if kx > room:
+                kx = room
+            if ky > room:
+                ky = room
+            if kx or ky:
+                n, m, side_x, side_y = skip_to(side_x, side_y, delta_x, delta_y, kx, ky)
+                if n or m:
+                    map_x += step_x * n
+                    map_y += step_y * m
+                    cells += n + m
+                    steps += 1
+
+        if side_x < side_y:
+            side_x += delta_x
+            map_x += step_x
+            side = 0
+        else:
+            side_y += delta_y
+            map_y += step_y
+            side = 1
+        cells += 1
+        steps += 1
+        if map_x < 0 or map_y < 0 or map_x >= width or map_y >= height:
+            break
+        if solid[map_y][map_x]:
+            t = side_x - delta_x if side == 0 else side_y - delta_y
+            return True, map_x, map_y, side, t, steps
+    return False, map_x, map_y, side, 0.0, steps
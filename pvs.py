@@ -0,0 +1,303 @@
+"""
+Potentially visible sets (PVS) for grid maps.
+
+For every free cell the PVS holds one bit per map cell, set when that cell
+can be seen from somewhere inside the free cell. It is built once per map
+(build(), or offline with `python pvs.py level.pyrmap`), after which "could
+the player see this cell" is a byte index and a mask:
+
+    sets = grid.pvs()
+    row = sets.row(player_x, player_y)           # None: no set for that cell
+    i = int(npc_y) * grid.width + int(npc_x)
+    if row is not None and not row[i >> 3] >> (i & 7) & 1: ...   # hidden
+
+The sets are conservative: a cell is in the set when some straight line
+through the source cell and that cell misses every wall in between, so
+every cell a ray can reach from anywhere in the source cell is included.
+The builder walks the lines instead of sampling them (_sweep). Lines that
+run mostly along +x are y = m * x + k with |m| <= 1, and the ones through
+the source cell form a convex polygon in (m, k). Going one column at a
+time, the polygon is clipped to each free run of cells in that column that
+its lines can pass through, one branch per run. The cells its lines touch
+in each column are visible, until no line is left. The other three
+directions are the same walk on the mirrored and transposed map. Walls in
+the source and target columns are not tested, which only adds cells, and
+lines exactly grazing a wall corner are treated as blocked. Every set is
+then grown by `margin` cells for billboards poking out of their cell (the
+engines' sprites are narrower than one cell).
+
+Each free cell costs ceil(width * height / 8) bytes, so building at load
+time is limited to BUILD_LIMIT cells. Bigger maps can be built offline
+into a `.pvs` file next to the map, which mapfile.load() picks up. A file
+stores a CRC of the solid mask, so a stale set is refused rather than
+used.
+
+Requires numpy for build(); row() and can_see() are plain Python.
+"""
+
+import math
+import os
+import struct
+import sys
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # no build(); saved sets still load
+    np = None
+
+MAGIC = b"PYRV"
+VERSION = 2  # 1 was built from sampled rays and could miss visible cells
+HEADER = struct.Struct("<4sHHIIII")  # magic, version, margin, width, height, stride, mask crc
+BUILD_LIMIT = 48 * 48  # cells; a 48x48 map takes ~0.6 MB and about 1 s
+DEFAULT_MARGIN = 1
+GRAZE = 1e-9  # free runs are shrunk by this much, so lines touching a wall's edge are blocked
+SOURCE_CHUNK = 256  # source cells whose sets are kept unpacked at once (bounds memory)
+
+
+def mask_crc(grid):
+    return zlib.crc32(bytes(grid.solid)) & 0xFFFFFFFF
+
+
+class PotentiallyVisibleSets:
+    def __init__(self, width, height, bits, offsets, margin=DEFAULT_MARGIN, crc=0):
+        """`bits` holds one `stride`-byte bitset per free cell, `offsets[y * width + x]`
+        is where that cell's set starts (-1 for solid cells)."""
+        self.width = width
+        self.height = height
+        self.stride = (width * height + 7) // 8
+        self.bits = bits
+        self.offsets = offsets
+        self.margin = margin
+        self.crc = crc
+        self._view = memoryview(bits)
+
+    def row(self, x, y):
+        """Bitset of the cells visible from cell (x, y) (world coords), or None for solid or
+        outside cells. Bit i (byte i >> 3, bit i & 7) is cell i = y * width + x."""
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return None
+        o = self.offsets[int(y) * self.width + int(x)]
+        if o < 0:
+            return None
+        return self._view[o:o + self.stride]
+
+    def can_see(self, from_x, from_y, x, y):
+        """True if cell (x, y) may be visible from cell (from_x, from_y); True when unknown."""
+        row = self.row(from_x, from_y)
+        if row is None:
+            return True
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return False
+        i = int(y) * self.width + int(x)
+        return bool(row[i >> 3] >> (i & 7) & 1)
+
+    def count(self, x, y):
+        """Number of cells visible from cell (x, y) (0 for solid cells)."""
+        row = self.row(x, y)
+        return 0 if row is None else sum(bin(b).count("1") for b in row)
+
+    def nbytes(self):
+        return len(self.bits)
+
+    # ----------------- files -----------------
+    def save(self, path):
+        """Write the sets to `path` (via a temp file, like mapfile.save)."""
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.margin, self.width, self.height,
+                                self.stride, self.crc))
+            f.write(self.bits)
+        os.replace(tmp, path)
+        return path
+
+
+def _offsets(grid, stride):
+    offsets = []
+    o = 0
+    for s in grid.solid:
+        if s:
+            offsets.append(-1)
+        else:
+            offsets.append(o)
+            o += stride
+    return offsets
+
+
+def load(path, grid):
+    """Sets saved for `grid`; ValueError if the file is not a PVS or belongs to another map."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path}: not a PVS file (too short)")
+    magic, version, margin, width, height, stride, crc = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: bad magic {magic!r}")
+    if version != VERSION:
+        raise ValueError(f"{path}: unsupported format version {version}")
+    if (width, height) != (grid.width, grid.height) or crc != mask_crc(grid):
+        raise ValueError(f"{path}: built for a different map")
+    offsets = _offsets(grid, stride)
+    free = sum(1 for o in offsets if o >= 0)
+    if len(data) - HEADER.size != free * stride:
+        raise ValueError(f"{path}: truncated or corrupt")
+    return PotentiallyVisibleSets(width, height, bytearray(data[HEADER.size:]), offsets, margin, crc)
+
+
+# ----------------------------- build ----------------------------------
+def build(grid, margin=DEFAULT_MARGIN, limit=BUILD_LIMIT):
+    """PVS of every free cell of `grid`; None without numpy or above `limit` cells."""
+    w, h = grid.width, grid.height
+    if np is None or w * h > limit:
+        return None
+    solid = grid.solid_array() != 0
+    stride = (w * h + 7) // 8
+    sources = np.flatnonzero(~solid.ravel())
+    # columns of the map as seen by lines running along +x, -x, +y and -y
+    views = (solid.T, solid.T[::-1], solid, solid[::-1])
+    runs = [_free_runs(v) for v in views]
+
+    bits = bytearray()
+    for c0 in range(0, len(sources), SOURCE_CHUNK):
+        chunk = sources[c0:c0 + SOURCE_CHUNK]
+        seen = np.zeros((len(chunk), h, w), dtype=bool)
+        for n, i in enumerate(chunk.tolist()):
+            x, y = i % w, i // w
+            cells = seen[n]
+            cells[y, x] = True
+            for view, view_runs, sx, sy in zip((cells.T, cells.T[::-1], cells, cells[::-1]), runs,
+                                               (x, w - 1 - x, y, h - 1 - y), (y, y, x, x)):
+                _sweep(view_runs, sx, sy, view)
+        for _ in range(margin):
+            grown = seen.copy()
+            grown[:, :, 1:] |= seen[:, :, :-1]
+            grown[:, :, :-1] |= seen[:, :, 1:]
+            seen = grown.copy()
+            seen[:, 1:] |= grown[:, :-1]
+            seen[:, :-1] |= grown[:, 1:]
+        bits += np.packbits(seen.reshape(len(chunk), h * w), axis=1, bitorder="little").tobytes()
+    return PotentiallyVisibleSets(w, h, bits, _offsets(grid, stride), margin, mask_crc(grid))
+
+
+def _free_runs(columns):
+    """Per column of a (columns, rows) solid mask, the free runs as (low, high) y bounds,
+    shrunk by GRAZE."""
+    runs = []
+    for col in columns.tolist():
+        spans = []
+        r, rows = 0, len(col)
+        while r < rows:
+            if col[r]:
+                r += 1
+                continue
+            r0 = r
+            while r < rows and not col[r]:
+                r += 1
+            spans.append((r0 + GRAZE, r - GRAZE))
+        runs.append(spans)
+    return runs
+
+
+def _clip(poly, x, bound, sign):
+    """The part of the convex (m, k) polygon whose lines have sign * (y(x) - bound) >= 0."""
+    out = []
+    n = len(poly)
+    for i in range(n):
+        m0, k0 = poly[i]
+        m1, k1 = poly[i + 1 - n]
+        f0 = sign * (m0 * x + k0 - bound)
+        f1 = sign * (m1 * x + k1 - bound)
+        if f0 >= 0:
+            out.append(poly[i])
+        if (f0 >= 0) != (f1 >= 0):
+            t = f0 / (f0 - f1)
+            out.append((m0 + t * (m1 - m0), k0 + t * (k1 - k0)))
+    return out
+
+
+def _sweep(runs, sx, sy, seen):
+    """Mark in seen[column, row] every cell that a line through cell (sx, sy) can touch on
+    its way along +column, with |slope| <= 1, before it meets a wall.
+
+    A line is y = m * (column - sx) + k. The lines through the source cell are two convex
+    polygons in (m, k), one per sign of m. Each is carried column by column and clipped
+    to the free runs it can pass through; a run that holds all its lines needs no clip."""
+    columns = len(runs)
+    last = seen.shape[1] - 1
+    ceil, floor = math.ceil, math.floor
+    stack = [(1, [(0.0, sy), (1.0, sy - 1.0), (1.0, sy + 1.0), (0.0, sy + 1.0)]),
+             (1, [(0.0, sy), (0.0, sy + 1.0), (-1.0, sy + 2.0), (-1.0, sy)])]
+    while stack:
+        dx, poly = stack.pop()
+        while sx + dx < columns:
+            c = sx + dx
+            # y range of the lines where they enter (lo0..hi0) and leave (lo1..hi1) the column
+            lo0 = lo1 = math.inf
+            hi0 = hi1 = -math.inf
+            for m, k in poly:
+                y = m * dx + k
+                if y < lo0:
+                    lo0 = y
+                if y > hi0:
+                    hi0 = y
+                y += m
+                if y < lo1:
+                    lo1 = y
+                if y > hi1:
+                    hi1 = y
+            lo = lo0 if lo0 < lo1 else lo1
+            hi = hi0 if hi0 > hi1 else hi1
+            r0, r1 = ceil(lo) - 1, floor(hi)
+            seen[c, r0 if r0 > 0 else 0:(r1 if r1 < last else last) + 1] = True
+            inside = False
+            for low, high in runs[c]:
+                if high < lo or low > hi:
+                    continue
+                if low <= lo and hi <= high:
+                    inside = True
+                    break
+                part = poly
+                if lo0 < low:
+                    part = _clip(part, dx, low, 1.0)
+                if part and hi0 > high:
+                    part = _clip(part, dx, high, -1.0)
+                if part and lo1 < low:
+                    part = _clip(part, dx + 1, low, 1.0)
+                if part and hi1 > high:
+                    part = _clip(part, dx + 1, high, -1.0)
+                if part:
+                    stack.append((dx + 1, part))
+            if not inside:
+                break
+            dx += 1
+
+
+def sidecar_path(map_path):
+    return map_path + ".pvs"
+
+
+def main(argv=None):
+    """python pvs.py level.pyrmap [--limit N]: build level.pyrmap.pvs next to the map."""
+    import argparse
+    import time
+    import mapfile
+
+    ap = argparse.ArgumentParser(description="Build the potentially visible sets of a .pyrmap map.")
+    ap.add_argument("map")
+    ap.add_argument("--margin", type=int, default=DEFAULT_MARGIN)
+    ap.add_argument("--limit", type=int, default=128 * 128, help="largest map (cells) to build")
+    opts = ap.parse_args(argv)
+    if np is None:
+        sys.exit("pvs.py: building needs numpy")
+
+    grid = mapfile.load(opts.map).grid
+    t0 = time.perf_counter()
+    sets = build(grid, opts.margin, opts.limit)
+    if sets is None:
+        sys.exit(f"pvs.py: {grid.width}x{grid.height} is above --limit {opts.limit} cells")
+    path = sets.save(sidecar_path(opts.map))
+    print(f"{path}: {sets.nbytes() / 1024:.0f} KiB, {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,9 @@ import time
 import pygame
 from pygame.locals import *
 
+from minimap import Minimap
+from shadelut import ShadeLUT
+
 # except ImportError:
 #     print("PyRay could not import necessary modules")
 #     raise ImportError
@@ -33,6 +36,11 @@ worldMap =  [
             [2, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 3, 0, 0, 0, 1],
             [2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1]]
 
+# Wall colors per tile value, with the y faces darker (see shadelut.py).
+# One band and a flat curve: no distance fog, just the side shadow.
+WALL_SHADE = ShadeLUT({1: (150, 0, 0), 2: (0, 150, 0), 3: (0, 0, 150)},
+                      bands=1, curve=lambda dist: 1.0, side_factor=1 / 1.2)
+
 # Closes the program 
 def close(): 
     pygame.display.quit()
@@ -45,42 +53,30 @@ COLOR_MINI_FREE = (25, 25, 30)
 COLOR_MINI_PLAYER = (120, 200, 255)
 COLOR_RAY = (255, 215, 0)
 
+minimap = Minimap(COLOR_MINI_WALL, COLOR_MINI_FREE, COLOR_RAY, scale=MINIMAP_SCALE, padding=MINIMAP_PADDING)
+
 def draw_minimap(screen, worldMap, posX, posY, dirX, dirY, rays, scale=8, padding=10):
-    MAP_W = len(worldMap)
-    MAP_H = len(worldMap[0])
-    mm_w = MAP_W * MINIMAP_SCALE
-    mm_h = MAP_H * MINIMAP_SCALE
-    ox = MINIMAP_PADDING
-    oy = MINIMAP_PADDING
-    pygame.draw.rect(screen, (12, 12, 16), (ox - 2, oy - 2, mm_w + 4, mm_h + 4), border_radius=6)
-    for r in range(MAP_H):
-        for c in range(MAP_W):
-            rect = pygame.Rect(ox + c * MINIMAP_SCALE, oy + r * MINIMAP_SCALE, MINIMAP_SCALE, MINIMAP_SCALE)
-            if worldMap[r][c] != 0:
-                pygame.draw.rect(screen, COLOR_MINI_WALL, rect)
-            else:
-                pygame.draw.rect(screen, COLOR_MINI_FREE, rect)
-    
+    # worldMap[X][Y]: X is the minimap row, Y the column
+    # tiles come from cached chunks, big maps only show a window around the player
+    minimap.begin(screen, worldMap, posY, posX)
+
     if rays:
         step = max(1, len(rays) // 120)
-        px = ox + int(posY * scale)
-        py = oy + int(posX * scale)
-
+        ends = []
         for i in range(0, len(rays), step):
             dist, (rDx, rDy) = rays[i]
             mag = math.hypot(rDx, rDy) or 1.0
             ux, uy = rDx / mag, rDy / mag
-            rx = px + int(uy * dist * scale)
-            ry = py + int(ux * dist * scale)
-            pygame.draw.line(screen, COLOR_RAY, (px, py), (rx, ry), 1)
-    px = ox + int(posY * MINIMAP_SCALE)
-    py = oy + int(posX * MINIMAP_SCALE)
+            ends.append((posY + uy * dist, posX + ux * dist))
+        minimap.draw_fan(screen, posY, posX, ends)
+    px, py = minimap.to_screen(posY, posX)
     pygame.draw.circle(screen, COLOR_MINI_PLAYER, (px, py), 3)
     
     magd = math.hypot(dirX, dirY) or 1.0
     fx = px + int(dirY / magd * 8)
     fy = py + int(dirX / magd * 8)
     pygame.draw.line(screen, COLOR_MINI_PLAYER, (px, py), (fx, fy), 2)
+    minimap.end(screen)
 
 
 
@@ -212,6 +208,98 @@ def draw_muzzle_flash(screen, weapon_rect):
     pygame.draw.polygon(screen, (255, 245, 200), poly)
     pygame.draw.circle(screen, (255, 240, 180), (mx + 10, my), 6)
 
+def render_world(screen, positionX, positionY, directionX, directionY, planeX, planeY, showShadow=True):
+    """Draws roof, floor and walls for one frame. Returns the rays for the minimap."""
+    WIDTH, HEIGHT = screen.get_size()
+    WALL_HEIGHT = HEIGHT
+
+    # Draws roof and floor
+    screen.fill((25,25,25))
+    pygame.draw.rect(screen, (50,50,50), (0, HEIGHT/2, WIDTH, HEIGHT/2)) 
+            
+    # Starts drawing level from 0 to < WIDTH 
+    rays_for_minimap = [] 
+    wallShades = WALL_SHADE.rgb[0]
+    column = 0        
+    while column < WIDTH:
+        # Setting FOV
+        cameraX = 2.0 * column / WIDTH - 1.0
+        rayPositionX = positionX
+        rayPositionY = positionY
+        rayDirectionX = directionX + planeX * cameraX
+        rayDirectionY = directionY + planeY * cameraX + .000000000000001 # avoiding ZDE 
+
+        # In what square is the ray?
+        mapX = int(rayPositionX)
+        mapY = int(rayPositionY)
+
+        # Delta distance calculation
+        # Delta = square ( raydir * raydir) / (raydir * raydir)
+        deltaDistanceX = math.sqrt(1.0 + (rayDirectionY * rayDirectionY) / (rayDirectionX * rayDirectionX))
+        deltaDistanceY = math.sqrt(1.0 + (rayDirectionX * rayDirectionX) / (rayDirectionY * rayDirectionY))
+
+        # We need sideDistanceX and Y for distance calculation. Checks quadrant
+        if (rayDirectionX < 0):
+            stepX = -1
+            sideDistanceX = (rayPositionX - mapX) * deltaDistanceX
+
+        else:
+            stepX = 1
+            sideDistanceX = (mapX + 1.0 - rayPositionX) * deltaDistanceX
+
+        if (rayDirectionY < 0):
+            stepY = -1
+            sideDistanceY = (rayPositionY - mapY) * deltaDistanceY
+
+        else:
+            stepY = 1
+            sideDistanceY = (mapY + 1.0 - rayPositionY) * deltaDistanceY
+
+        # Finding distance to a wall
+        hit = 0
+        while  (hit == 0):
+            if (sideDistanceX < sideDistanceY):
+                sideDistanceX += deltaDistanceX
+                mapX += stepX
+                side = 0
+                
+            else:
+                sideDistanceY += deltaDistanceY
+                mapY += stepY
+                side = 1
+                
+            if (worldMap[mapX][mapY] > 0):
+                hit = 1
+
+        # Correction against fish eye effect
+        if (side == 0):
+            perpWallDistance = abs((mapX - rayPositionX + ( 1.0 - stepX ) / 2.0) / rayDirectionX)
+        else:
+            perpWallDistance = abs((mapY - rayPositionY + ( 1.0 - stepY ) / 2.0) / rayDirectionY)
+
+        # Calculating HEIGHT of the line to draw
+        lineHEIGHT = abs(int(WALL_HEIGHT / (perpWallDistance+.0000001)))
+        drawStart = -lineHEIGHT / 2.0 + WALL_HEIGHT / 2.0
+
+        # if drawStat < 0 it would draw outside the screen
+        if (drawStart < 0):
+            drawStart = 0
+
+        drawEnd = lineHEIGHT / 2.0 + WALL_HEIGHT / 2.0
+
+        if (drawEnd >= WALL_HEIGHT):
+            drawEnd = WALL_HEIGHT - 1
+
+        # Wall color from the table. If side == 1 the color is toned down,
+        # which gives a "showShadow" on the wall (only if showShadow is True)
+        color = wallShades[ worldMap[mapX][mapY] ][ side if showShadow else 0 ]
+
+        # Drawing the graphics                           
+        pygame.draw.line(screen, color, (column,drawStart), (column, drawEnd), 2)
+        column += 2
+        rays_for_minimap.append( (perpWallDistance, (rayDirectionX, rayDirectionY)) )
+    return rays_for_minimap
+
 def main():
     pygame.init()
 
@@ -353,100 +441,9 @@ def main():
         # Animation State update
         update_weapon_state(weapon, weapon_state, dt)
             
-        # Draws roof and floor
-        screen.fill((25,25,25))
-        pygame.draw.rect(screen, (50,50,50), (0, HEIGHT/2, WIDTH, HEIGHT/2)) 
-                
-        # Starts drawing level from 0 to < WIDTH 
-        rays_for_minimap = [] 
-        column = 0        
-        while column < WIDTH:
-            # Setting FOV
-            cameraX = 2.0 * column / WIDTH - 1.0
-            rayPositionX = positionX
-            rayPositionY = positionY
-            rayDirectionX = directionX + planeX * cameraX
-            rayDirectionY = directionY + planeY * cameraX + .000000000000001 # avoiding ZDE 
-
-            # In what square is the ray?
-            mapX = int(rayPositionX)
-            mapY = int(rayPositionY)
-
-            # Delta distance calculation
-            # Delta = square ( raydir * raydir) / (raydir * raydir)
-            deltaDistanceX = math.sqrt(1.0 + (rayDirectionY * rayDirectionY) / (rayDirectionX * rayDirectionX))
-            deltaDistanceY = math.sqrt(1.0 + (rayDirectionX * rayDirectionX) / (rayDirectionY * rayDirectionY))
-
-            # We need sideDistanceX and Y for distance calculation. Checks quadrant
-            if (rayDirectionX < 0):
-                stepX = -1
-                sideDistanceX = (rayPositionX - mapX) * deltaDistanceX
-
-            else:
-                stepX = 1
-                sideDistanceX = (mapX + 1.0 - rayPositionX) * deltaDistanceX
-
-            if (rayDirectionY < 0):
-                stepY = -1
-                sideDistanceY = (rayPositionY - mapY) * deltaDistanceY
-
-            else:
-                stepY = 1
-                sideDistanceY = (mapY + 1.0 - rayPositionY) * deltaDistanceY
-
-            # Finding distance to a wall
-            hit = 0
-            while  (hit == 0):
-                if (sideDistanceX < sideDistanceY):
-                    sideDistanceX += deltaDistanceX
-                    mapX += stepX
-                    side = 0
-                    
-                else:
-                    sideDistanceY += deltaDistanceY
-                    mapY += stepY
-                    side = 1
-                    
-                if (worldMap[mapX][mapY] > 0):
-                    hit = 1
-
-            # Correction against fish eye effect
-            if (side == 0):
-                perpWallDistance = abs((mapX - rayPositionX + ( 1.0 - stepX ) / 2.0) / rayDirectionX)
-            else:
-                perpWallDistance = abs((mapY - rayPositionY + ( 1.0 - stepY ) / 2.0) / rayDirectionY)
-
-            # Calculating HEIGHT of the line to draw
-            lineHEIGHT = abs(int(WALL_HEIGHT / (perpWallDistance+.0000001)))
-            drawStart = -lineHEIGHT / 2.0 + WALL_HEIGHT / 2.0
-
-            # if drawStat < 0 it would draw outside the screen
-            if (drawStart < 0):
-                drawStart = 0
-
-            drawEnd = lineHEIGHT / 2.0 + WALL_HEIGHT / 2.0
-
-            if (drawEnd >= WALL_HEIGHT):
-                drawEnd = WALL_HEIGHT - 1
-
-            # Wall colors 0 to 3
-            wallcolors = [ [], [150,0,0], [0,150,0], [0,0,150] ]
-            color = wallcolors[ worldMap[mapX][mapY] ]                                  
-
-            # If side == 1 then ton the color down. Gives a "showShadow" an the wall.
-            # Draws showShadow if showShadow is True
-            # Depth based shadow
-            if showShadow:
-                if side == 1:
-                    for i,v in enumerate(color):
-                        color[i] = int(v / 1.2)                    
-
-            # Drawing the graphics                           
-            pygame.draw.line(screen, color, (column,drawStart), (column, drawEnd), 2)
-            column += 2
-            rays_for_minimap.append( (perpWallDistance, (rayDirectionX, rayDirectionY)) )
+        rays_for_minimap = render_world(screen, positionX, positionY, directionX, directionY, planeX, planeY, showShadow)
         draw_minimap(screen, worldMap, positionX, positionY, directionX, directionY, rays_for_minimap)
-        dx, dy, flash_on, p = animation_offset(weapon, weapon_state)  # <- state 전달
+        dx, dy, flash_on = animation_offset(weapon, weapon_state)  # <- state 전달
         rect = draw_weapon(screen, weapon_assets, weapon, (dx, dy))
 
         # 플래시 그리기
@@ -462,7 +459,8 @@ def main():
         pygame.event.pump()
         pygame.display.flip()           
        
-main()
+if __name__ == "__main__":
+    main()
 
 # 1. What is the way of exiting the game? -> esc button -> how can we exit the game with cloes(x) button
 # 2. Where the player start? -> Could you trap the player?
@@ -1,18 +1,64 @@
+import bisect
+import functools
+import hashlib
 import math
 import os
 import sys
 import random
 import json
+import struct
+import time
+import zlib
 
 import pygame
 from pygame.locals import *
 
+from autosave import AutoSaver
+from bandpool import BandPool
+from distfield import march
+from fixedstep import FixedStep, lerp
+from occupancy import march as march_pyramid
+from dynres import ResolutionScaler, stretch_columns, stretch_view
+from frametimer import FrameTimer
+from gridmap import GridMap
+import mapfile
+from minimap import Minimap
+from replay import EV_CLICK, EV_QUIT, Recorder
+from shadelut import ShadeLUT
+from spatial import SpatialHash
+from sprites import ScaledSpriteCache, visible_spans
+
+try:
+    import numpy as np
+    from npcstore import NPCStore
+    from framebuffer import WallRasterizer
+    from walltex import WallTextures
+    from floorcast import FloorCaster
+except ImportError:  # numpy 없으면 스칼라 캐스터 + draw.line 경로만 사용
+    np = None
+    NPCStore = None
+    WallRasterizer = None
+    WallTextures = None
+    FloorCaster = None
+
 # ---------------- Config ----------------
 WIDTH, HEIGHT = 1000, 700
 HALF_W, HALF_H = WIDTH // 2, HEIGHT // 2
 FPS = 60
 FOV = math.radians(70)
 MAX_DEPTH = 20.0
+CASTER = os.environ.get("PYRAY_CASTER", "numpy")  # "numpy" | "scalar"
+WALL_RENDERER = "textured"  # "textured" | "surfarray" (단색) | "lines" (F4 로 순환)
+WALL_MODES = ("textured", "surfarray", "lines")
+FLOOR_RENDERER = "textured"  # "textured" (바닥/천장 텍스처, numpy) | "flat" (F6 로 토글)
+CAST_WORKERS = int(os.environ.get("PYRAY_CAST_WORKERS", "0"))  # 0 = 메인 스레드에서 캐스팅
+CAST_POOL = os.environ.get("PYRAY_CAST_POOL", "thread")  # "thread" | "process"
+TRAVERSAL = os.environ.get("PYRAY_TRAVERSAL", "dda")  # "dda" | "skip" (거리장) | "pyramid" (점유 피라미드), scalar 캐스터
+PVS_CULLING = True  # 맵 칸별 가시 집합(pvs.py)으로 안 보이는 NPC 는 변환도 안 함 (numpy, 48x48 이하 맵)
+DYNAMIC_RES = False  # 프레임 시간에 맞춰 내부 컬럼 수 조절 (F5 로 토글)
+TARGET_FRAME_MS = 1000.0 / FPS
+SIM_HZ = 30  # 이동 / NPC / 학습 / 무기 타이머는 이 주기의 고정 틱으로 진행 (렌더는 틱 사이를 보간)
+MAX_SIM_STEPS = 5  # 한 프레임에 돌릴 최대 틱 수 (넘는 시간은 버림: 멈춤 뒤 따라잡기 폭주 방지)
 
 worldMap = [
     [1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2],
@@ -37,8 +83,14 @@ worldMap = [
     [2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2, 1],
 ]
 
-MAP_H = len(worldMap)
-MAP_W = len(worldMap[0])
+WORLD = GridMap.from_rows(worldMap)  # 실제로 쓰는 맵: 연속 uint8 버퍼 + solid 마스크
+SOLID_ROWS = WORLD.solid_rows()  # 순수 파이썬 루프용 (중첩 리스트 인덱싱이 더 빠름)
+MAP_H = WORLD.height
+MAP_W = WORLD.width
+MAP_VERSION = 0  # load_map 마다 증가 (캐시 무효화용)
+MAP_FILE = None  # load_map_file 로 연 .pyrmap 경로 (프로세스 풀 워커도 같은 파일을 mmap)
+SPAWN = (3.0, 7.0)
+CAST_STATS = {"rays": 0, "steps": 0}  # cast_rays 누적 (steps / rays = 광선당 DDA 반복 수)
 
 PROJ_PLANE_DIST = (WIDTH / 2) / math.tan(FOV / 2)
 
@@ -50,11 +102,27 @@ COLOR_MINI_FREE = (25, 25, 30)
 COLOR_MINI_PLAYER = (120, 200, 255)
 COLOR_MINI_NPC = (255, 140, 120)
 COLOR_RAY = (255, 220, 90)
+COLOR_WALLS = {1: (190, 190, 200), 2: (190, 190, 200), 3: (190, 190, 200)}  # 타일 값별 단색 벽 색
+
+# 거리 구간 x 타일 x 면 -> 색 (shadelut.py). 벽 / 바닥 / 천장 / NPC 가 모두 이 표의 밝기로 어두워짐
+WALL_SHADE = ShadeLUT(COLOR_WALLS, MAX_DEPTH)
 
 MINIMAP_SCALE = 8
 MINIMAP_PADDING = 10
+MINIMAP_VIEW_CELLS = 32  # 이보다 큰 맵은 플레이어 주변 창만 표시
+
+NPC_SPRITE_CACHE_BYTES = 16 * 1024 * 1024  # 스케일된 NPC 스프라이트 캐시 상한
+NPC_NEAR_CLIP = 0.1  # 이보다 가까운 NPC 는 안 그림 (화면 높이의 7배 스프라이트 = 수 GB smoothscale)
+NPC_INDEX_BUCKET = 4  # NPC 공간 해시 버킷 크기 (맵 칸 단위, spatial.py)
+NPC_STORE = True  # NPC 를 배열 묶음(npcstore.py)에 두고 한꺼번에 이동 (numpy 필요)
+
+# 프레임 단계별 타이머 (F3: 그래프, F2: CSV 저장)
+FRAME_STAGES = ["input", "update", "cast", "walls", "sprites", "minimap", "weapon", "hud", "flip"]
 
 BRAIN_PATH = "ai_brain.json"
+BRAIN_SAVE_INTERVAL = 2.0  # 브레인 가중치를 디스크에 쓰는 최소 간격 (초, 백그라운드 스레드가 씀)
+MOVE_SPEED = 3.0  # 칸/초
+ROT_SPEED = math.radians(120)
 ALPHA = 0.08
 DECAY = 0.995
 
@@ -64,10 +132,42 @@ def close():
     pygame.quit()
     sys.exit(0)
 
+def set_resolution(width, height):
+    """화면 크기와 파생 상수 갱신 (bench.py 등에서 사용)."""
+    global WIDTH, HEIGHT, HALF_W, HALF_H, PROJ_PLANE_DIST
+    WIDTH, HEIGHT = width, height
+    HALF_W, HALF_H = WIDTH // 2, HEIGHT // 2
+    PROJ_PLANE_DIST = (WIDTH / 2) / math.tan(FOV / 2)
+
+def _set_world(grid):
+    global WORLD, SOLID_ROWS, MAP_W, MAP_H, MAP_VERSION
+    WORLD = grid
+    SOLID_ROWS = WORLD.solid_rows()
+    MAP_H = WORLD.height
+    MAP_W = WORLD.width
+    MAP_VERSION += 1
+
+def load_map(rows):
+    """worldMap / WORLD 교체 (0 = 빈 칸, 1..3 = 벽)."""
+    global worldMap, MAP_FILE
+    worldMap = [list(row) for row in rows]
+    MAP_FILE = None
+    _set_world(GridMap.from_rows(worldMap))
+
+def load_map_file(path):
+    """.pyrmap 맵을 mmap 으로 열어 복사 없이 WORLD 로 사용. 파일의 spawn 을 반환."""
+    global worldMap, MAP_FILE, SPAWN
+    mf = mapfile.load(path)
+    worldMap = mf.grid  # grid[y][x] 로 읽히므로 행 리스트 대신 그대로 둠
+    MAP_FILE = path
+    SPAWN = mf.spawn
+    _set_world(mf.grid)
+    return mf.spawn
+
 def is_wall(x, y):
     if x < 0 or y < 0 or x >= MAP_W or y >= MAP_H:
         return True
-    return worldMap[int(y)][int(x)] > 0
+    return SOLID_ROWS[int(y)][int(x)] != 0
 
 # ---------------- Weapon sprites ----------------
 def _load_or_make(path, size, draw_fn):
@@ -258,30 +358,56 @@ def weapon_anim_offsets(weapon, state):
     up = -8 * math.sin(p * math.pi)
     return (0, int(up)), False, 0.0
 
+class EffectsOverlay:
+    """공격 이펙트용 오버레이. 작은 표면을 미리 만들어 두고
+    매 프레임 바뀐 영역(bounding rect)만 blit 한다."""
+    SLASH_PAD = 4
+
+    def __init__(self):
+        # 슬래시: x 는 center-28 .. center+32, y 는 center-20 .. center+6 (+선 두께)
+        p = self.SLASH_PAD
+        self.slash_surf = pygame.Surface((60 + 2 * p, 26 + 2 * p), pygame.SRCALPHA)
+        self.flash_surf = pygame.Surface((22, 10), pygame.SRCALPHA)
+        self.flash_surf.fill((255, 245, 210), (4, 0, 18, 10))
+        self.flash_surf.fill((255, 220, 160), (0, 3, 10, 6))
+
+    def muzzle_flash(self, screen, weapon_rect):
+        x = weapon_rect.right - 26
+        y = weapon_rect.top + 18
+        return screen.blit(self.flash_surf, (x - 4, y))
+
+    def slash(self, screen, weapon_rect, p):
+        alpha = max(0, int(255 * (1.0 - p)))
+        color = (255, 255, 255, alpha)
+
+        pad = self.SLASH_PAD
+        ox = weapon_rect.centerx - 28 - pad
+        oy = weapon_rect.centery - 20 - pad
+        x1 = weapon_rect.centerx - int(28 * (1 - p))
+        y1 = weapon_rect.centery - 20
+        x2 = weapon_rect.centerx + int(32 * (1 - p))
+        y2 = weapon_rect.centery + 6
+
+        surf = self.slash_surf
+        surf.fill((0, 0, 0, 0))
+        dirty = pygame.draw.line(surf, color, (x1 - ox, y1 - oy), (x2 - ox, y2 - oy), 2)
+        return screen.blit(surf, (ox + dirty.x, oy + dirty.y), dirty)
+
+EFFECTS = EffectsOverlay()
+
 def draw_muzzle_flash(screen, weapon_rect):
-    x = weapon_rect.right - 26
-    y = weapon_rect.top + 18
-    pygame.draw.rect(screen, (255, 245, 210), (x, y, 18, 10))
-    pygame.draw.rect(screen, (255, 220, 160), (x - 4, y + 3, 10, 6))
+    return EFFECTS.muzzle_flash(screen, weapon_rect)
 
 def draw_slash_effect(screen, weapon_rect, p):
-    alpha = max(0, int(255 * (1.0 - p)))
-    color = (255, 255, 255, alpha)
-    surf = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
-
-    x1 = weapon_rect.centerx - int(28 * (1 - p))
-    y1 = weapon_rect.centery - 20
-    x2 = weapon_rect.centerx + int(32 * (1 - p))
-    y2 = weapon_rect.centery + 6
-
-    pygame.draw.line(surf, color, (x1, y1), (x2, y2), 2)
-    screen.blit(surf, (0, 0))
+    return EFFECTS.slash(screen, weapon_rect, p)
 
 # ---------------- NPC + AI ----------------
 class NPC:
+    __slots__ = ("x", "y", "speed", "prev_x", "prev_y")
+
     def __init__(self, x, y, speed=2.0):
-        self.x = float(x)
-        self.y = float(y)
+        self.x = self.prev_x = float(x)
+        self.y = self.prev_y = float(y)  # prev_*: 지난 틱 위치 (렌더 보간용)
         self.speed = float(speed)
 
 class AIBrain:
@@ -295,9 +421,12 @@ class AIBrain:
         (-1, 1, "sw"), (-1, -1, "nw"),
     ]
 
-    def __init__(self, path=BRAIN_PATH):
+    def __init__(self, path=BRAIN_PATH, save_interval=BRAIN_SAVE_INTERVAL):
         self.path = path
         self.weights = {name: 1.0 for _, _, name in self.ACTIONS}
+        self._cum = None  # 누적 가중치 캐시 (가중치가 바뀌면 None)
+        self.dirty = False  # 마지막 save() 뒤로 가중치가 바뀌었는지
+        self.saver = AutoSaver(path, save_interval)
         self.load()
 
     def load(self):
@@ -311,29 +440,45 @@ class AIBrain:
                             self.weights[k] = float(v)
             except Exception:
                 pass
+        self._cum = None
 
     def save(self):
-        try:
-            with open(self.path, "w", encoding="utf-8") as f:
-                json.dump(self.weights, f, indent=2)
-        except Exception:
-            pass
+        """바뀐 가중치를 백그라운드 저장기에 넘김 (디스크 I/O 없음, 매 프레임 불러도 됨).
+        실제 쓰기는 save_interval 마다 한 번, 임시 파일 + rename 으로 (autosave.py)."""
+        if self.dirty:
+            self.saver.submit(dict(self.weights))
+            self.dirty = False
+
+    def close(self):
+        """마지막 가중치를 쓰고 저장 스레드를 멈춤 (종료 시)."""
+        self.save()
+        self.saver.close()
+
+    def cumulative(self):
+        """ACTIONS 순서의 누적 가중치 (가중치는 최소 1e-3). 가중치가 바뀔 때만 다시 계산."""
+        if self._cum is None:
+            acc = 0.0
+            cum = []
+            for _, _, name in self.ACTIONS:
+                acc += max(1e-3, self.weights[name])
+                cum.append(acc)
+            self._cum = cum
+        return self._cum
 
     def choose(self, npc=None, player=None):
-        names = [name for _, _, name in self.ACTIONS]
-        ws = [max(1e-3, self.weights[name]) for name in names]
-        total = sum(ws)
-        r = random.random() * total
-        acc = 0.0
-        idx = 0
-        for i, w in enumerate(ws):
-            acc += w
-            if r <= acc:
-                idx = i
-                break
+        cum = self.cumulative()
+        r = random.random() * cum[-1]
+        # r <= 누적값 인 첫 행동 (예전 선형 탐색과 같은 결과)
+        idx = min(bisect.bisect_left(cum, r), len(cum) - 1)
         dx, dy, name = self.ACTIONS[idx]
         return dx, dy, name
 
+    def choose_many(self, n, rng):
+        """choose() 를 n 번 부른 것과 같은 분포의 ACTIONS 인덱스 배열 (rng: numpy Generator)."""
+        cum = self.cumulative()
+        r = rng.random(n) * cum[-1]
+        return np.minimum(np.searchsorted(cum, r), len(cum) - 1)
+
     def learn(self, action_name: str, improved: bool):
         cur = self.weights[action_name]
         if improved:
@@ -343,18 +488,46 @@ class AIBrain:
         # 1.0 쪽으로 살짝 당겨서 폭주 방지
         cur = 0.98 * cur + 0.02 * 1.0
         self.weights[action_name] = max(0.1, min(5.0, cur))
-
-def spawn_npc(npcs, player_x, player_y):
-    free = []
-    for y in range(MAP_H):
-        for x in range(MAP_W):
-            if worldMap[y][x] == 0:
-                free.append((x + 0.5, y + 0.5))
-    random.shuffle(free)
-    for x, y in free:
-        if (x - player_x) ** 2 + (y - player_y) ** 2 > 9.0:  # 플레이어랑 최소 거리
-            npcs.append(NPC(x, y))
-            break
+        self._cum = None
+        self.dirty = True
+
+    def learn_many(self, actions, improved):
+        """learn() 을 NPC 마다 부르는 대신 행동별로 한 번에 반영.
+        actions: ACTIONS 인덱스 배열, improved: 같은 길이의 bool 배열.
+        learn() 한 번은 가중치에 대한 1차 함수 (좋아짐: 0.98*(w+ALPHA)+0.02, 나빠짐:
+        0.98*DECAY*w+0.02) 라서, 한 행동이 n 번 중 k 번 좋아졌으면 두 함수를 k/n 비율로
+        섞은 평균 함수를 n 번 적용한 값을 닫힌 식으로 계산. 결과가 전부 같으면 learn() 을
+        n 번 부른 것과 같고, 섞여 있으면 무작위 순서로 부른 결과의 평균에 가까움."""
+        count = np.bincount(actions, minlength=len(self.ACTIONS))
+        if not count.any():
+            return
+        up = np.bincount(actions, weights=improved, minlength=len(self.ACTIONS))
+        p = up / np.maximum(count, 1)
+        slope = 0.98 * (p + (1.0 - p) * DECAY)
+        shift = 0.98 * ALPHA * p + 0.02
+        keep = slope ** count
+        for i in np.flatnonzero(count).tolist():
+            name = self.ACTIONS[i][2]
+            cur = self.weights[name] * keep[i] + shift[i] * (1.0 - keep[i]) / (1.0 - slope[i])
+            self.weights[name] = max(0.1, min(5.0, float(cur)))
+        self._cum = None
+        self.dirty = True
+
+def spawn_npc(npcs, player_x, player_y, index=None):
+    # 빈 칸 전체 목록 대신 무작위 샘플링 (4096x4096 맵에서도 즉시)
+    for _ in range(200):
+        cell = WORLD.random_free_cell(random)
+        if cell is None:
+            return
+        x, y = cell
+        if (x - player_x) ** 2 + (y - player_y) ** 2 <= 9.0:  # 플레이어랑 최소 거리
+            continue
+        if index is not None and index.query_radius(x, y, 0.5):
+            continue  # 다른 NPC 와 겹치지 않게 (공간 해시로 근처만 확인)
+        npcs.append(NPC(x, y))
+        if index is not None:
+            index.insert(npcs[-1])  # NPCStore 면 append 가 만든 핸들이 들어감
+        return
 
 def try_move_npc(npc, dx, dy):
     new_x = npc.x + dx
@@ -364,9 +537,24 @@ def try_move_npc(npc, dx, dy):
     if not is_wall(npc.x, new_y):
         npc.y = new_y
 
-def update_npcs(npcs, brain, dt, player_x, player_y):
+def _pvs_visible(row, x, y):
+    i = int(y) * MAP_W + int(x)
+    return row[i >> 3] >> (i & 7) & 1
+
+def update_npcs(npcs, brain, dt, player_x, player_y, pvs=None, index=None):
+    """NPC 한 스텝 이동 + 학습. 실제로 움직인 NPC 수를 반환.
+    pvs 를 주면 플레이어 칸에서 보일 수 있는 칸을 떠나거나 들어간 NPC 만 셈
+    (숨은 NPC 가 움직여도 뷰 캐시가 깨지지 않음). index (SpatialHash) 는 이동에 맞춰 갱신.
+    npcs 가 NPCStore 면 전체를 배열 연산 한 번으로 이동 (npcstore.py)."""
+    row = pvs.row(player_x, player_y) if pvs is not None else None
+    if NPCStore is not None and isinstance(npcs, NPCStore):
+        moved = npcs.update(brain, dt, player_x, player_y, world_array(), row, index)
+        brain.save()
+        return moved
+    moved = 0
     for npc in npcs:
         prev_dist = math.hypot(player_x - npc.x, player_y - npc.y)
+        npc.prev_x, npc.prev_y = prev_x, prev_y = npc.x, npc.y
 
         ax, ay, name = brain.choose(npc, None)
         mag = math.hypot(ax, ay)
@@ -376,12 +564,17 @@ def update_npcs(npcs, brain, dt, player_x, player_y):
 
         step = npc.speed * dt
         try_move_npc(npc, ax * step, ay * step)
+        if npc.x != prev_x or npc.y != prev_y:
+            if index is not None:
+                index.update(npc)
+            if row is None or _pvs_visible(row, prev_x, prev_y) or _pvs_visible(row, npc.x, npc.y):
+                moved += 1
 
         new_dist = math.hypot(player_x - npc.x, player_y - npc.y)
         brain.learn(name, new_dist < prev_dist)
 
-    if random.random() < 0.02:
-        brain.save()
+    brain.save()  # 백그라운드 저장기가 BRAIN_SAVE_INTERVAL 마다 한 번만 씀
+    return moved
 
 def _draw_npc_placeholder(surf):
     w, h = surf.get_size()
@@ -398,7 +591,15 @@ def build_npc_sprite():
     # assets/npc.png 있으면 그걸 쓰고, 없으면 간단한 사람 실루엣 사용
     return _load_or_make("assets/npc.png", (48, 72), _draw_npc_placeholder)
 
-def render_npcs(screen, npcs, player_x, player_y, dir_x, dir_y, plane_x, plane_y, zbuffer, npc_surf):
+def npc_draw_pos(npc, alpha):
+    """틱 사이 보간 위치: 지난 틱 위치에서 현재 위치 쪽으로 alpha (0..1) 만큼."""
+    if alpha >= 1.0:
+        return npc.x, npc.y
+    px, py = npc.prev_x, npc.prev_y
+    return px + (npc.x - px) * alpha, py + (npc.y - py) * alpha
+
+def render_npcs(screen, npcs, player_x, player_y, dir_x, dir_y, plane_x, plane_y, zbuffer, npc_surf,
+                sprite_cache=None, pvs=None, index=None, alpha=1.0):
     if not npcs or npc_surf is None:
         return
 
@@ -407,17 +608,32 @@ def render_npcs(screen, npcs, player_x, player_y, dir_x, dir_y, plane_x, plane_y
         return
     inv_det = 1.0 / det
 
+    row = pvs.row(player_x, player_y) if pvs is not None else None
+    map_w = MAP_W
+    if index is not None:
+        # 시야 원뿔에 걸친 버킷의 NPC 만 (카메라 뒤 / 옆 / 가장 먼 벽 너머는 버킷 단위로 버림)
+        dir_len = math.hypot(dir_x, dir_y) or 1.0
+        # (보간 위치는 현재 위치에서 한 틱 이동 거리 안이라 pad 0.5 안에 들어옴)
+        npcs = index.query_cone(player_x, player_y, dir_x, dir_y, math.hypot(plane_x, plane_y) / dir_len,
+                                max(zbuffer) * dir_len)
+
     sprites = []
     for npc in npcs:
-        dx = npc.x - player_x
-        dy = npc.y - player_y
+        npc_x, npc_y = npc_draw_pos(npc, alpha)
+        if row is not None:
+            i = int(npc_y) * map_w + int(npc_x)
+            if not row[i >> 3] >> (i & 7) & 1:
+                continue  # 플레이어 칸에서 보일 수 없는 칸 (PVS)
+
+        dx = npc_x - player_x
+        dy = npc_y - player_y
 
         # 월프식 카메라 공간 변환
         transform_x = inv_det * (dir_y * dx - dir_x * dy)
         transform_y = inv_det * (-plane_y * dx + plane_x * dy)
 
-        if transform_y <= 0.01:
-            continue  # 카메라 뒤
+        if transform_y <= NPC_NEAR_CLIP:
+            continue  # 카메라 뒤, 또는 화면 몇 배 크기로 스케일될 만큼 코앞
 
         sprites.append((transform_y, transform_x, npc))
 
@@ -432,6 +648,8 @@ def render_npcs(screen, npcs, player_x, player_y, dir_x, dir_y, plane_x, plane_y
 
         # 거리 기반 스케일
         sprite_h = abs(int(HEIGHT / depth * 0.7))
+        if sprite_cache is not None:
+            sprite_h = sprite_cache.quantize(sprite_h)
         sprite_w = int(sprite_h * (surf_w / surf_h))
 
         NPC_VERTICAL_OFFSET = int(HEIGHT * 0.02) # 대략 화면 높이의 2%만큼 아래로
@@ -448,114 +666,131 @@ def render_npcs(screen, npcs, player_x, player_y, dir_x, dir_y, plane_x, plane_y
         if draw_end_y >= HEIGHT:
             draw_end_y = HEIGHT - 1
 
-        scaled = pygame.transform.smoothscale(npc_surf, (sprite_w, sprite_h))
+        grey = WALL_SHADE.grey[WALL_SHADE.band(depth)]  # 같은 거리의 벽과 같은 밝기
+        if sprite_cache is not None:
+            scaled = sprite_cache.get(sprite_h, grey)
+        else:
+            scaled = pygame.transform.smoothscale(npc_surf, (sprite_w, sprite_h))
+            scaled.fill((grey, grey, grey), special_flags=BLEND_RGB_MULT)
 
-        # 한 줄(컬럼)씩, zbuffer 보고 벽보다 앞에 있는 부분만 그림
-        for stripe in range(max(draw_start_x, 0), min(draw_end_x, WIDTH - 1)):
-            if 0 < depth < zbuffer[stripe]:
-                tex_x = stripe - draw_start_x
-                if 0 <= tex_x < sprite_w:
-                    src_rect = pygame.Rect(tex_x, 0, 1, sprite_h)
-                    screen.blit(scaled, (stripe, draw_start_y), src_rect)
+        # zbuffer 보고 벽보다 앞에 있는 연속 구간마다 한 번씩 blit
+        for x0, x1 in visible_spans(depth, zbuffer, max(draw_start_x, 0), min(draw_end_x, WIDTH - 1)):
+            src_rect = pygame.Rect(x0 - draw_start_x, 0, x1 - x0, sprite_h)
+            screen.blit(scaled, (x0, draw_start_y), src_rect)
 
 # ---------------- Minimap ----------------
-def draw_minimap(screen, pos_x, pos_y, dir_x, dir_y, rays, npcs=None):
-    mm_w = MAP_W * MINIMAP_SCALE
-    mm_h = MAP_H * MINIMAP_SCALE
-    ox, oy = MINIMAP_PADDING, MINIMAP_PADDING
-
-    pygame.draw.rect(screen, (12, 12, 16),
-                     (ox - 2, oy - 2, mm_w + 4, mm_h + 4),
-                     border_radius=6)
+MINIMAP = Minimap(COLOR_MINI_WALL, COLOR_MINI_FREE, COLOR_RAY,
+                  scale=MINIMAP_SCALE, padding=MINIMAP_PADDING, view_cells=MINIMAP_VIEW_CELLS)
 
-    for y in range(MAP_H):
-        for x in range(MAP_W):
-            rect = pygame.Rect(ox + x * MINIMAP_SCALE,
-                               oy + y * MINIMAP_SCALE,
-                               MINIMAP_SCALE, MINIMAP_SCALE)
-            if worldMap[y][x] != 0:
-                pygame.draw.rect(screen, COLOR_MINI_WALL, rect)
-            else:
-                pygame.draw.rect(screen, COLOR_MINI_FREE, rect)
+def draw_minimap(screen, pos_x, pos_y, dir_x, dir_y, rays, npcs=None, index=None, alpha=1.0):
+    # 타일은 캐시된 청크에서, 큰 맵은 플레이어 주변 창만 표시
+    MINIMAP.begin(screen, WORLD, pos_x, pos_y)
 
     if rays:
         step = max(1, len(rays) // 120)
-        px = ox + int(pos_x * MINIMAP_SCALE)
-        py = oy + int(pos_y * MINIMAP_SCALE)
-        for i in range(0, len(rays), step):
-            dist, ang = rays[i]
-            rx = px + int(math.cos(ang) * dist * MINIMAP_SCALE)
-            ry = py + int(math.sin(ang) * dist * MINIMAP_SCALE)
-            pygame.draw.line(screen, COLOR_RAY, (px, py), (rx, ry), 1)
+        ends = [(pos_x + math.cos(ang) * dist, pos_y + math.sin(ang) * dist)
+                for dist, ang in rays[::step]]
+        MINIMAP.draw_fan(screen, pos_x, pos_y, ends)
 
     # player
-    px = ox + int(pos_x * MINIMAP_SCALE)
-    py = oy + int(pos_y * MINIMAP_SCALE)
+    px, py = MINIMAP.to_screen(pos_x, pos_y)
     pygame.draw.circle(screen, COLOR_MINI_PLAYER, (px, py), 3)
     mag = math.hypot(dir_x, dir_y) or 1.0
     fx = px + int(dir_x / mag * 8)
     fy = py + int(dir_y / mag * 8)
     pygame.draw.line(screen, COLOR_MINI_PLAYER, (px, py), (fx, fy), 2)
 
-    # NPCs
+    # NPCs (index 가 있으면 미니맵 창과 그 테두리 한 칸만 조회: 점이 가장자리에 걸칠 수 있음)
+    if index is not None:
+        x0, y0, x1, y1 = MINIMAP.view_cells_range()
+        npcs = index.query_cells(x0 - 1, y0 - 1, x1 + 1, y1 + 1)
     if npcs:
         for npc in npcs:
-            nx = ox + int(npc.x * MINIMAP_SCALE)
-            ny = oy + int(npc.y * MINIMAP_SCALE)
-            pygame.draw.circle(screen, COLOR_MINI_NPC, (nx, ny), 3)
+            pygame.draw.circle(screen, COLOR_MINI_NPC, MINIMAP.to_screen(*npc_draw_pos(npc, alpha)), 3)
+
+    MINIMAP.end(screen)
 
 # ---------------- Raycasting ----------------
-def cast_rays(pos_x, pos_y, dir_x, dir_y, plane_x, plane_y):
-    zbuffer = [MAX_DEPTH] * WIDTH
+def cast_rays(pos_x, pos_y, dir_x, dir_y, plane_x, plane_y, columns=None, start=0, end=None):
+    """columns 개의 광선 (기본 WIDTH, 동적 해상도에서는 더 적게).
+    start/end 를 주면 그 컬럼 구간 [start, end) 만 캐스팅 (밴드 풀용).
+    Returns (zbuffer, rays_for_minimap, hits): hits = (tiles, sides, tex_u) 는 컬럼별
+    맞은 칸의 타일 값 (없으면 0), 면 (0 = x 면, 1 = y 면), 벽면 위 맞은 위치 [0, 1)."""
+    columns = columns or WIDTH
+    end = columns if end is None else end
+    zbuffer = [MAX_DEPTH] * (end - start)
     rays_for_minimap = []
-
-    for col in range(WIDTH):
-        camera_x = 2.0 * col / WIDTH - 1.0
+    n_cols = end - start
+    tiles, sides, tex_u = [0] * n_cols, [0] * n_cols, [0.0] * n_cols
+    cells = WORLD.cells
+    solid, map_w, map_h = SOLID_ROWS, MAP_W, MAP_H
+    if TRAVERSAL == "skip":
+        walk, skip = march, WORLD.distance_rows()
+    elif TRAVERSAL == "pyramid":
+        walk, skip = march_pyramid, WORLD.occupancy()
+    else:
+        walk = None
+    steps = 0
+
+    for col in range(start, end):
+        camera_x = 2.0 * col / columns - 1.0
         ray_dir_x = dir_x + plane_x * camera_x
         ray_dir_y = dir_y + plane_y * camera_x
 
-        map_x = int(pos_x)
-        map_y = int(pos_y)
-
-        delta_x = abs(1.0 / ray_dir_x) if ray_dir_x != 0 else 1e30
-        delta_y = abs(1.0 / ray_dir_y) if ray_dir_y != 0 else 1e30
-
         if ray_dir_x < 0:
             step_x = -1
-            side_x = (pos_x - map_x) * delta_x
         else:
             step_x = 1
-            side_x = (map_x + 1.0 - pos_x) * delta_x
-
         if ray_dir_y < 0:
             step_y = -1
-            side_y = (pos_y - map_y) * delta_y
         else:
             step_y = 1
-            side_y = (map_y + 1.0 - pos_y) * delta_y
 
-        hit = False
-        side = 0
+        if walk is not None:
+            # 빈 칸을 건너뜀: 결과는 아래 DDA 와 비트 단위로 같음 (distfield.py, occupancy.py)
+            hit, map_x, map_y, side, _, n = walk(pos_x, pos_y, ray_dir_x, ray_dir_y,
+                                                 solid, map_w, map_h, 256, skip)
+            steps += n
+        else:
+            map_x = int(pos_x)
+            map_y = int(pos_y)
 
-        for _ in range(256):
-            if side_x < side_y:
-                side_x += delta_x
-                map_x += step_x
-                side = 0
+            delta_x = abs(1.0 / ray_dir_x) if ray_dir_x != 0 else 1e30
+            delta_y = abs(1.0 / ray_dir_y) if ray_dir_y != 0 else 1e30
+
+            if ray_dir_x < 0:
+                side_x = (pos_x - map_x) * delta_x
             else:
-                side_y += delta_y
-                map_y += step_y
-                side = 1
+                side_x = (map_x + 1.0 - pos_x) * delta_x
 
-            if map_x < 0 or map_y < 0 or map_x >= MAP_W or map_y >= MAP_H:
-                break
+            if ray_dir_y < 0:
+                side_y = (pos_y - map_y) * delta_y
+            else:
+                side_y = (map_y + 1.0 - pos_y) * delta_y
 
-            if worldMap[map_y][map_x] > 0:
-                hit = True
-                break
+            hit = False
+            side = 0
+
+            for n in range(1, 257):
+                if side_x < side_y:
+                    side_x += delta_x
+                    map_x += step_x
+                    side = 0
+                else:
+                    side_y += delta_y
+                    map_y += step_y
+                    side = 1
+
+                if map_x < 0 or map_y < 0 or map_x >= map_w or map_y >= map_h:
+                    break
+
+                if solid[map_y][map_x]:
+                    hit = True
+                    break
+            steps += n
 
         if not hit:
-            zbuffer[col] = MAX_DEPTH
+            zbuffer[col - start] = MAX_DEPTH
             rays_for_minimap.append((MAX_DEPTH, math.atan2(ray_dir_y, ray_dir_x)))
             continue
 
@@ -567,32 +802,399 @@ def cast_rays(pos_x, pos_y, dir_x, dir_y, plane_x, plane_y):
         if perp <= 0:
             perp = 0.0001
 
-        zbuffer[col] = perp
+        zbuffer[col - start] = perp
         rays_for_minimap.append((perp, math.atan2(ray_dir_y, ray_dir_x)))
 
-    return zbuffer, rays_for_minimap
+        # 텍스처 좌표: 벽면을 따라 맞은 위치의 소수부, 보는 방향이 같도록 반대쪽 면은 뒤집음
+        if side == 0:
+            wall_x = pos_y + perp * ray_dir_y
+            flip = ray_dir_x > 0
+        else:
+            wall_x = pos_x + perp * ray_dir_x
+            flip = ray_dir_y < 0
+        wall_x -= math.floor(wall_x)
+        i = col - start
+        tiles[i] = cells[map_y * map_w + map_x]
+        sides[i] = side
+        tex_u[i] = 1.0 - wall_x if flip else wall_x
+
+    CAST_STATS["rays"] += end - start
+    CAST_STATS["steps"] += steps
+    return zbuffer, rays_for_minimap, (tiles, sides, tex_u)
+
+def world_array():
+    """WORLD solid 마스크의 (MAP_H, MAP_W) numpy 뷰 (복사 없음, 맵 수정이 바로 반영)."""
+    return WORLD.solid_array()
+
+def cast_columns_np(pos_x, pos_y, dir_x, dir_y, plane_x, plane_y, columns=None, start=0, end=None):
+    """모든 컬럼 (또는 [start, end) 구간) 의 DDA 를 한 번에 배열 연산으로 진행.
+    Returns (perp, side, map_x, map_y, ray_dir_x, ray_dir_y) arrays.
+    벽에 맞지 않은 컬럼은 perp = MAX_DEPTH, map_x = map_y = -1."""
+    grid = world_array().ravel()  # 1D 뷰: my * MAP_W + mx 로 한 번에 gather
+    columns = columns or WIDTH
+    end = columns if end is None else end
+    n = end - start
+
+    camera_x = 2.0 * np.arange(start, end, dtype=np.float64) / columns - 1.0
+    ray_dir_x = dir_x + plane_x * camera_x
+    ray_dir_y = dir_y + plane_y * camera_x
+
+    start_x = int(pos_x)
+    start_y = int(pos_y)
+
+    with np.errstate(divide="ignore"):
+        delta_x = np.where(ray_dir_x != 0, np.abs(1.0 / ray_dir_x), 1e30)
+        delta_y = np.where(ray_dir_y != 0, np.abs(1.0 / ray_dir_y), 1e30)
+
+    step_x = np.where(ray_dir_x < 0, -1, 1)
+    step_y = np.where(ray_dir_y < 0, -1, 1)
+    side_x = np.where(ray_dir_x < 0, (pos_x - start_x) * delta_x, (start_x + 1.0 - pos_x) * delta_x)
+    side_y = np.where(ray_dir_y < 0, (pos_y - start_y) * delta_y, (start_y + 1.0 - pos_y) * delta_y)
+
+    hit = np.zeros(n, dtype=bool)
+    hit_side = np.zeros(n, dtype=np.int8)
+    hit_x = np.full(n, -1, dtype=np.int64)
+    hit_y = np.full(n, -1, dtype=np.int64)
+
+    # 아직 진행 중인 광선만 압축해서 들고 다님
+    idx = np.arange(n)
+    mx = np.full(n, start_x, dtype=np.int64)
+    my = np.full(n, start_y, dtype=np.int64)
+    sx, sy = side_x, side_y
+    dx, dy = delta_x, delta_y
+    stx, sty = step_x, step_y
+
+    for _ in range(256):
+        if idx.size == 0:
+            break
 
-def render_walls(screen, zbuffer):
-    screen.fill(COLOR_BG)
-    pygame.draw.rect(screen, COLOR_CEIL, (0, 0, WIDTH, HALF_H))
-    pygame.draw.rect(screen, COLOR_FLOOR, (0, HALF_H, WIDTH, HALF_H))
+        go_x = sx < sy
+        sx = np.where(go_x, sx + dx, sx)
+        sy = np.where(go_x, sy, sy + dy)
+        mx = mx + np.where(go_x, stx, 0)
+        my = my + np.where(go_x, 0, sty)
+
+        oob = (mx < 0) | (my < 0) | (mx >= MAP_W) | (my >= MAP_H)
+        solid = ~oob
+        solid[solid] = grid[my[solid] * MAP_W + mx[solid]] != 0
+        done = oob | solid
+        if not done.any():
+            continue
 
+        fin = idx[done]
+        hit[fin] = solid[done]
+        hit_side[fin] = ~go_x[done]
+        hit_x[fin] = mx[done]
+        hit_y[fin] = my[done]
+
+        keep = ~done
+        idx, mx, my = idx[keep], mx[keep], my[keep]
+        sx, sy, dx, dy = sx[keep], sy[keep], dx[keep], dy[keep]
+        stx, sty = stx[keep], sty[keep]
+
+    safe_x = np.where(ray_dir_x != 0, ray_dir_x, 1e-6)
+    safe_y = np.where(ray_dir_y != 0, ray_dir_y, 1e-6)
+    perp = np.where(
+        hit_side == 0,
+        (hit_x - pos_x + (1 - step_x) / 2.0) / safe_x,
+        (hit_y - pos_y + (1 - step_y) / 2.0) / safe_y,
+    )
+    perp = np.where(perp <= 0, 0.0001, perp)
+    perp = np.where(hit, perp, MAX_DEPTH)
+    hit_x[~hit] = -1
+    hit_y[~hit] = -1
+
+    return perp, hit_side, hit_x, hit_y, ray_dir_x, ray_dir_y
+
+def cast_rays_np(pos_x, pos_y, dir_x, dir_y, plane_x, plane_y, columns=None, start=0, end=None):
+    """cast_rays 와 같은 (zbuffer, rays_for_minimap, hits) 를 numpy 로 계산 (hits 는 배열)."""
+    perp, side, hit_x, hit_y, ray_dir_x, ray_dir_y = cast_columns_np(
+        pos_x, pos_y, dir_x, dir_y, plane_x, plane_y, columns, start, end)
+    zbuffer = perp.tolist()
+    angles = np.arctan2(ray_dir_y, ray_dir_x).tolist()
+
+    hit = hit_x >= 0
+    tiles = np.where(hit, WORLD.cells_array()[hit_y, hit_x], 0)  # 안 맞은 컬럼의 -1 인덱스는 버려짐
+    wall_x = np.where(side == 0, pos_y + perp * ray_dir_y, pos_x + perp * ray_dir_x)
+    wall_x -= np.floor(wall_x)
+    flip = np.where(side == 0, ray_dir_x > 0, ray_dir_y < 0)
+    tex_u = np.where(flip, 1.0 - wall_x, wall_x)
+    return zbuffer, list(zip(zbuffer, angles)), (tiles, side, tex_u)
+
+def select_caster(name=CASTER):
+    if name == "numpy" and np is not None:
+        return cast_rays_np
+    return cast_rays
+
+def make_band_pool(workers=CAST_WORKERS, kind=CAST_POOL):
+    """캐스팅용 밴드 풀 (workers == 0 이면 None). 프로세스 풀 워커는 같은 맵 파일을 mmap 하거나
+    (MAP_FILE) 현재 worldMap 을 복사해 감."""
+    if workers <= 0:
+        return None
+    if MAP_FILE is not None:
+        return BandPool(workers, kind, initializer=load_map_file, initargs=(MAP_FILE,))
+    return BandPool(workers, kind, initializer=load_map, initargs=(worldMap,))
+
+def cast_rays_banded(pool, caster, pos_x, pos_y, dir_x, dir_y, plane_x, plane_y, columns=None):
+    """화면을 컬럼 밴드로 나눠 풀에서 caster 로 캐스팅하고 하나의 zbuffer 로 합침."""
+    columns = columns or WIDTH
+    parts = pool.run(caster, columns, pos_x, pos_y, dir_x, dir_y, plane_x, plane_y, columns)
+    zbuffer, rays = [], []
+    tiles, sides, tex_u = [], [], []
+    for zb, rs, (t, s, u) in parts:
+        zbuffer.extend(zb)
+        rays.extend(rs)
+        tiles.extend(t)
+        sides.extend(s)
+        tex_u.extend(u)
+    return zbuffer, rays, (tiles, sides, tex_u)
+
+_LINE_VIEWS = {}
+
+def render_walls(screen, zbuffer, hits, floor=None):
+    """zbuffer 한 칸 = 한 컬럼. 화면보다 좁으면 내부 뷰에 그린 뒤 화면 폭으로 늘림.
+    hits: 캐스터의 (tiles, sides, tex_u) — 색은 WALL_SHADE 에서 컬럼당 한 번 조회.
+    floor: 단색 천장/바닥 대신 깔 (컬럼 수, HEIGHT) Surface (render_floor 결과)."""
+    columns = len(zbuffer)
+    view = screen
+    if columns != screen.get_width():
+        view = _LINE_VIEWS.get(columns)
+        if view is None:
+            view = _LINE_VIEWS[columns] = pygame.Surface((columns, HEIGHT))
+
+    if floor is not None:
+        view.blit(floor, (0, 0))
+    else:
+        view.fill(COLOR_BG)
+        pygame.draw.rect(view, COLOR_CEIL, (0, 0, columns, HALF_H))
+        pygame.draw.rect(view, COLOR_FLOOR, (0, HALF_H, columns, HALF_H))
+
+    tiles, sides, _ = hits
+    if np is not None and isinstance(tiles, np.ndarray):
+        tiles, sides = tiles.tolist(), sides.tolist()
+    rgb, band = WALL_SHADE.rgb, WALL_SHADE.band
     for col, dist in enumerate(zbuffer):
         if dist >= MAX_DEPTH:
             continue
 
-        shade = max(0.15, min(1.0, 4.0 / (dist + 0.2)))
-        base = 190
-        color = (int(base * shade), int(base * shade), int((base + 10) * shade))
+        color = rgb[band(dist)][tiles[col]][sides[col]]
 
         line_h = int((1.0 / dist) * PROJ_PLANE_DIST)
         y1 = HALF_H - line_h // 2
         y2 = HALF_H + line_h // 2
 
-        pygame.draw.line(screen, color, (col, y1), (col, y2))
+        pygame.draw.line(view, color, (col, y1), (col, y2))
+
+    if view is not screen:
+        stretch_view(view, screen)
+
+def get_rasterizer(rasterizers, columns):
+    """컬럼 수별 WallRasterizer (해상도 단계마다 한 번 만들고 재사용)."""
+    rasterizer = rasterizers.get(columns)
+    if rasterizer is None:
+        rasterizer = rasterizers[columns] = WallRasterizer(columns, HEIGHT, COLOR_CEIL, COLOR_FLOOR)
+    return rasterizer
+
+_FLOOR_CASTERS = []
+
+def render_floor(rasterizer, pos_x, pos_y, dir_x, dir_y, plane_x, plane_y):
+    """바닥/천장 텍스처를 rasterizer 크기의 (컬럼, HEIGHT) 픽셀 배열로 (floorcast.py).
+    행별 거리 표는 해상도마다 한 번 만들어 재사용; 벽은 이 배열 위에 그림."""
+    if not _FLOOR_CASTERS:
+        _FLOOR_CASTERS.append(FloorCaster.default(rasterizer.map_colors, WALL_SHADE.factor))
+    columns = rasterizer.width
+    camera_x = 2.0 * np.arange(columns) / columns - 1.0  # cast_rays 와 같은 광선 방향
+    return _FLOOR_CASTERS[0].draw(rasterizer, pos_x, pos_y, dir_x + plane_x * camera_x,
+                                  dir_y + plane_y * camera_x, PROJ_PLANE_DIST)
+
+def render_walls_fb(screen, zbuffer, hits, rasterizer, background=None):
+    """render_walls 와 같은 결과를 픽셀 배열에 한 번에 쓰고 한 번 blit.
+    rasterizer 폭은 len(zbuffer) 와 같아야 하고, 화면보다 좁으면 늘려서 그림.
+    background: 단색 천장/바닥 대신 깔 픽셀 배열 (render_floor)."""
+    tiles, sides, _ = hits
+    dist = np.asarray(zbuffer, dtype=np.float64)
+    visible = dist < MAX_DEPTH
+
+    colors = WALL_SHADE.colors(dist, tiles, sides)  # 모든 컬럼 색을 표에서 한 번에
+
+    line_h = ((1.0 / dist) * PROJ_PLANE_DIST).astype(np.int64)
+    rasterizer.draw_columns(line_h // 2, colors, visible, background)
+    stretch_view(rasterizer.surface, screen)
+
+_WALL_TEXTURES = []
+
+def get_wall_textures(rasterizer):
+    """벽 텍스처 스트립 (처음 쓸 때 한 번 변환; 모든 rasterizer 가 같은 픽셀 포맷)."""
+    if not _WALL_TEXTURES:
+        _WALL_TEXTURES.append(WallTextures.default(rasterizer.map_colors, COLOR_CEIL, COLOR_FLOOR))
+    return _WALL_TEXTURES[0]
+
+def render_walls_tex(screen, zbuffer, hits, rasterizer, background=None):
+    """타일 값별 텍스처 벽 (walltex.py). 모든 컬럼을 텍스처 스트립에서 한 번에 gather.
+    밝기는 단색 경로와 같은 WALL_SHADE 구간 (y 면은 더 어둡게). background 는 render_walls_fb 와 같음."""
+    tiles, sides, tex_u = hits
+    dist = np.asarray(zbuffer, dtype=np.float64)
+    visible = dist < MAX_DEPTH
+
+    shade = WALL_SHADE.shade(dist, sides)
+    textures = get_wall_textures(rasterizer)
+    line_h = (1.0 / dist) * PROJ_PLANE_DIST
+    textures.draw(rasterizer, line_h, textures.texture_ids(tiles), np.asarray(tex_u), shade, visible,
+                  background)
+    stretch_view(rasterizer.surface, screen)
+
+# ---------------- World view cache ----------------
+class WorldViewCache:
+    """마지막 3D 뷰(벽 + NPC)를 (카메라 포즈, NPC 버전, 맵 버전, ...) 키로 캐시.
+    같은 키가 두 프레임 연속 나오면 그때 저장하므로, 움직이는 동안에는
+    복사 비용이 없다. 히트면 blit 한 번으로 cast/walls/sprites 를 건너뜀."""
+
+    def __init__(self, size):
+        self.surface = pygame.Surface(size)
+        self.key = None
+        self.last_key = None
+        self.zbuffer = None
+        self.rays = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key):
+        if key == self.key:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def present(self, screen):
+        screen.blit(self.surface, (0, 0))
+        return self.zbuffer, self.rays
+
+    def offer(self, key, screen, zbuffer, rays):
+        """방금 그린 뷰를 넘겨줌. 직전 프레임과 키가 같을 때만 저장."""
+        if key == self.last_key:
+            if self.key is not None:
+                self.evictions += 1
+            self.surface.blit(screen, (0, 0))
+            self.key = key
+            self.zbuffer = zbuffer
+            self.rays = rays
+        self.last_key = key
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        stored = self.key is not None
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": int(stored),
+            "bytes": self.surface.get_pitch() * self.surface.get_height() if stored else 0,
+        }
+
+# ---------------- Stats overlay ----------------
+def cache_stats_line(name, st):
+    return (f"{name} hit {100.0 * st['hit_rate']:5.1f}%  h{st['hits']} m{st['misses']} "
+            f"ev{st['evictions']}  {st['entries']} ent {st['bytes'] // 1024}KB")
+
+# ---------------- Player ----------------
+def move_player(keys, pos_x, pos_y, dir_x, dir_y, plane_x, plane_y, dt):
+    """키 상태대로 플레이어를 dt 초만큼 이동 / 회전. 새 (pos, dir, plane) 6-튜플을 반환."""
+    # 이동 (WASD + 방향키)
+    fx, fy = dir_x, dir_y
+    rx, ry = dir_y, -dir_x
+
+    if keys[K_w] or keys[K_UP]:
+        nx = pos_x + fx * MOVE_SPEED * dt
+        ny = pos_y + fy * MOVE_SPEED * dt
+        if not is_wall(nx, pos_y):
+            pos_x = nx
+        if not is_wall(pos_x, ny):
+            pos_y = ny
+
+    if keys[K_s] or keys[K_DOWN]:
+        nx = pos_x - fx * MOVE_SPEED * dt
+        ny = pos_y - fy * MOVE_SPEED * dt
+        if not is_wall(nx, pos_y):
+            pos_x = nx
+        if not is_wall(pos_x, ny):
+            pos_y = ny
+
+    if keys[K_a]:
+        nx = pos_x - rx * MOVE_SPEED * dt
+        ny = pos_y - ry * MOVE_SPEED * dt
+        if not is_wall(nx, pos_y):
+            pos_x = nx
+        if not is_wall(pos_x, ny):
+            pos_y = ny
+
+    if keys[K_d]:
+        nx = pos_x + rx * MOVE_SPEED * dt
+        ny = pos_y + ry * MOVE_SPEED * dt
+        if not is_wall(nx, pos_y):
+            pos_x = nx
+        if not is_wall(pos_x, ny):
+            pos_y = ny
+
+    # 회전 (좌/우)
+    if keys[K_LEFT]:
+        ang = -ROT_SPEED * dt
+        ca, sa = math.cos(ang), math.sin(ang)
+        ndx = dir_x * ca - dir_y * sa
+        ndy = dir_x * sa + dir_y * ca
+        dir_x, dir_y = ndx, ndy
+        npx = plane_x * ca - plane_y * sa
+        npy = plane_x * sa + plane_y * ca
+        plane_x, plane_y = npx, npy
+
+    if keys[K_RIGHT]:
+        ang = ROT_SPEED * dt
+        ca, sa = math.cos(ang), math.sin(ang)
+        ndx = dir_x * ca - dir_y * sa
+        ndy = dir_x * sa + dir_y * ca
+        dir_x, dir_y = ndx, ndy
+        npx = plane_x * ca - plane_y * sa
+        npy = plane_x * sa + plane_y * ca
+        plane_x, plane_y = npx, npy
+    return pos_x, pos_y, dir_x, dir_y, plane_x, plane_y
+
+def draw_stats(screen, font, pos, lines):
+    x, y = pos
+    for line in lines:
+        surf = font.render(line, True, (200, 200, 210))
+        screen.blit(surf, (x, y))
+        y += surf.get_height()
 
 # ---------------- Main ----------------
-def main():
+def poll_events():
+    """이번 프레임 입력 이벤트를 코드 목록으로 (키 = 키 코드, 그 외 EV_QUIT / EV_CLICK; replay.py 와 같은 형식)."""
+    out = []
+    for event in pygame.event.get():
+        if event.type == QUIT:
+            out.append(EV_QUIT)
+        elif event.type == KEYDOWN:
+            out.append(event.key)
+        elif event.type == MOUSEBUTTONDOWN and event.button == 1:
+            out.append(EV_CLICK)
+    return out
+
+def world_digest(pose, npcs, brain, selected_weapon, weapon_state):
+    """시뮬레이션 상태 (플레이어, NPC, 브레인, 무기) 의 SHA-256. 재생 결과 비교용."""
+    h = hashlib.sha256()
+    h.update(struct.pack("<6d", *pose))
+    h.update(struct.pack("<I", len(npcs)))
+    for npc in npcs:
+        h.update(struct.pack("<2d", npc.x, npc.y))
+    h.update(struct.pack(f"<{len(brain.ACTIONS)}d", *(brain.weights[name] for _, _, name in brain.ACTIONS)))
+    h.update(json.dumps([selected_weapon, weapon_state], sort_keys=True).encode())
+    return h.digest()
+
+def main(map_path=None, record=None, replay=None, brain_path=BRAIN_PATH):
+    """record: 입력을 이 파일에 기록 / replay: replay.Replay 를 창 없이 제한 없이 재생
+    (재생이면 sys.exit 대신 {"frames", "ticks", "digest", "frame_ms"} 반환)."""
+    if map_path:
+        load_map_file(map_path)
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("PyRay — raycasting + weapon + NPC sprite")
@@ -600,125 +1202,162 @@ def main():
     font = pygame.font.SysFont("consolas", 16)
     clock = pygame.time.Clock()
 
-    pos_x, pos_y = 3.0, 7.0
-    dir_x, dir_y = 1.0, 0.0
-    plane_x, plane_y = 0.0, 0.66
-
-    move_speed = 3.0
-    rot_speed = math.radians(120)
+    pose = (SPAWN[0], SPAWN[1], 1.0, 0.0, 0.0, 0.66)  # pos, dir, plane (시뮬레이션 틱 기준)
+    prev_pose = pose
+    sim = FixedStep(replay.header["sim_hz"] if replay else SIM_HZ, MAX_SIM_STEPS)
+    npcs_moving = 0
 
     show_minimap = True
     show_hud = True
+    show_graph = False
+    timer = FrameTimer(FRAME_STAGES)
+    small_font = pygame.font.SysFont("consolas", 12)
 
     selected_weapon = "hands"
     weapon_assets = build_weapon_assets(WIDTH, HEIGHT)
     weapon_state = {"mode": "idle", "t": 0.0, "cooldown": 0.0, "dur": 0.0}
     weapon_phase = 0.0
 
-    npcs = []
-    brain = AIBrain()
+    caster = select_caster()
+    band_pool = make_band_pool()
+    if band_pool is not None:
+        caster = functools.partial(cast_rays_banded, band_pool, caster)
+    rasterizers = {} if WallRasterizer is not None else None
+    wall_mode = WALL_RENDERER if rasterizers is not None else "lines"
+    floor_mode = FLOOR_RENDERER if rasterizers is not None else "flat"
+    scaler = ResolutionScaler(WIDTH, TARGET_FRAME_MS, enabled=DYNAMIC_RES)
+
+    pvs = WORLD.pvs() if PVS_CULLING else None  # 로드 시 한 번 빌드 (48x48 맵 기준 약 1초)
+
+    # 시뮬레이션이 쓰는 난수 (spawn_npc / AIBrain.choose 의 random, NPCStore 의 numpy rng) 는 seed 하나로
+    seed = replay.header["seed"] if replay else random.randrange(1 << 32)
+    random.seed(seed)
+    use_store = replay.header["npc_store"] if replay else NPC_STORE and NPCStore is not None
+    npcs = NPCStore(rng=np.random.default_rng(seed)) if use_store else []
+    npc_index = SpatialHash(NPC_INDEX_BUCKET)
+    brain = AIBrain(brain_path)
+    if replay:
+        if replay.header["map_crc"] != zlib.crc32(WORLD.cells):
+            raise ValueError(f"{replay.path}: recorded on a different map")
+        brain.weights.update(replay.header["weights"])
+        brain._cum = None
+    recorder = None
+    if record:
+        recorder = Recorder(record, {"seed": seed, "sim_hz": sim.hz, "npc_store": use_store, "map": map_path,
+                                     "map_crc": zlib.crc32(WORLD.cells), "weights": brain.weights})
+    frames = iter(replay) if replay else None
+    frame_ms = []
+    total_ticks = 0
     npc_surf = build_npc_sprite()
-    spawn_npc(npcs, pos_x, pos_y)
+    sprite_cache = ScaledSpriteCache(npc_surf, NPC_SPRITE_CACHE_BYTES)
+    spawn_npc(npcs, pose[0], pose[1], npc_index)
+    npc_version = 0
+    world_cache = WorldViewCache((WIDTH, HEIGHT))
 
     running = True
     while running:
-        dt = clock.tick(FPS) / 1000.0
+        timer.begin_frame()
+        if frames is None:
+            dt = clock.tick(FPS) / 1000.0
+            events = poll_events()
+            keys = pygame.key.get_pressed()
+            ticks = sim.advance(dt)
+            alpha = sim.alpha
+            if recorder is not None:
+                recorder.frame(ticks, keys, events)
+        else:
+            # 재생: 기록된 틱 수 / 키 / 이벤트 그대로, 프레임 제한 없음
+            frame = next(frames, None)
+            if frame is None:
+                break
+            ticks, keys, events = frame
+            dt = clock.tick() / 1000.0
+            alpha = 1.0
+            pygame.event.pump()
 
         # 이벤트 처리
-        for event in pygame.event.get():
-            if event.type == QUIT:
+        for ev in events:
+            if ev == EV_QUIT or ev == K_ESCAPE:
                 running = False
-            elif event.type == KEYDOWN:
-                if event.key == K_ESCAPE:
-                    running = False
-                elif event.key == K_F7:
-                    show_hud = not show_hud
-                elif event.key == K_F9:
-                    show_minimap = not show_minimap
-                elif event.key == K_1:
-                    selected_weapon = "hands"
-                elif event.key == K_2:
-                    selected_weapon = "gun"
-                elif event.key == K_3:
-                    selected_weapon = "knife"
-                elif event.key == K_SPACE:
-                    trigger_attack(selected_weapon, weapon_state)
-                elif event.key == K_n:
-                    spawn_npc(npcs, pos_x, pos_y)
-            elif event.type == MOUSEBUTTONDOWN and event.button == 1:
+            elif ev == EV_CLICK:
                 trigger_attack(selected_weapon, weapon_state)
-
-        keys = pygame.key.get_pressed()
-
-        # 이동 (WASD + 방향키)
-        fx, fy = dir_x, dir_y
-        rx, ry = dir_y, -dir_x
-
-        if keys[K_w] or keys[K_UP]:
-            nx = pos_x + fx * move_speed * dt
-            ny = pos_y + fy * move_speed * dt
-            if not is_wall(nx, pos_y):
-                pos_x = nx
-            if not is_wall(pos_x, ny):
-                pos_y = ny
-
-        if keys[K_s] or keys[K_DOWN]:
-            nx = pos_x - fx * move_speed * dt
-            ny = pos_y - fy * move_speed * dt
-            if not is_wall(nx, pos_y):
-                pos_x = nx
-            if not is_wall(pos_x, ny):
-                pos_y = ny
-
-        if keys[K_a]:
-            nx = pos_x - rx * move_speed * dt
-            ny = pos_y - ry * move_speed * dt
-            if not is_wall(nx, pos_y):
-                pos_x = nx
-            if not is_wall(pos_x, ny):
-                pos_y = ny
-
-        if keys[K_d]:
-            nx = pos_x + rx * move_speed * dt
-            ny = pos_y + ry * move_speed * dt
-            if not is_wall(nx, pos_y):
-                pos_x = nx
-            if not is_wall(pos_x, ny):
-                pos_y = ny
-
-        # 회전 (좌/우)
-        if keys[K_LEFT]:
-            ang = -rot_speed * dt
-            ca, sa = math.cos(ang), math.sin(ang)
-            ndx = dir_x * ca - dir_y * sa
-            ndy = dir_x * sa + dir_y * ca
-            dir_x, dir_y = ndx, ndy
-            npx = plane_x * ca - plane_y * sa
-            npy = plane_x * sa + plane_y * ca
-            plane_x, plane_y = npx, npy
-
-        if keys[K_RIGHT]:
-            ang = rot_speed * dt
-            ca, sa = math.cos(ang), math.sin(ang)
-            ndx = dir_x * ca - dir_y * sa
-            ndy = dir_x * sa + dir_y * ca
-            dir_x, dir_y = ndx, ndy
-            npx = plane_x * ca - plane_y * sa
-            npy = plane_x * sa + plane_y * ca
-            plane_x, plane_y = npx, npy
-
-        # 무기 / NPC 갱신
-        update_weapon_state(selected_weapon, weapon_state, dt)
-        update_npcs(npcs, brain, dt, pos_x, pos_y)
-
-        # 월드 렌더
-        zbuffer, rays_for_minimap = cast_rays(pos_x, pos_y, dir_x, dir_y, plane_x, plane_y)
-        render_walls(screen, zbuffer)
-        render_npcs(screen, npcs, pos_x, pos_y, dir_x, dir_y, plane_x, plane_y, zbuffer, npc_surf)
+            elif ev == K_F7:
+                show_hud = not show_hud
+            elif ev == K_F9:
+                show_minimap = not show_minimap
+            elif ev == K_F4 and rasterizers is not None:
+                wall_mode = WALL_MODES[(WALL_MODES.index(wall_mode) + 1) % len(WALL_MODES)]
+            elif ev == K_F6 and rasterizers is not None:
+                floor_mode = "flat" if floor_mode == "textured" else "textured"
+            elif ev == K_F5:
+                scaler.set_enabled(not scaler.enabled)
+            elif ev == K_F3:
+                show_graph = not show_graph
+            elif ev == K_F2 and frames is None:
+                path = timer.export_csv(f"frame_times_{time.strftime('%Y%m%d%H%M%S')}.csv")
+                print("frame times ->", path)
+            elif ev == K_1:
+                selected_weapon = "hands"
+            elif ev == K_2:
+                selected_weapon = "gun"
+            elif ev == K_3:
+                selected_weapon = "knife"
+            elif ev == K_SPACE:
+                trigger_attack(selected_weapon, weapon_state)
+            elif ev == K_n:
+                spawn_npc(npcs, pose[0], pose[1], npc_index)
+                npc_version += 1
+        total_ticks += ticks
+        timer.mark("input")
+
+        # 고정 틱 시뮬레이션: 이동 / 무기 / NPC / 학습은 프레임 속도와 상관없이 항상 sim.dt 로
+        for _ in range(ticks):
+            prev_pose = pose
+            pose = move_player(keys, *pose, sim.dt)
+            update_weapon_state(selected_weapon, weapon_state, sim.dt)
+            npcs_moving = update_npcs(npcs, brain, sim.dt, pose[0], pose[1], pvs, npc_index)
+            if npcs_moving:
+                npc_version += 1
+        timer.mark("update")
+
+        # 화면에는 지난 틱과 이번 틱 사이를 보간한 상태를 그림 (렌더 주기 != 틱 주기)
+        pos_x, pos_y, dir_x, dir_y, plane_x, plane_y = (lerp(a, b, alpha) for a, b in zip(prev_pose, pose))
+
+        # 월드 렌더 (포즈 / NPC / 맵이 그대로면 캐시된 뷰 재사용)
+        columns = scaler.columns
+        # NPC 가 지난 틱에 움직였으면 보간 위치가 alpha 따라 바뀌므로 alpha 도 키에
+        view_key = (pos_x, pos_y, dir_x, dir_y, plane_x, plane_y, npc_version, MAP_VERSION, wall_mode,
+                    floor_mode, columns, alpha if npcs_moving else None)
+        if world_cache.lookup(view_key):
+            zbuffer, rays_for_minimap = world_cache.present(screen)
+            timer.mark("walls")
+        else:
+            zbuffer, rays_for_minimap, hits = caster(pos_x, pos_y, dir_x, dir_y, plane_x, plane_y, columns)
+            timer.mark("cast")
+            floor = None
+            if floor_mode == "textured":
+                rasterizer = get_rasterizer(rasterizers, columns)
+                floor = render_floor(rasterizer, pos_x, pos_y, dir_x, dir_y, plane_x, plane_y)
+            if wall_mode == "textured":
+                render_walls_tex(screen, zbuffer, hits, get_rasterizer(rasterizers, columns), floor)
+            elif wall_mode == "surfarray":
+                render_walls_fb(screen, zbuffer, hits, get_rasterizer(rasterizers, columns), floor)
+            elif floor is not None:
+                pygame.surfarray.blit_array(rasterizer.surface, floor)
+                render_walls(screen, zbuffer, hits, rasterizer.surface)
+            else:
+                render_walls(screen, zbuffer, hits)
+            zbuffer = stretch_columns(zbuffer, WIDTH)  # 스프라이트는 화면 해상도로 가림 판정
+            timer.mark("walls")
+            render_npcs(screen, npcs, pos_x, pos_y, dir_x, dir_y, plane_x, plane_y, zbuffer, npc_surf,
+                        sprite_cache, pvs, npc_index, alpha)
+            world_cache.offer(view_key, screen, zbuffer, rays_for_minimap)
+        timer.mark("sprites")
 
         # 미니맵
         if show_minimap:
-            draw_minimap(screen, pos_x, pos_y, dir_x, dir_y, rays_for_minimap, npcs)
+            draw_minimap(screen, pos_x, pos_y, dir_x, dir_y, rays_for_minimap, npcs, npc_index, alpha)
+        timer.mark("minimap")
 
         # 무기 흔들림 + 공격 오프셋
         moving = (
@@ -739,18 +1378,45 @@ def main():
                 draw_muzzle_flash(screen, rect)
             if selected_weapon == "knife" and weapon_state.get("mode") == "attack":
                 draw_slash_effect(screen, rect, slash_p)
+        timer.mark("weapon")
 
         # HUD
         if show_hud:
-            info = f"FPS {int(clock.get_fps()):3d}  Pos({pos_x:.2f},{pos_y:.2f})  NPCs:{len(npcs)}  Weapon:{selected_weapon}"
+            info = (f"FPS {int(clock.get_fps()):3d}  Pos({pos_x:.2f},{pos_y:.2f})  NPCs:{len(npcs)}  "
+                    f"Weapon:{selected_weapon}  Walls:{wall_mode}  Floor:{floor_mode}  Res:{scaler.label(HEIGHT)}")
             hud = font.render(info, True, (200, 200, 210))
             pygame.draw.rect(screen, (20, 20, 30), (0, HEIGHT - 26, WIDTH, 26))
             screen.blit(hud, (10, HEIGHT - 23))
+        if show_graph:
+            timer.draw_graph(screen, (WIDTH - timer.capacity - 90, 10), small_font)
+            draw_stats(screen, small_font, (WIDTH - timer.capacity - 90, 116), [
+                cache_stats_line("sprite$", sprite_cache.stats()),
+                cache_stats_line("world$ ", world_cache.stats()),
+            ])
+        timer.mark("hud")
 
         pygame.display.flip()
-
-    brain.save()
+        timer.mark("flip")
+        timer.end_frame()
+        scaler.update(timer.last_frame_ms())
+        if frames is not None:
+            frame_ms.append(timer.last_frame_ms())
+
+    digest = world_digest(pose, npcs, brain, selected_weapon, weapon_state)
+    if recorder is not None:
+        recorder.close(digest)
+        print(f"recorded {recorder.frames} frames -> {record}")
+    brain.close()
+    if band_pool is not None:
+        band_pool.close()
+    if replay is not None:
+        return {"frames": len(frame_ms), "ticks": total_ticks, "digest": digest.hex(), "frame_ms": frame_ms}
     close()
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("map", nargs="?", help=".pyrmap level (default: built-in map)")
+    ap.add_argument("--record", metavar="FILE", help="record input for replay.py")
+    args = ap.parse_args()
+    main(args.map, record=args.record)
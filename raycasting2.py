@@ -31,24 +31,28 @@ MAP = (
     '########'
 )
 
-# init pygame
-pygame.init()
+# game window (created in main)
+win = None
 
-# create game window
-win = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-
-# set window title
-pygame.display.set_caption('Raycasting')
-
-# init timer
-clock = pygame.time.Clock()
+# load a different square map / window size (used by bench.py)
+def configure(screen_height=SCREEN_HEIGHT, map_rows=None):
+    global SCREEN_HEIGHT, SCREEN_WIDTH, MAP_SIZE, MAP, TILE_SIZE, MAX_DEPTH, player_x, player_y
+    if map_rows is not None:
+        MAP_SIZE = len(map_rows)
+        MAP = ''.join(map_rows)
+    SCREEN_HEIGHT = screen_height
+    SCREEN_WIDTH = SCREEN_HEIGHT * 2
+    TILE_SIZE = max(1, int((SCREEN_WIDTH / 2) / MAP_SIZE))
+    MAX_DEPTH = int(MAP_SIZE * TILE_SIZE)
+    player_x = (SCREEN_WIDTH / 2) / 2
+    player_y = (SCREEN_WIDTH / 2) / 2
 
 # draw map
 def draw_map():
     # loop over map rows
-    for row in range(8):
+    for row in range(MAP_SIZE):
         # loop over map columns
-        for col in range(8):
+        for col in range(MAP_SIZE):
             # calculate square index
             square = row * MAP_SIZE + col
             
@@ -112,41 +116,59 @@ def cast_rays():
         start_angle += STEP_ANGLE
 
 # game loop
-while True:
-    # escape condition
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit(0)
-    
-    # update background
-    pygame.draw.rect(win, (0, 0, 0), (0, 0, SCREEN_HEIGHT, SCREEN_HEIGHT))
+def main():
+    global win, player_x, player_y, player_angle
+
+    # init pygame
+    pygame.init()
+
+    # create game window
+    win = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+    # set window title
+    pygame.display.set_caption('Raycasting')
+
+    # init timer
+    clock = pygame.time.Clock()
+
+    while True:
+        # escape condition
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit(0)
     
-    # draw 2D map
-    draw_map()
+        # update background
+        pygame.draw.rect(win, (0, 0, 0), (0, 0, SCREEN_HEIGHT, SCREEN_HEIGHT))
     
-    # apply raycasting
-    cast_rays()
+        # draw 2D map
+        draw_map()
     
-    # get user input
-    keys = pygame.key.get_pressed()
+        # apply raycasting
+        cast_rays()
     
-    # handle user input
-    if keys[pygame.K_LEFT]: player_angle -= 0.1
-    if keys[pygame.K_RIGHT]: player_angle += 0.1
-    if keys[pygame.K_UP]:
-        player_x += -math.sin(player_angle) * 5
-        player_y += math.cos(player_angle) * 5
-    if keys[pygame.K_DOWN]:
-        player_x -= -math.sin(player_angle) * 5
-        player_y -= math.cos(player_angle) * 5
-
-    # update display
-    pygame.display.flip()
+        # get user input
+        keys = pygame.key.get_pressed()
     
-    # set FPS
-    clock.tick(30)
+        # handle user input
+        if keys[pygame.K_LEFT]: player_angle -= 0.1
+        if keys[pygame.K_RIGHT]: player_angle += 0.1
+        if keys[pygame.K_UP]:
+            player_x += -math.sin(player_angle) * 5
+            player_y += math.cos(player_angle) * 5
+        if keys[pygame.K_DOWN]:
+            player_x -= -math.sin(player_angle) * 5
+            player_y -= math.cos(player_angle) * 5
+
+        # update display
+        pygame.display.flip()
     
+        # set FPS
+        clock.tick(30)
+
+if __name__ == "__main__":
+    main()
+
 # map change - screen vs window
 # number of ray change
 # brick color change
@@ -0,0 +1,174 @@
+"""
+Input recording and deterministic headless replay for raycasting1.py.
+
+Record a session, then replay it as often as you like:
+
+    python raycasting1.py --record run.pyrec [level.pyrmap]
+    python replay.py run.pyrec                      # headless, uncapped, JSON report
+    python replay.py run.pyrec --out after.json
+
+raycasting1 simulates on a fixed tick (fixedstep.py). Its world state is
+therefore a function of:
+
+- the map,
+- the starting brain weights,
+- the RNG seeds (the global `random` used by spawn_npc and AIBrain.choose,
+  and the NPCStore's numpy generator),
+- and, per frame, the number of ticks run, the held movement keys and the
+  key / click events.
+
+The recorder stores exactly that. The file starts with a JSON header (seed,
+tick rate, NPC storage, map path and CRC, starting weights). It is
+followed by one zlib-compressed record per frame: tick count, a bitmask of
+HELD_KEYS, and the event codes. A closing record holds the SHA-256 of the
+final world state. That is about 4 bytes a frame before compression.
+
+The replayer feeds the same frames through the same main loop with the
+dummy video driver and no frame cap. It renders every frame, so a replay
+doubles as a repeatable benchmark workload. It exits non-zero when the
+final state digest differs from the recorded one, which makes a replay
+usable as a regression test.
+"""
+
+import json
+import os
+import struct
+import sys
+import zlib
+
+if __name__ == "__main__":  # headless replay: no window, and keep stdout for the report
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from pygame.locals import K_DOWN, K_LEFT, K_RIGHT, K_UP, K_a, K_d, K_s, K_w
+
+MAGIC = b"PYRP"
+VERSION = 1
+PREFIX = struct.Struct("<4sHI")   # magic, version, header length
+FRAME = struct.Struct("<BHB")     # ticks, held-key mask, event count
+EVENT = struct.Struct("<i")
+END = 0xFF                        # ticks value of the closing record (then 32 digest bytes)
+
+HELD_KEYS = (K_w, K_s, K_a, K_d, K_UP, K_DOWN, K_LEFT, K_RIGHT)  # everything move_player reads
+EV_QUIT = -1
+EV_CLICK = -2  # left mouse button
+
+
+class HeldKeys:
+    """Stand-in for pygame.key.get_pressed(): keys[K_w] etc. from a recorded mask."""
+    __slots__ = ("mask",)
+
+    def __init__(self, mask):
+        self.mask = mask
+
+    def __getitem__(self, key):
+        try:
+            return bool(self.mask >> HELD_KEYS.index(key) & 1)
+        except ValueError:
+            return False
+
+
+def held_mask(keys):
+    mask = 0
+    for i, key in enumerate(HELD_KEYS):
+        if keys[key]:
+            mask |= 1 << i
+    return mask
+
+
+class Recorder:
+    def __init__(self, path, header):
+        """`header` is a JSON-serializable dict describing the starting state."""
+        self.path = path
+        self.frames = 0
+        self._file = open(path, "wb")
+        head = json.dumps(header, sort_keys=True).encode("utf-8")
+        self._file.write(PREFIX.pack(MAGIC, VERSION, len(head)))
+        self._file.write(head)
+        self._zip = zlib.compressobj(9)
+
+    def frame(self, ticks, keys, events):
+        data = FRAME.pack(ticks, held_mask(keys), len(events))
+        data += b"".join(EVENT.pack(e) for e in events)
+        self._file.write(self._zip.compress(data))
+        self.frames += 1
+
+    def close(self, digest):
+        """Finish the file with the final world-state digest (32 bytes)."""
+        self._file.write(self._zip.compress(FRAME.pack(END, 0, 0) + digest))
+        self._file.write(self._zip.flush())
+        self._file.close()
+
+
+class Replay:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, size = PREFIX.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a version {VERSION} replay")
+        self.path = path
+        self.header = json.loads(data[PREFIX.size:PREFIX.size + size])
+        self.body = zlib.decompressobj().decompress(data[PREFIX.size + size:])
+        self.digest = None  # recorded final state; None if the recording was cut short
+        self.frames = 0
+        for _ in self:  # count frames and find the digest
+            self.frames += 1
+
+    def __iter__(self):
+        """(ticks, HeldKeys, [event codes]) per recorded frame."""
+        body = self.body
+        pos = 0
+        while pos + FRAME.size <= len(body):
+            ticks, mask, count = FRAME.unpack_from(body, pos)
+            pos += FRAME.size
+            if ticks == END:
+                self.digest = body[pos:pos + 32]
+                return
+            events = [EVENT.unpack_from(body, pos + i * EVENT.size)[0] for i in range(count)]
+            pos += count * EVENT.size
+            yield ticks, HeldKeys(mask), events
+
+
+def main(argv=None):
+    import argparse
+    import shutil
+    import tempfile
+    import time
+
+    ap = argparse.ArgumentParser(description="Replay a raycasting1 recording headless and uncapped.")
+    ap.add_argument("recording")
+    ap.add_argument("--out", help="also write the JSON report to this file")
+    opts = ap.parse_args(argv)
+    import raycasting1
+
+    rec = Replay(opts.recording)
+    brain_dir = tempfile.mkdtemp(prefix="replay_brain_")  # never touch the real ai_brain.json
+    try:
+        t0 = time.perf_counter()
+        result = raycasting1.main(rec.header.get("map"), replay=rec,
+                                  brain_path=os.path.join(brain_dir, "brain.json"))
+        elapsed = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(brain_dir, ignore_errors=True)
+
+    ms = sorted(result.pop("frame_ms"))
+    n = len(ms)
+    report = dict(result, recording=opts.recording, seconds=elapsed,
+                  fps=n / elapsed if elapsed > 0 else 0.0,
+                  frame_ms={"p50": ms[n // 2] if n else 0.0,
+                            "p95": ms[min(n - 1, int(n * 0.95))] if n else 0.0,
+                            "max": ms[-1] if n else 0.0},
+                  expected=rec.digest.hex() if rec.digest else None)
+    report["match"] = report["expected"] == report["digest"]
+    text = json.dumps(report, indent=2)
+    print(text)
+    if opts.out:
+        with open(opts.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 0 if report["match"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
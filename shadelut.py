@@ -0,0 +1,92 @@
+"""
+One precomputed lighting table for walls, floors and sprites.
+
+ShadeLUT quantizes distance into bands and stores, for every band, tile
+value and wall face, the final wall colour: the tile's base colour times
+the fog factor of the band, times the side factor for y-facing walls.
+Shading a column is then one lookup instead of a clamp, a division and
+three multiplies:
+
+    lut = ShadeLUT({1: (150, 0, 0), 2: (0, 150, 0), 3: (0, 0, 150)}, max_depth=20.0)
+    color = lut.rgb[lut.band(dist)][tile][side]       # one column, plain Python
+    colors = lut.colors(dist, tiles, sides)           # (N, 3) uint8 for every column (numpy)
+    lut.factor(dist)                                  # brightness alone: textures, floors
+    lut.grey[lut.band(dist)]                          # 0..255 level for a BLEND_RGB_MULT sprite tint
+
+Textured walls, floor rows and sprites use the brightness of the same
+bands, so everything at one distance fogs by the same amount. The table
+is plain nested lists, so it works without numpy. colors(), factor() and
+shade() build numpy copies on first use.
+"""
+
+BANDS = 256  # distance bands between 0 and max_depth; farther is the last band
+
+
+def fog(dist):
+    """Default brightness curve: full up close, fading to 0.15."""
+    return max(0.15, min(1.0, 4.0 / (dist + 0.2)))
+
+
+class ShadeLUT:
+    def __init__(self, colors, max_depth=20.0, bands=BANDS, curve=fog, side_factor=0.75):
+        """`colors`: {tile value: (r, g, b)} for tile values 1, 2, ... N.
+
+        Higher tile values (up to 255) cycle through the N colours, like the
+        wall textures do. `curve(dist)` gives the brightness of a band from
+        the distance at its middle; `side_factor` darkens walls hit on a y
+        face (side 1).
+        """
+        self.bands = bands
+        self.scale = bands / float(max_depth)
+        self.sides = (1.0, side_factor)
+        self.factors = [curve((b + 0.5) / self.scale) for b in range(bands)]
+        self.grey = [int(255 * f) for f in self.factors]
+        keys = sorted(colors)
+        source = [0] + [keys[(t - 1) % len(keys)] for t in range(1, 256)]  # tile -> colour key
+        self.rgb = []
+        for f in self.factors:
+            shaded = {k: [tuple(int(c * f * s) for c in colors[k]) for s in self.sides] for k in keys}
+            empty = [(0, 0, 0), (0, 0, 0)]
+            self.rgb.append([shaded[k] if t else empty for t, k in enumerate(source)])
+        self._arrays = None
+
+    def band(self, dist):
+        """Distance band of one distance."""
+        b = int(dist * self.scale)
+        return b if b < self.bands else self.bands - 1
+
+    def _np(self):
+        if self._arrays is None:
+            import numpy as np
+            factors = np.array(self.factors)
+            # flat [(band * 256 + tile) * 2 + side] tables, so a lookup is one take()
+            self._arrays = (np, np.array(self.rgb, dtype=np.uint8).reshape(-1, 3), factors,
+                            (factors[:, None] * np.array(self.sides)[None, :]).ravel())
+        return self._arrays
+
+    def bands_of(self, dist):
+        """Distance bands of an array of distances."""
+        np = self._np()[0]
+        return np.minimum((np.asarray(dist) * self.scale).astype(np.intp), self.bands - 1)
+
+    def colors(self, dist, tiles, sides):
+        """(N, 3) uint8 wall colours for arrays of distances, tile values and faces."""
+        _, rgb, _, _ = self._np()
+        index = self.bands_of(dist)
+        index <<= 8
+        index += tiles
+        index <<= 1
+        index += sides
+        return rgb.take(index, axis=0)
+
+    def factor(self, dist):
+        """Fog brightness (0..1) for an array of distances."""
+        return self._np()[2].take(self.bands_of(dist))
+
+    def shade(self, dist, sides):
+        """Fog times side brightness (0..1) for arrays of distances and faces."""
+        _, _, _, shades = self._np()
+        index = self.bands_of(dist)
+        index <<= 1
+        index += sides
+        return shades.take(index)
@@ -0,0 +1,184 @@
+"""
+Uniform-grid spatial hash for NPCs and other entities.
+
+Entities are anything with float `x` and `y` attributes in map units.
+They are bucketed by the map cell they stand in, grouped into
+bucket x bucket cell squares, so a query only visits the squares it
+overlaps instead of walking the whole entity list:
+
+    index = SpatialHash(bucket=4)
+    index.insert(npc)
+    npc.x += dx; npc.y += dy
+    index.update(npc)                    # O(1); a no-op while it stays in its square
+    near = index.query_radius(x, y, 3.0)
+    shown = index.query_cells(x0, y0, x1, y1)                      # minimap window
+    ahead = index.query_cone(x, y, dir_x, dir_y, tan_half_fov)     # sprite candidates
+
+A query costs the number of squares it overlaps (or the number of occupied
+squares, whichever is smaller) plus the entities in them. query_radius()
+and query_cells() return exactly the matching entities. query_cone()
+works on whole squares and returns a superset: every entity in front of
+the camera inside the cone widened by `pad`, plus some just outside it.
+The renderer does its own exact test anyway.
+
+Entities are kept by identity, so they need not be hashable; the same
+object may be in several indexes.
+"""
+
+import math
+
+
+def _discard(items, entity):
+    """Remove `entity` itself from `items`: list.remove() matches by ==, which
+    would drop the wrong one of two equal entities (e.g. dataclasses)."""
+    for i, e in enumerate(items):
+        if e is entity:
+            del items[i]
+            return
+    raise ValueError("entity not in its bucket")
+
+
+class SpatialHash:
+    def __init__(self, bucket=4):
+        self.bucket = bucket
+        self.buckets = {}  # (bx, by) -> list of entities
+        self.keys = {}     # id(entity) -> (bx, by)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        for items in self.buckets.values():
+            yield from items
+
+    def key(self, x, y):
+        b = self.bucket
+        return (int(x // b), int(y // b))
+
+    # ----------------- updates -----------------
+    def insert(self, entity):
+        k = self.key(entity.x, entity.y)
+        self.keys[id(entity)] = k
+        items = self.buckets.get(k)
+        if items is None:
+            self.buckets[k] = [entity]
+        else:
+            items.append(entity)
+
+    def remove(self, entity):
+        k = self.keys.pop(id(entity))
+        items = self.buckets[k]
+        _discard(items, entity)
+        if not items:
+            del self.buckets[k]
+
+    def update(self, entity):
+        """Re-bucket `entity` after it moved (cheap when it stays in its square)."""
+        b = self.bucket
+        k = (int(entity.x // b), int(entity.y // b))
+        old = self.keys[id(entity)]
+        if k == old:
+            return False
+        items = self.buckets[old]
+        _discard(items, entity)
+        if not items:
+            del self.buckets[old]
+        self.keys[id(entity)] = k
+        items = self.buckets.get(k)
+        if items is None:
+            self.buckets[k] = [entity]
+        else:
+            items.append(entity)
+        return True
+
+    def rebuild(self, entities):
+        self.buckets.clear()
+        self.keys.clear()
+        for e in entities:
+            self.insert(e)
+
+    def clear(self):
+        self.buckets.clear()
+        self.keys.clear()
+
+    # ----------------- queries -----------------
+    def _squares(self, bx0, by0, bx1, by1):
+        """(key, entities) of the occupied squares in the inclusive key range."""
+        buckets = self.buckets
+        if (bx1 - bx0 + 1) * (by1 - by0 + 1) > len(buckets):
+            # fewer occupied squares than squares in range: filter the occupied ones
+            for k, items in buckets.items():
+                if bx0 <= k[0] <= bx1 and by0 <= k[1] <= by1:
+                    yield k, items
+            return
+        for by in range(by0, by1 + 1):
+            for bx in range(bx0, bx1 + 1):
+                items = buckets.get((bx, by))
+                if items is not None:
+                    yield (bx, by), items
+
+    def query_cells(self, x0, y0, x1, y1):
+        """Entities standing in cells x0..x1, y0..y1 (inclusive, integer cell coords)."""
+        b = self.bucket
+        out = []
+        for (bx, by), items in self._squares(x0 // b, y0 // b, x1 // b, y1 // b):
+            if x0 <= bx * b and (bx + 1) * b - 1 <= x1 and y0 <= by * b and (by + 1) * b - 1 <= y1:
+                out.extend(items)  # square entirely inside the range
+                continue
+            for e in items:
+                if x0 <= int(e.x) <= x1 and y0 <= int(e.y) <= y1:
+                    out.append(e)
+        return out
+
+    def query_radius(self, x, y, r):
+        """Entities within distance r of (x, y)."""
+        b = self.bucket
+        r2 = r * r
+        out = []
+        for _, items in self._squares(int((x - r) // b), int((y - r) // b),
+                                      int((x + r) // b), int((y + r) // b)):
+            for e in items:
+                dx = e.x - x
+                dy = e.y - y
+                if dx * dx + dy * dy <= r2:
+                    out.append(e)
+        return out
+
+    def query_cone(self, x, y, dir_x, dir_y, tan_half, max_dist=None, pad=0.5):
+        """Candidate entities in the view cone from (x, y) along (dir_x, dir_y).
+
+        The cone is every point at forward distance f > 0 (up to max_dist,
+        unbounded when None) and sideways distance at most f * tan_half + pad.
+        Whole squares are accepted or rejected, so the result may also hold
+        entities near the cone; nothing inside it is left out.
+        """
+        mag = math.hypot(dir_x, dir_y) or 1.0
+        fx, fy = dir_x / mag, dir_y / mag
+        b = self.bucket
+        half_diag = 0.7072 * b  # square centre to corner
+        if max_dist is None:
+            bx0 = by0 = -(1 << 30)
+            bx1 = by1 = 1 << 30
+        else:
+            # bounding box of the cone's triangle (apex, two far corners), widened by pad
+            side = max_dist * tan_half + pad
+            xs = (x, x + fx * max_dist - fy * side, x + fx * max_dist + fy * side)
+            ys = (y, y + fy * max_dist + fx * side, y + fy * max_dist - fx * side)
+            bx0, bx1 = int((min(xs) - pad) // b), int((max(xs) + pad) // b)
+            by0, by1 = int((min(ys) - pad) // b), int((max(ys) + pad) // b)
+        # a square can hold a point of the cone only if its centre is within
+        # half_diag of it: test the centre against the cone grown by half_diag
+        slack = pad + half_diag * (1.0 + tan_half)
+        far = None if max_dist is None else max_dist + half_diag
+        out = []
+        for (bx, by), items in self._squares(bx0, by0, bx1, by1):
+            cx = (bx + 0.5) * b - x
+            cy = (by + 0.5) * b - y
+            f = cx * fx + cy * fy
+            if f < -half_diag or (far is not None and f > far):
+                continue
+            side = cx * fy - cy * fx
+            if abs(side) > max(f, 0.0) * tan_half + slack:
+                continue
+            out.extend(items)
+        return out
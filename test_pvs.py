@@ -0,0 +1,82 @@
+"""
+Checks for pvs.build() (numpy, no pygame):
+
+    python -m pytest test_pvs.py
+"""
+
+import math
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import pvs
+from gridmap import GridMap
+
+
+def cluttered(width, height, walls, seed):
+    rng = random.Random(seed)
+    rows = [[1 if x in (0, width - 1) or y in (0, height - 1) or rng.random() < walls else 0
+             for x in range(width)] for y in range(height)]
+    return GridMap.from_rows(rows)
+
+
+def reached(grid, px, py, rays, rng):
+    """Cells that DDA rays from (px, py) in `rays` directions pass through or stop at."""
+    w = grid.width
+    cells = set()
+    for n in range(rays):
+        a = 2 * math.pi * (n + rng.random()) / rays
+        rx, ry = math.cos(a), math.sin(a)
+        mx, my = int(px), int(py)
+        delta_x = abs(1 / rx) if rx else 1e30
+        delta_y = abs(1 / ry) if ry else 1e30
+        side_x = ((px - mx) if rx < 0 else (mx + 1 - px)) * delta_x
+        side_y = ((py - my) if ry < 0 else (my + 1 - py)) * delta_y
+        while True:
+            if side_x < side_y:
+                side_x += delta_x
+                mx += -1 if rx < 0 else 1
+            else:
+                side_y += delta_y
+                my += -1 if ry < 0 else 1
+            cells.add((mx, my))
+            if grid.solid[my * w + mx]:
+                break
+    return cells
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_sets_hold_every_cell_a_ray_reaches(seed):
+    # cluttered maps are where the old sampled sets missed cells 10-20 cells away
+    grid = cluttered(32, 24, 0.3, seed)
+    sets = pvs.build(grid, margin=0)
+    rng = random.Random(seed)
+    free = grid.free_cells()
+    for _ in range(150):
+        cx, cy = rng.choice(free)
+        px, py = int(cx) + rng.random(), int(cy) + rng.random()
+        missing = [c for c in reached(grid, px, py, 720, rng) if not sets.can_see(px, py, *c)]
+        assert not missing, f"from ({px:.3f}, {py:.3f}): {missing}"
+
+
+def test_walls_block_the_view():
+    # a wall across the middle with no gap: the two halves cannot see each other
+    rows = [[1] * 9] + [[1] + [0] * 7 + [1] for _ in range(7)] + [[1] * 9]
+    rows[4] = [1] * 9
+    sets = pvs.build(GridMap.from_rows(rows), margin=0)
+    assert sets.can_see(2.5, 2.5, 6, 3)
+    assert sets.can_see(2.5, 2.5, 6, 4)      # the wall itself
+    assert not sets.can_see(2.5, 2.5, 6, 5)
+    assert not sets.can_see(6.5, 6.5, 1, 2)
+
+
+def test_corner_touching_walls_do_not_leak():
+    # a diagonal of walls meeting only at corners is closed to straight lines
+    size = 8
+    rows = [[1 if x in (0, size - 1) or y in (0, size - 1) or x == y else 0 for x in range(size)]
+            for y in range(size)]
+    sets = pvs.build(GridMap.from_rows(rows), margin=0)
+    assert not sets.can_see(1.5, 5.5, 5, 2)
+    assert sets.can_see(1.5, 5.5, 2, 6)
@@ -0,0 +1,46 @@
+"""
+Checks for spatial.SpatialHash (no pygame, no display):
+
+    python -m pytest test_spatial.py
+"""
+
+from dataclasses import dataclass
+
+from spatial import SpatialHash
+
+
+@dataclass
+class Entity:
+    """Compares field by field, like new2's NPC."""
+    x: float
+    y: float
+
+
+def ids(entities):
+    return sorted(map(id, entities))
+
+
+def test_update_moves_the_entity_itself():
+    # both step into the next square; b is re-bucketed first, while a still sits in the old one
+    a, b = Entity(1.5, 1.5), Entity(1.5, 1.5)
+    index = SpatialHash(bucket=4)
+    index.insert(a)
+    index.insert(b)
+    a.x = b.x = 5.5
+    assert index.update(b)
+    assert ids(index.query_cells(0, 0, 3, 3)) == ids([a])
+    assert ids(index.query_cells(4, 0, 7, 3)) == ids([b])
+    assert index.update(a)
+    assert ids(index.query_cells(4, 0, 7, 3)) == ids([a, b])
+
+
+def test_remove_drops_the_entity_itself():
+    a, b = Entity(1.5, 1.5), Entity(1.5, 1.5)
+    index = SpatialHash(bucket=4)
+    index.insert(a)
+    index.insert(b)
+    index.remove(b)
+    assert ids(index.query_cells(0, 0, 3, 3)) == ids([a])
+    assert len(index) == 1
+    index.remove(a)
+    assert len(index) == 0 and not index.buckets
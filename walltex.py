@@ -0,0 +1,205 @@
+"""
+Textured wall columns for the framebuffer renderer.
+
+WallTextures turns one small square RGB image per wall type into column
+strips that WallRasterizer.draw_strips() can gather from directly:
+
+    textures = WallTextures.default(rasterizer.map_colors, ceil_color, floor_color)
+    textures.draw(rasterizer, line_h, tex_id, tex_u, shade)
+
+Everything per-texel is done once, up front:
+
+- every mip level (64, 32, ... 1 texels) of every texture,
+- every one of SHADE_BANDS distance shades,
+- converted to mapped pixel values,
+- sliced into columns, each column padded with the ceiling colour in
+  front and the floor colour behind.
+
+The texel row each screen row reads depends only on the on-screen wall
+height, so that too is a table: one row of strip positions per wall height
+up to ROW_TABLE_SPAN screen heights, built once per resolution. A frame
+then needs a few per-column numbers: which strip (texture, mip, shade
+band, texel column) and which table row. One table gather and one texel
+gather then fill the whole view, background included. The mip level is
+chosen from the on-screen wall height, so far walls read coarse texels
+instead of shimmering.
+
+Images come from assets/wall<N>.png when present (any size; scaled to
+TEX_SIZE) and are generated otherwise: brick, stone blocks and wood
+planks. Requires numpy.
+"""
+
+import os
+
+import numpy as np
+import pygame
+
+TEX_SIZE = 64      # texels per side at mip level 0 (a power of two)
+SHADE_BANDS = 32   # distinct shades per texture; shade is quantized to these
+ROW_TABLE_SPAN = 4  # row tables cover walls up to this many screen heights; taller ones are computed
+
+
+def make_texture(kind, size=TEX_SIZE, seed=0):
+    """(size, size, 3) uint8 procedural texture indexed [u, v].
+
+    kind: 0 brick, 1 stone, 2 wood (walls); 3 floor tiles, 4 ceiling panels.
+    """
+    rng = np.random.default_rng(seed + kind)
+    u = np.arange(size)[:, None]
+    v = np.arange(size)[None, :]
+    noise = rng.integers(-12, 13, (size, size, 1))
+    if kind == 0:  # brick: offset courses, light mortar
+        course = v // (size // 8)
+        shift = (course % 2) * (size // 8)
+        mortar = ((v % (size // 8)) == 0) | (((u + shift) % (size // 4)) == 0)
+        rgb = np.where(mortar[..., None], (170, 165, 150), (150, 62, 48))
+    elif kind == 1:  # stone: large blocks, dark joints
+        block = size // 4
+        joint = ((u % block) == 0) | ((v % block) == 0)
+        tint = rng.integers(-18, 19, (size // block, size // block, 1))
+        base = np.array((120, 122, 128)) + tint[u // block, v // block]
+        rgb = np.where(joint[..., None], (60, 60, 66), base)
+    elif kind == 2:  # wood: vertical planks with grain
+        plank = size // 4
+        gap = (u % plank) == 0
+        grain = (np.sin((v + (u // plank) * 7) * 0.9) * 10)[..., None]
+        rgb = np.where(gap[..., None], (55, 35, 20), np.array((140, 96, 56)) + grain)
+    elif kind == 3:  # floor: 2x2 checker of worn tiles with grout
+        tile = size // 2
+        grout = ((u % tile) == 0) | ((v % tile) == 0)
+        dark = ((u // tile + v // tile) % 2)[..., None]
+        rgb = np.where(grout[..., None], (40, 40, 44), np.where(dark, (70, 66, 60), (104, 98, 88)))
+    else:  # ceiling: square panels with a dark frame
+        panel = size // 2
+        frame = ((u % panel) < 2) | ((v % panel) < 2)
+        rgb = np.where(frame[..., None], (38, 38, 48), (78, 80, 92))
+    return np.clip(rgb + noise, 0, 255).astype(np.uint8)
+
+
+def load_texture(path, size=TEX_SIZE):
+    """(size, size, 3) uint8 [u, v] array from an image file."""
+    img = pygame.image.load(path)
+    if img.get_size() != (size, size):
+        img = pygame.transform.smoothscale(img.convert(24), (size, size))
+    return pygame.surfarray.array3d(img)
+
+
+def mip_chain(image):
+    """[image, image / 2, ... 1x1] by 2x2 box filtering, as float arrays."""
+    levels = [image.astype(np.float64)]
+    while levels[-1].shape[0] > 1:
+        a = levels[-1]
+        levels.append((a[0::2, 0::2] + a[1::2, 0::2] + a[0::2, 1::2] + a[1::2, 1::2]) / 4.0)
+    return levels
+
+
+class WallTextures:
+    def __init__(self, images, map_colors, ceil_color, floor_color, bands=SHADE_BANDS):
+        """`images`: square (S, S, 3) uint8 arrays indexed [u, v], one per texture id.
+        `map_colors`: (N, 3) RGB -> mapped pixels of the target surface (WallRasterizer.map_colors)."""
+        self.size = images[0].shape[0]
+        self.levels = self.size.bit_length()  # mip levels down to 1x1
+        self.bands = bands
+        self.count = len(images)
+        shades = np.arange(bands) / (bands - 1.0)
+        self.offsets = np.zeros((self.count, self.levels, bands), dtype=np.intp)
+        chunks = []
+        pos = 0
+        for t, image in enumerate(images):
+            for level, mip in enumerate(mip_chain(image)):
+                h = mip.shape[0]
+                strips = np.empty((bands, h, h + 2, 3), dtype=np.uint8)
+                strips[:, :, 0] = ceil_color
+                strips[:, :, -1] = floor_color
+                strips[:, :, 1:-1] = (mip[None] * shades[:, None, None, None]).astype(np.uint8)
+                chunks.append(map_colors(strips.reshape(-1, 3)))
+                self.offsets[t, level] = pos + np.arange(bands) * h * (h + 2)
+                pos += bands * h * (h + 2)
+        # empty columns: a two-texel strip (ceiling, floor)
+        self.background = pos
+        chunks.append(map_colors(np.array([ceil_color, floor_color], dtype=np.uint8)))
+        self.texels = np.concatenate(chunks)
+        self._row_tables = {}  # (height, horizon) -> row table
+
+    def mip_levels(self, line_h):
+        """Mip level per wall height in pixels: about one texel per screen row, or more."""
+        ratio = self.size / np.maximum(line_h, 1)
+        return np.clip(np.log2(ratio).astype(np.intp), 0, self.levels - 1)
+
+    def strip_rows(self, line_h, height, horizon):
+        """(len(line_h), height) strip positions: 0 ceiling, 1..h texels, h + 1 floor.
+
+        line_h 0 stands for "no wall" and gives the two-texel background strip.
+        """
+        line_h = np.asarray(line_h, dtype=np.intp)
+        h = (self.size >> self.mip_levels(line_h))[:, None]
+        dy = np.arange(height) - horizon + 0.5
+        v = np.floor(h / 2.0 + 1.0 + dy[None, :] * h / np.maximum(line_h, 1)[:, None])
+        rows = np.clip(v, 0, h + 1)
+        rows[line_h == 0] = dy >= 0
+        return rows.astype(np.min_scalar_type(self.size + 1))
+
+    def padding(self, line_h, rows):
+        """True where strip_rows() picked the ceiling or floor padding rather than a texel."""
+        line_h = np.asarray(line_h, dtype=np.intp)
+        h = (self.size >> self.mip_levels(line_h))[:, None]
+        pad = (rows == 0) | (rows > h)
+        pad[line_h == 0] = True
+        return pad
+
+    def row_table(self, height, horizon):
+        """strip_rows() and padding() for every wall height below ROW_TABLE_SPAN * height, cached."""
+        tables = self._row_tables.get((height, horizon))
+        if tables is None:
+            span = np.arange(ROW_TABLE_SPAN * height)
+            rows = self.strip_rows(span, height, horizon)
+            tables = self._row_tables[(height, horizon)] = (rows, self.padding(span, rows))
+        return tables
+
+    @classmethod
+    def default(cls, map_colors, ceil_color, floor_color, count=3, asset_dir="assets"):
+        """Textures for tile values 1..count: assets/wall<N>.png, or the generated set."""
+        images = []
+        for i in range(count):
+            path = os.path.join(asset_dir, f"wall{i + 1}.png")
+            try:
+                images.append(load_texture(path) if os.path.exists(path) else make_texture(i % 3))
+            except (pygame.error, ValueError):
+                images.append(make_texture(i % 3))
+        return cls(images, map_colors, ceil_color, floor_color)
+
+    def texture_ids(self, tiles):
+        """Tile values (1, 2, 3, ...) -> texture ids, cycling through the textures."""
+        return (np.asarray(tiles, dtype=np.intp) - 1) % self.count
+
+    def draw(self, rasterizer, line_h, tex_id, tex_u, shade, visible=None, background=None):
+        """Draw textured walls into `rasterizer` (one entry per column).
+
+        line_h: wall height in pixels; tex_id: texture per column;
+        tex_u: hit position along the wall face in [0, 1); shade: 0..1;
+        visible: columns that hit a wall (others show only the background);
+        background: (width, height) pixels to show above and below the walls
+        (floorcast.py) instead of the flat ceiling and floor colours.
+        """
+        line_h = np.maximum(np.asarray(line_h).astype(np.intp), 1)
+        level = self.mip_levels(line_h)
+        h = self.size >> level
+        band = np.clip(np.rint(shade * (self.bands - 1)).astype(np.intp), 0, self.bands - 1)
+        column = np.minimum((tex_u * h).astype(np.intp), h - 1)
+        base = self.offsets[tex_id, level, band] + column * (h + 2)
+        if visible is not None:
+            base[~visible] = self.background
+            line_h[~visible] = 0
+
+        table, pad_table = self.row_table(rasterizer.height, rasterizer.horizon)
+        tall = line_h >= len(table)
+        lookup = np.where(tall, 0, line_h)
+        rows = np.take(table, lookup, axis=0)
+        if tall.any():  # walls right in front of the camera
+            rows[tall] = self.strip_rows(line_h[tall], rasterizer.height, rasterizer.horizon)
+        if background is None:
+            return rasterizer.draw_strips(self.texels, base, rows)
+        pad = np.take(pad_table, lookup, axis=0)
+        if tall.any():
+            pad[tall] = self.padding(line_h[tall], rows[tall])
+        return rasterizer.draw_strips(self.texels, base, rows, background, pad)